@@ -13,12 +13,28 @@
 # under the License.
 
 import logging
+import sys
 
-import pbr.version
 
+def _get_version():
+    import pbr.version
+    return pbr.version.VersionInfo('reno').version_string()
 
-__version__ = pbr.version.VersionInfo(
-    'reno').version_string()
+
+def __getattr__(name):
+    # Looking up the version imports pbr, which is slow, so it is only
+    # done the first time __version__ is used.
+    if name == '__version__':
+        global __version__
+        __version__ = _get_version()
+        return __version__
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+if sys.version_info < (3, 7):
+    # Older versions do not support __getattr__ for modules.
+    __version__ = _get_version()
 
 # Configure a null logger so that if reno is used as a library by an
 # application that does not configure logging there are no warnings.
@@ -10,26 +10,985 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import binascii
 import collections
+import concurrent.futures
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import locale
+import logging
+import lzma
+import mmap
 import os
+import shutil
 import sys
+import textwrap
 
-import yaml
+from dulwich import errors
 
-from reno import loader
+from reno import defaults
 from reno import scanner
+from reno import timing
+from reno import yamlutils
 
+LOG = logging.getLogger(__name__)
 
-def build_cache_db(conf, versions_to_include):
+# The formats write_cache_db() knows how to produce. The "yaml" format
+# is a single YAML document, readable by all versions of reno. The
+# "indexed" format (version 2 of the cache) stores each note's contents
+# as a separate JSON record so a reader only needs to decode the data
+# it uses. The "sharded" format writes a small manifest and one indexed
+# file per branch, with the note contents shared between branches, so
+# a reader only needs to load the data for the branch it renders.
+FORMATS = defaults.CACHE_FORMATS
+
+# The first line of an indexed cache file.
+_INDEXED_MAGIC = b'# reno-cache 2\n'
+
+# The last line of an indexed cache file holds the offset of the table
+# of contents, as a fixed-width number so it can be found by reading a
+# known number of bytes from the end of the file.
+_FOOTER_FORMAT = b'%020d\n'
+_FOOTER_SIZE = len(_FOOTER_FORMAT % 0)
+
+# The first line of the manifest of a sharded cache.
+_MANIFEST_MAGIC = b'# reno-cache-manifest 1\n'
+
+# The compression methods write_cache_db() can apply to the files it
+# writes. Compressed files are recognized by their signatures when they
+# are read, so they do not need to be named differently.
+COMPRESSIONS = defaults.CACHE_COMPRESSIONS
+
+# The filename extension and file signature of each compression method.
+_COMPRESSION_EXTENSIONS = {
+    'gzip': '.gz',
+    'xz': '.xz',
+}
+_COMPRESSION_SIGNATURES = {
+    'gzip': b'\x1f\x8b',
+    'xz': b'\xfd7zXZ\x00',
+}
+
+
+def get_cache_filename(conf):
+    return os.path.normpath(os.path.join(
+        conf.reporoot, conf.notespath, 'reno.cache'))
+
+
+class CacheData(object):
+    """The release notes data loaded from a cache file.
+
+    :param notes: Mapping of versions to lists of (filename, sha) pairs.
+    :param dates: Mapping of versions to release dates.
+    :param file_contents: Mapping of note filenames to their parsed
+        contents.
+    :param stamps: Description of the state of the repository when the
+        cache was built, or None for older cache files.
+    :param file_blobs: Mapping of note filenames to the SHAs of the
+        blobs their contents were read from.
+    :param branch_notes: Optional mapping of branch keys to the notes
+        found on each branch, when they are known separately.
+    """
+
+    def __init__(self, notes, dates, file_contents, stamps=None,
+                 file_blobs=None, branch_notes=None):
+        self.notes = notes
+        self.dates = dates
+        self._file_contents = file_contents
+        self.stamps = stamps
+        self.file_blobs = file_blobs or {}
+        self.branch_notes = branch_notes or {}
+
+    def has_file_contents(self, filename):
+        "Return True if the cache includes the contents of the file."
+        return filename in self._file_contents
+
+    def get_file_contents(self, filename):
+        "Return the parsed contents of the note file."
+        return self._file_contents[filename]
+
+    def close(self):
+        """Release the memory-mapped cache file, if there is one.
+
+        The contents of the notes cannot be read afterwards.
+        """
+        _close(self._file_contents)
+
+
+def _close(contents):
+    if hasattr(contents, 'close'):
+        contents.close()
+
+
+class _IndexedContents(object):
+    """Read-only mapping decoding note contents on demand.
+
+    The table of contents is only decoded the first time a note is
+    requested, and a bounded number of decoded notes are kept so that
+    memory use depends on what is rendered, not on the size of the
+    cache.
+
+    :param data: The bytes of an indexed cache file, usually a
+        memory-mapped view of the file.
+    :param toc_start: The offset of the table of contents.
+    :param toc_end: The offset of the end of the table of contents.
+    """
+
+    # The number of decoded notes to keep.
+    max_decoded = 128
+
+    def __init__(self, data, toc_start, toc_end):
+        self._data = data
+        self._toc_start = toc_start
+        self._toc_end = toc_end
+        self._offsets = None
+        self._decoded = collections.OrderedDict()
+
+    def _get_offsets(self):
+        if self._offsets is None:
+            self._offsets = json.loads(
+                self._data[self._toc_start:self._toc_end].decode('utf-8'))
+        return self._offsets
+
+    def __getitem__(self, filename):
+        try:
+            value = self._decoded.pop(filename)
+        except KeyError:
+            offset, length = self._get_offsets()[filename]
+            value = json.loads(
+                self._data[offset:offset + length].decode('utf-8'))
+            if len(self._decoded) >= self.max_decoded:
+                # Drop the least recently used entry.
+                self._decoded.popitem(last=False)
+        self._decoded[filename] = value
+        return value
+
+    def __contains__(self, filename):
+        return filename in self._get_offsets()
+
+    def __len__(self):
+        return len(self._get_offsets())
+
+    def __iter__(self):
+        return iter(self._get_offsets())
+
+    def close(self):
+        # Only memory-mapped files need to be closed.
+        _close(self._data)
+
+
+class _BlobContents(object):
+    """Read-only mapping of note filenames to contents stored by blob.
+
+    The contents shared by the shards of a sharded cache are stored
+    under the SHA of the blob they were read from, or under the
+    filename for notes read from the working copy.
+
+    :param file_blobs: Mapping of filenames to blob SHAs.
+    :param contents: Mapping of blob SHAs to parsed contents.
+    """
+
+    def __init__(self, file_blobs, contents):
+        self._file_blobs = file_blobs
+        self._contents = contents
+
+    def _get_key(self, filename):
+        return self._file_blobs.get(filename, filename)
+
+    def __getitem__(self, filename):
+        return self._contents[self._get_key(filename)]
+
+    def __contains__(self, filename):
+        return self._get_key(filename) in self._contents
+
+    def close(self):
+        _close(self._contents)
+
+
+def _make_notes(notes):
+    return collections.OrderedDict(
+        (n['version'], n['files'])
+        for n in notes
+    )
+
+
+def _make_dates(dates):
+    return collections.OrderedDict(
+        (n['version'], n['date'])
+        for n in dates
+    )
+
+
+def _make_cache_data(notes, dates, file_contents, stamps, file_blobs):
+    return CacheData(
+        notes=_make_notes(notes),
+        dates=_make_dates(dates),
+        file_contents=file_contents,
+        stamps=stamps,
+        file_blobs=file_blobs,
+    )
+
+
+def _read_yaml_cache(data, encoding):
+    cache = yamlutils.safe_load(
+        data.decode(encoding or locale.getpreferredencoding(False)))
+    return _make_cache_data(
+        cache['notes'], cache['dates'], cache['file-contents'],
+        cache.get('stamps'), cache.get('file-blobs'))
+
+
+def _read_indexed_cache(data):
+    header_start = len(_INDEXED_MAGIC)
+    header_end = data.find(b'\n', header_start)
+    header = json.loads(data[header_start:header_end].decode('utf-8'))
+    toc_end = len(data) - _FOOTER_SIZE
+    toc_start = int(data[toc_end:])
+    return _make_cache_data(
+        header['notes'], header['dates'],
+        _IndexedContents(data, toc_start, toc_end),
+        header.get('stamps'),
+        header.get('file-blobs'),
+    )
+
+
+def _map_file(f):
+    try:
+        # The mapping stays valid after the file is closed.
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # Not everything that can be opened can be mapped.
+        f.seek(0)
+        return f.read()
+
+
+def _open_decompressed(f):
+    """Return a stream of the decompressed contents of a binary file.
+
+    Files that are not compressed are returned unchanged.
+
+    """
+    signature = f.read(max(len(s) for s in _COMPRESSION_SIGNATURES.values()))
+    f.seek(0)
+    if signature.startswith(_COMPRESSION_SIGNATURES['gzip']):
+        return gzip.GzipFile(fileobj=f, mode='rb')
+    if signature.startswith(_COMPRESSION_SIGNATURES['xz']):
+        return lzma.LZMAFile(f, mode='rb')
+    return f
+
+
+def _open_compressed(f, compression):
+    "Return a stream compressing data written to a binary file."
+    if compression == 'gzip':
+        # Leave the time out of the header so the output only depends
+        # on the data.
+        return gzip.GzipFile(fileobj=f, mode='wb', mtime=0)
+    if compression == 'xz':
+        return lzma.LZMAFile(f, mode='wb')
+    raise ValueError('unknown compression {!r}'.format(compression))
+
+
+def _read_data(raw, f, prefix=b''):
+    """Return the rest of the data in the file.
+
+    Uncompressed files are memory-mapped. Compressed files have to be
+    decompressed into memory, since the indexed format needs random
+    access.
+
+    """
+    if f is raw:
+        return _map_file(raw)
+    return prefix + f.read()
+
+
+def _read_indexed_file(filename):
+    with open(filename, 'rb') as raw:
+        return _read_indexed_cache(_read_data(raw, _open_decompressed(raw)))
+
+
+def _read_manifest(filename, data):
+    """Return the manifest of a sharded cache and its contents store."""
+    manifest = json.loads(data.decode('utf-8'))
+    manifest['directory'] = os.path.join(
+        os.path.dirname(filename), manifest['directory'])
+    # The store of note contents is an indexed file keyed by blob SHA.
+    contents = _read_indexed_file(
+        os.path.join(manifest['directory'], manifest['contents']),
+    )._file_contents
+    return manifest, contents
+
+
+def _read_sharded_cache(filename, data):
+    manifest, contents = _read_manifest(filename, data)
+    notes = collections.OrderedDict()
+    branch_notes = collections.OrderedDict()
+    file_blobs = {}
+    for shard in manifest['shards']:
+        shard_data = _read_indexed_file(
+            os.path.join(manifest['directory'], shard['file']))
+        branch_notes[shard['branch']] = shard_data.notes
+        notes.update(shard_data.notes)
+        file_blobs.update(shard_data.file_blobs)
+    return CacheData(
+        notes=notes,
+        dates=_make_dates(manifest['dates']),
+        file_contents=_BlobContents(file_blobs, contents),
+        stamps=manifest['stamps'],
+        file_blobs=file_blobs,
+        branch_notes=branch_notes,
+    )
+
+
+def read_cache_db(filename, encoding=None):
+    """Load a cache file written by write_cache_db().
+
+    The format of the file is detected automatically. Indexed cache
+    files are memory-mapped, and only the version index is decoded
+    up front. All of the shards of a sharded cache are loaded and
+    combined. Compressed files are decompressed as they are read.
+
+    :param filename: The name of the cache file.
+    :param encoding: The character encoding of a YAML cache file.
+    :returns: CacheData
+    """
+    with timing.timer('cache.read'):
+        return _read_cache_db(filename, encoding)
+
+
+def _read_cache_db(filename, encoding):
+    with open(filename, 'rb') as raw:
+        f = _open_decompressed(raw)
+        magic = f.read(len(_MANIFEST_MAGIC))
+        if magic == _MANIFEST_MAGIC:
+            return _read_sharded_cache(filename, f.read())
+        if not magic.startswith(_INDEXED_MAGIC):
+            return _read_yaml_cache(magic + f.read(), encoding)
+        data = _read_data(raw, f, magic)
+    return _read_indexed_cache(data)
+
+
+def read_branch_cache_db(filename, branch, encoding=None):
+    """Load the data for one branch from a cache file.
+
+    Only the shard for the branch is loaded from a sharded cache. Other
+    formats store the data for all branches together, so the whole
+    file is loaded.
+
+    :param filename: The name of the cache file.
+    :param branch: The name of the branch, or None for the current
+        branch.
+    :param encoding: The character encoding of a YAML cache file.
+    :returns: CacheData, or None if a sharded cache has no data for
+        the branch.
+    """
+    with timing.timer('cache.read'):
+        return _read_branch_cache_db(filename, branch, encoding)
+
+
+def _read_branch_cache_db(filename, branch, encoding):
+    with open(filename, 'rb') as raw:
+        f = _open_decompressed(raw)
+        magic = f.read(len(_MANIFEST_MAGIC))
+        if magic != _MANIFEST_MAGIC:
+            return _read_cache_db(filename, encoding)
+        manifest, contents = _read_manifest(filename, f.read())
+    key = _get_branch_key(branch)
+    for shard in manifest['shards']:
+        if shard['branch'] == key:
+            break
+    else:
+        return None
+    data = _read_indexed_file(
+        os.path.join(manifest['directory'], shard['file']))
+    data._file_contents = _BlobContents(data.file_blobs, contents)
+    return data
+
+
+def _json_default(value):
+    # The scanner reports commit SHAs as bytes.
+    if isinstance(value, bytes):
+        return value.decode('ascii')
+    # Values YAML can produce that JSON cannot represent, like dates,
+    # are converted to strings.
+    return str(value)
+
+
+def _encode(value):
+    # JSON escapes newlines inside strings, so each record fits on one
+    # line.
+    return json.dumps(
+        value, ensure_ascii=False, default=_json_default,
+    ).encode('utf-8') + b'\n'
+
+
+def _write_indexed_cache(cache, stream):
+    """Write the cache data in the indexed format.
+
+    The file contains the magic line, a JSON header holding the notes,
+    dates, freshness stamps, and blob SHAs, one JSON record per note
+    file, the table of contents mapping each filename to the offset
+    and length of its record, and finally a footer with the offset of
+    the table of contents.
+
+    """
+    stream.write(_INDEXED_MAGIC)
+    header = _encode({
+        'notes': cache['notes'],
+        'dates': cache['dates'],
+        'stamps': cache.get('stamps'),
+        'file-blobs': cache.get('file-blobs'),
+    })
+    stream.write(header)
+    offset = len(_INDEXED_MAGIC) + len(header)
+    toc = {}
+    for filename, contents in cache['file-contents'].items():
+        record = _encode(contents)
+        stream.write(record)
+        toc[filename] = (offset, len(record))
+        offset += len(record)
+    stream.write(_encode(toc))
+    stream.write(_FOOTER_FORMAT % offset)
+
+
+# The configuration options that change the output of the scanner.
+_SCAN_OPTIONS = [
+    'notesdir',
+    'collapse_pre_releases',
+    'stop_at_branch_base',
+    'branch',
+    'earliest_version',
+    'release_tag_re',
+    'pre_release_tag_re',
+    'branch_name_re',
+    'closed_branch_tag_re',
+    'branch_name_prefix',
+    'ignore_null_merges',
+    'ignore_notes',
+]
+
+
+def get_config_digest(conf, include_branch=True):
+    """Return a digest of the configuration options used for scanning.
+
+    The branch option only selects which branches are scanned, so it
+    is left out of the digest for data describing a single branch.
+
+    """
+    options = {name: getattr(conf, name) for name in _SCAN_OPTIONS}
+    if not include_branch:
+        del options['branch']
+    options['relnotesdir'] = conf.relnotesdir
+    # An empty entry in the list of notes to ignore has no effect.
+    options['ignore_notes'] = sorted(n for n in conf.ignore_notes if n)
+    return hashlib.sha1(
+        json.dumps(options, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+
+
+def _get_branch_key(branch):
+    return branch or 'HEAD'
+
+
+def _get_branch_from_key(key):
+    return None if key == 'HEAD' else key
+
+
+def get_stamps(conf, s, branches, branch_versions=None):
+    """Return the freshness stamps for a cache of the branches.
+
+    The stamps record the commit and notes directory tree at the head
+    of each branch, the tags, and a digest of the configuration
+    options that control the scan, so a reader can tell whether the
+    cache still describes the repository.
+
+    :param branch_versions: Optional mapping of branch keys to the
+        versions the scan of each branch produced, recorded so that
+        the output for the branch can be reused when it is updated.
+    """
+    branch_versions = branch_versions or {}
+    branch_states = {}
+    for branch in branches:
+        key = _get_branch_key(branch)
+        state = s.get_branch_state(branch)
+        # Remember the name of an unreleased version at the head of
+        # the branch, so it can be renamed if more commits are added
+        # without changing the notes.
+        latest_tag = s._get_latest_tag(branch)
+        state['version'] = (
+            s._get_current_version(branch, latest_tag)
+            if latest_tag[2] else None
+        )
+        if key in branch_versions:
+            state['versions'] = branch_versions[key]
+        branch_states[key] = state
+    return {
+        'branches': branch_states,
+        'tags': s.get_tags_digest(),
+        'tag-refs': s.get_tag_refs(),
+        'config': get_config_digest(conf),
+    }
+
+
+# Actions returned by check_cache_db().
+USE = 'use'
+REFRESH = 'refresh'
+RESCAN = 'rescan'
+
+
+def _cannot_check(reason):
+    "Return the action for a cache the repository cannot reproduce."
+    LOG.warning('using the cache file without checking it, because %s',
+                reason)
+    return (USE, reason)
+
+
+def _get_tag_changes(s, stamps, head):
+    """Describe changes to the tags that affect the history of a commit.
+
+    Returns a tuple containing the action to take and the reason, or
+    None if none of the tags added, moved, or removed since the cache
+    was built are in the history of the commit.
+
+    """
+    old_tag_refs = stamps.get('tag-refs')
+    if old_tag_refs is None:
+        # The cache was built before the tag refs were recorded.
+        return (RESCAN, 'the tags have changed')
+    missing = sorted(set(old_tag_refs) - set(s.get_tag_refs()))
+    if missing:
+        # Checkouts made for CI jobs and packaging often do not fetch
+        # all of the tags.
+        return _cannot_check('the repository does not have the tags {}'
+                             .format(', '.join(missing)))
+    commits = _get_changed_tag_commits(s, old_tag_refs)
+    if commits is None:
+        return _cannot_check('some tag objects are missing')
+    head = head.encode('ascii')
+    try:
+        for commit in commits:
+            if s.is_ancestor(commit, head):
+                return (RESCAN, 'the tags have changed')
+    except KeyError:
+        return _cannot_check('some tagged commits are missing')
+    return None
+
+
+def check_cache_db(conf, data, s=None):
+    """Decide whether cached data still describes the repository.
+
+    Returns a tuple containing the action to take and a description of
+    the reason. The action is USE if the cache matches the repository
+    or there is no way to check it, REFRESH if the head of the branch
+    has moved without changing the notes or tags, and RESCAN if the
+    cache is out of date.
+
+    Only the branch in the configuration, which is the one a Loader
+    shows, is compared. When the repository does not have the history
+    the cache was built from, such as in a shallow clone or a checkout
+    of a single branch, the cache is used, because scanning would find
+    fewer notes than it holds.
+
+    If s is given, it is the Scanner used to examine the repository.
+
+    """
+    if not data.stamps:
+        return (USE, 'the cache file has no freshness stamps')
+    if s is None:
+        try:
+            s = scanner.Scanner(conf)
+        except errors.NotGitRepository:
+            return (USE, 'there is no git repository to compare against')
+    if 'branch-config' in data.stamps:
+        # The shard of a sharded cache describes one branch.
+        config = data.stamps['branch-config']
+        expected = get_config_digest(conf, include_branch=False)
+    else:
+        config = data.stamps.get('config')
+        expected = get_config_digest(conf)
+    if config != expected:
+        return (RESCAN, 'the scan configuration has changed')
+    if s.is_shallow():
+        return _cannot_check('the repository is a shallow clone')
+    key = _get_branch_key(conf.branch)
+    old_state = data.stamps['branches'].get(key)
+    if old_state is None:
+        return (USE, 'the cache file has no freshness stamps for {}'
+                .format(key))
+    try:
+        state = s.get_branch_state(conf.branch)
+    except ValueError:
+        return _cannot_check('branch {} does not exist'.format(key))
+    if data.stamps.get('tags') != s.get_tags_digest():
+        changes = _get_tag_changes(s, data.stamps, state['commit'])
+        if changes is not None:
+            return changes
+    if state['commit'] == old_state['commit']:
+        return (USE, 'the cache file matches the repository')
+    if state['notes-tree'] != old_state['notes-tree']:
+        return (RESCAN, 'the notes on {} have changed'.format(key))
+    try:
+        rewritten = not s.is_ancestor(old_state['commit'].encode('ascii'),
+                                      state['commit'].encode('ascii'))
+    except KeyError:
+        # The old head is gone, so the history has been rewritten.
+        rewritten = True
+    if rewritten:
+        return (RESCAN, 'the history of {} has been rewritten'.format(key))
+    return (REFRESH, 'new commits without note changes on {}'.format(key))
+
+
+def _rename_unreleased_version(s, key, old_state, notes):
+    """Return notes with the unreleased version of the branch renamed.
+
+    The only part of the scanner output that depends on commits that
+    do not touch the notes or tags is the name of the unreleased
+    version at the head of the branch.
+
+    """
+    old_version = old_state.get('version')
+    if not old_version or old_version not in notes:
+        return notes
+    new_version = s._get_current_version(_get_branch_from_key(key))
+    if new_version == old_version:
+        return notes
+    LOG.info('renaming cached version %s to %s', old_version, new_version)
+    return collections.OrderedDict(
+        (new_version if version == old_version else version, files)
+        for version, files in notes.items()
+    )
+
+
+def refresh_cache_db(conf, data, s=None):
+    "Update cached data for a branch that moved without changing notes."
+    if s is None:
+        s = scanner.Scanner(conf)
+    key = _get_branch_key(conf.branch)
+    data.notes = _rename_unreleased_version(
+        s, key, data.stamps['branches'][key], data.notes)
+    return data
+
+
+def _get_changed_tag_commits(s, old_tag_refs):
+    """Return the commits with tags added, moved, or removed.
+
+    Returns None if the commits cannot be determined.
+
+    """
+    if old_tag_refs is None:
+        return None
+    tag_refs = s.get_tag_refs()
+    commits = set()
+    for name in set(tag_refs) | set(old_tag_refs):
+        if tag_refs.get(name) == old_tag_refs.get(name):
+            continue
+        for tag_sha in (tag_refs.get(name), old_tag_refs.get(name)):
+            if tag_sha is None:
+                continue
+            try:
+                commits.add(s.get_tagged_commit(name, tag_sha))
+            except KeyError:
+                # The tag object for a deleted tag may be gone.
+                return None
+    return commits
+
+
+def _get_reusable_notes(conf, s, branches, previous):
+    """Return the cached scanner output that is still valid.
+
+    Returns a dict mapping branch keys to the notes for the branch,
+    for the branches that have no new notes or tags in their history
+    since the previous cache was built.
+
+    """
+    stamps = previous.stamps
+    if not stamps:
+        LOG.info('the cache file has no freshness stamps')
+        return {}
+    if stamps.get('config') != get_config_digest(conf):
+        LOG.info('the scan configuration has changed')
+        return {}
+    tag_commits = set()
+    if stamps.get('tags') != s.get_tags_digest():
+        tag_commits = _get_changed_tag_commits(s, stamps.get('tag-refs'))
+        if tag_commits is None:
+            LOG.info('unable to determine which tags have changed')
+            return {}
+    reusable = {}
+    for branch in branches:
+        key = _get_branch_key(branch)
+        old_state = stamps['branches'].get(key)
+        if not old_state or 'versions' not in old_state:
+            LOG.info('no cached notes for %s', key)
+            continue
+        state = s.get_branch_state(branch)
+        head = state['commit'].encode('ascii')
+        moved = state['commit'] != old_state['commit']
+        if moved:
+            if state['notes-tree'] != old_state['notes-tree']:
+                LOG.info('the notes on %s have changed', key)
+                continue
+            if not s.is_ancestor(old_state['commit'].encode('ascii'), head):
+                LOG.info('the history of %s has been rewritten', key)
+                continue
+        if any(s.is_ancestor(c, head) for c in tag_commits):
+            LOG.info('the tags on %s have changed', key)
+            continue
+        # Versions found on several branches are only stored once in
+        # the combined notes, so prefer the data for the branch.
+        cached_notes = previous.branch_notes.get(key, previous.notes)
+        notes = collections.OrderedDict(
+            (version, cached_notes[version])
+            for version in old_state['versions']
+        )
+        if moved:
+            notes = _rename_unreleased_version(s, key, old_state, notes)
+        reusable[key] = notes
+    return reusable
+
+
+# The smallest number of notes worth starting worker processes for.
+MIN_PARALLEL_NOTES = 64
+
+# The number of notes handed to the workers at a time. Limiting it
+# bounds the number of parsed notes waiting to be written.
+_PARALLEL_BATCH_SIZE = 256
+
+# The repository opened by each worker process, and its root.
+_worker_repo = None
+_worker_reporoot = None
+
+
+def _load_blob(reporoot, blob_sha):
+    "Return the parsed contents of a blob, in a worker process."
+    global _worker_repo, _worker_reporoot
+    # The repository is opened by the first task a worker runs,
+    # because the initializer argument to ProcessPoolExecutor needs
+    # Python 3.7.
+    if _worker_reporoot != reporoot:
+        _worker_repo = scanner.RenoRepo(reporoot)
+        _worker_reporoot = reporoot
+    return yamlutils.safe_load(_worker_repo[blob_sha.encode('ascii')].data)
+
+
+def parse_blobs(reporoot, blob_shas, jobs):
+    """Yield the parsed contents of the blobs, in order.
+
+    The blobs are read and parsed by a pool of worker processes. They
+    are handed to the workers in batches, so only a limited number of
+    parsed notes are waiting to be used at any time.
+
+    :param reporoot: The root directory of the repository.
+    :param blob_shas: List of the SHAs of the blobs, as strings.
+    :param jobs: The number of worker processes to use.
+    """
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs) as executor:
+        for start in range(0, len(blob_shas), _PARALLEL_BATCH_SIZE):
+            batch = blob_shas[start:start + _PARALLEL_BATCH_SIZE]
+            reporoots = [reporoot] * len(batch)
+            for content in executor.map(_load_blob, reporoots, batch):
+                yield content
+
+
+class _NoteContents(object):
+    """Read-only mapping of note filenames to their parsed contents.
+
+    The notes are read and parsed when they are looked up, and nothing
+    is kept, so a writer that handles one note at a time only needs
+    memory for that note no matter how many there are.
+
+    Iterating over items() reads and parses each blob once, even if
+    several files share it, and uses a pool of worker processes to do
+    so when there are enough notes to make it worthwhile.
+
+    :param s: The Scanner to read the notes with.
+    :param files: Mapping of filenames to (sha, blob_sha) pairs giving
+        the commit to read each note from and the SHA of its blob, if
+        it has one.
+    :param previous: Optional CacheData to copy the contents of notes
+        with unchanged blobs from.
+    :param jobs: The number of worker processes to use.
+    """
+
+    def __init__(self, s, files, previous=None, jobs=1):
+        self._scanner = s
+        self._files = files
+        self._previous = previous
+        self._jobs = jobs
+
+    def _has_cached_blob(self, filename, blob_sha):
+        if self._previous is None or blob_sha is None:
+            return False
+        if self._previous.file_blobs.get(filename) != blob_sha:
+            return False
+        return self._previous.has_file_contents(filename)
+
+    def __getitem__(self, filename):
+        sha, blob_sha = self._files[filename]
+        if self._has_cached_blob(filename, blob_sha):
+            return self._previous.get_file_contents(filename)
+        body = self._scanner.get_file_at_commit(filename, sha)
+        # We want to save the contents of the file, which is YAML,
+        # inside another YAML file. That looks terribly ugly with all
+        # of the escapes needed to format it properly as embedded
+        # YAML, so parse the input and convert it to a data structure
+        # that can be serialized cleanly.
+        return yamlutils.safe_load(body)
+
+    def __contains__(self, filename):
+        return filename in self._files
+
+    def __len__(self):
+        return len(self._files)
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def close(self):
+        if self._previous is not None:
+            self._previous.close()
+
+    def _iter_parallel(self, filenames):
+        "Yield the parsed contents of the files, using worker processes."
+        blobs = [self._files[filename][1] for filename in filenames]
+        # The workers read the blobs, so count them here.
+        self._scanner.stats.blobs_read += sum(
+            1 for b in blobs if b is not None)
+        loaded = parse_blobs(
+            self._scanner.reporoot,
+            [b for b in blobs if b is not None],
+            self._jobs,
+        )
+        for filename, blob_sha in zip(filenames, blobs):
+            # Notes in the working copy have no blob, so they are
+            # read here.
+            if blob_sha is None:
+                yield self[filename]
+            else:
+                yield next(loaded)
+
+    def items(self):
+        # Decide which files need to be read, once for each blob.
+        to_read = []
+        blob_uses = collections.Counter()
+        for filename, (sha, blob_sha) in self._files.items():
+            if self._has_cached_blob(filename, blob_sha):
+                continue
+            if blob_sha is not None:
+                blob_uses[blob_sha] += 1
+                if blob_uses[blob_sha] > 1:
+                    continue
+            to_read.append(filename)
+
+        if self._jobs > 1 and len(to_read) >= MIN_PARALLEL_NOTES:
+            LOG.info('reading %d notes with %d workers',
+                     len(to_read), self._jobs)
+            read = iter(self._iter_parallel(to_read))
+        else:
+            read = (self[filename] for filename in to_read)
+
+        # The contents of blobs used by more than one file are kept
+        # until the last of those files has been handled.
+        shared = {}
+        for filename, (sha, blob_sha) in self._files.items():
+            if self._has_cached_blob(filename, blob_sha):
+                yield filename, self._previous.get_file_contents(filename)
+                continue
+            if blob_sha is None:
+                yield filename, next(read)
+                continue
+            if blob_sha in shared:
+                content = shared[blob_sha]
+            else:
+                content = next(read)
+                shared[blob_sha] = content
+            blob_uses[blob_sha] -= 1
+            if not blob_uses[blob_sha]:
+                del shared[blob_sha]
+            yield filename, content
+
+
+class _ContentsByBlob(object):
+    """Note contents keyed by blob SHA, with each blob appearing once.
+
+    Notes read from the working copy have no blob, so they are keyed
+    by their filename.
+
+    :param file_contents: Mapping of filenames to parsed contents.
+    :param file_blobs: Mapping of filenames to blob SHAs.
+    """
+
+    def __init__(self, file_contents, file_blobs):
+        self._file_contents = file_contents
+        self._file_blobs = file_blobs
+
+    def items(self):
+        seen = set()
+        for filename, contents in self._file_contents.items():
+            key = self._file_blobs.get(filename, filename)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield key, contents
+
+
+def build_cache_db(conf, versions_to_include, previous=None, jobs=1):
+    """Build the cache data structure for the release notes.
+
+    :param conf: Parsed configuration.
+    :param versions_to_include: The versions whose notes should have
+        their contents included. All versions are included if the
+        list is empty.
+    :param previous: Optional CacheData loaded from an earlier cache
+        file. Branches with no new notes or tags since then are not
+        scanned again, and the contents of notes whose blobs have not
+        changed are reused.
+    :param jobs: The number of worker processes to use for reading
+        and parsing the notes.
+    """
+    with timing.timer('cache.build'):
+        cache = _build_cache(conf, versions_to_include, previous, jobs)[0]
+        cache['file-contents'] = dict(cache['file-contents'].items())
+    return cache
+
+
+def _build_cache(conf, versions_to_include, previous, jobs=1):
+    """Build the cache data structure for the release notes.
+
+    The contents of the notes are not read until they are used, so
+    they can be written one at a time.
+
+    Returns a tuple containing the cache data structure and a mapping
+    of branch keys to the notes found on each branch.
+
+    """
     s = scanner.Scanner(conf)
 
     branches = [conf.branch]
     if not conf.branch:  # if no branch requested, scan all
         branches += s.get_series_branches()
 
+    reusable = {}
+    if previous is not None:
+        reusable = _get_reusable_notes(conf, s, branches, previous)
+
     notes = collections.OrderedDict()
+    notes_by_branch = collections.OrderedDict()
     for branch in branches:
-        notes.update(s.get_notes_by_version(branch))
+        key = _get_branch_key(branch)
+        if key in reusable:
+            LOG.info('reusing cached notes for %s', key)
+            branch_notes = reusable[key]
+        else:
+            branch_notes = s.get_notes_by_version(branch)
+        notes_by_branch[key] = branch_notes
+        notes.update(branch_notes)
+    branch_versions = {
+        key: list(branch_notes.keys())
+        for key, branch_notes in notes_by_branch.items()
+    }
 
     # Default to including all versions returned by the scanner.
     if not versions_to_include:
@@ -37,17 +996,27 @@ def build_cache_db(conf, versions_to_include):
 
     # Build a cache data structure including the file contents as well
     # as the basic data returned by the scanner.
-    file_contents = {}
+    files = {}
+    file_blobs = {}
+    blob_shas = {}
     for version in versions_to_include:
         for filename, sha in notes[version]:
-            body = s.get_file_at_commit(filename, sha)
-            # We want to save the contents of the file, which is YAML,
-            # inside another YAML file. That looks terribly ugly with
-            # all of the escapes needed to format it properly as
-            # embedded YAML, so parse the input and convert it to a
-            # data structure that can be serialized cleanly.
-            y = yaml.safe_load(body)
-            file_contents[filename] = y
+            # The same file is often listed for several versions when
+            # branches are combined, so only look up each blob once.
+            if (filename, sha) not in blob_shas:
+                blob_sha = None
+                if sha is not None:
+                    blob_sha = s.get_blob_sha_at_commit(filename, sha)
+                if blob_sha is not None:
+                    blob_sha = blob_sha.decode('ascii')
+                blob_shas[(filename, sha)] = blob_sha
+            blob_sha = blob_shas[(filename, sha)]
+            if blob_sha is not None:
+                file_blobs[filename] = blob_sha
+            files[filename] = (sha, blob_sha)
+    # Sort the files so the contents are written in the same order
+    # every time.
+    files = collections.OrderedDict(sorted(files.items()))
 
     cache = {
         'notes': [
@@ -58,13 +1027,16 @@ def build_cache_db(conf, versions_to_include):
             {'version': k, 'date': v}
             for k, v in s.get_version_dates().items()
         ],
-        'file-contents': file_contents,
+        'file-contents': _NoteContents(s, files, previous, jobs),
+        'file-blobs': file_blobs,
+        'stamps': get_stamps(conf, s, branches, branch_versions),
     }
-    return cache
+    return cache, notes_by_branch
 
 
 def write_cache_db(conf, versions_to_include,
-                   outfilename=None):
+                   outfilename=None, format='yaml', update=False,
+                   compression=None, jobs=1):
     """Create a cache database file for the release notes data.
 
     Build the cache database from scanning the project history and
@@ -76,45 +1048,249 @@ def write_cache_db(conf, versions_to_include,
     instead. Otherwise, if outfilename is given, the data overwrites
     the named file.
 
+    The format is one of the values in FORMATS.
+
+    The compression is one of the values in COMPRESSIONS, or None. If
+    it is None and the name of the output file ends with the extension
+    for one of the compression methods, that method is used.
+
+    If update is true, the existing cache file (outfilename, or the
+    default file when writing to stdout) is used to avoid scanning
+    branches and parsing notes that have not changed.
+
+    The notes are read and parsed by up to jobs worker processes.
+
     Return the name of the file created, if any.
 
     """
-    encoding = conf.options['encoding']
-    if outfilename == '-':
-        stream = sys.stdout
-        close_stream = False
-    elif outfilename:
-        stream = open(outfilename, 'w', encoding=encoding)
-        close_stream = True
-    else:
-        outfilename = loader.get_cache_filename(conf)
+    if format not in FORMATS:
+        raise ValueError('unknown cache format {!r}'.format(format))
+    if format == 'sharded' and outfilename == '-':
+        raise ValueError('a sharded cache cannot be written to stdout')
+    if compression is None and outfilename and outfilename != '-':
+        for name in COMPRESSIONS:
+            if outfilename.endswith(_COMPRESSION_EXTENSIONS[name]):
+                compression = name
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError('unknown compression {!r}'.format(compression))
+
+    if not outfilename:
+        outfilename = get_cache_filename(conf)
         if not os.path.exists(os.path.dirname(outfilename)):
             os.makedirs(os.path.dirname(outfilename))
-        stream = open(outfilename, 'w', encoding=encoding)
-        close_stream = True
-    try:
-        cache = build_cache_db(
+
+    previous = None
+    if update:
+        if outfilename == '-':
+            previous_filename = get_cache_filename(conf)
+        else:
+            previous_filename = outfilename
+        if os.path.exists(previous_filename):
+            LOG.info('updating cache file %s', previous_filename)
+            previous = read_cache_db(
+                previous_filename, encoding=conf.options['encoding'],
+            )
+        else:
+            LOG.info('no cache file %s to update', previous_filename)
+
+    with timing.timer('cache.build'):
+        cache, notes_by_branch = _build_cache(
             conf,
             versions_to_include=versions_to_include,
+            previous=previous,
+            jobs=jobs,
         )
-        yaml.safe_dump(
-            cache,
-            stream,
-            allow_unicode=True,
-            explicit_start=True,
-            encoding='utf-8',
-        )
-    finally:
-        if close_stream:
-            stream.close()
+
+    if format == 'sharded':
+        _write_sharded_cache(conf, cache, notes_by_branch, outfilename,
+                             compression)
+        return outfilename
+
+    encoding = conf.options['encoding']
+    if outfilename == '-':
+        if format == 'yaml' and compression is None:
+            _write_cache(cache, sys.stdout, format)
+        else:
+            _write_cache_file(cache, sys.stdout.buffer, format,
+                              compression, encoding)
+        return outfilename
+
+    # Write to a temporary file and rename it, so readers never see a
+    # partial file and the previous cache can be read while the new
+    # one is written.
+    tmpname = '{}.{}.tmp'.format(outfilename, os.getpid())
+    try:
+        with open(tmpname, 'wb') as f:
+            _write_cache_file(cache, f, format, compression, encoding)
+        os.replace(tmpname, outfilename)
+    except Exception:
+        os.unlink(tmpname)
+        raise
     return outfilename
 
 
+def _get_manifest_directory(filename):
+    "Return the shard directory named by an existing manifest, or None."
+    try:
+        with open(filename, 'rb') as raw:
+            f = _open_decompressed(raw)
+            if f.read(len(_MANIFEST_MAGIC)) != _MANIFEST_MAGIC:
+                return None
+            dirname = json.loads(f.read().decode('utf-8'))['directory']
+    except (IOError, ValueError, KeyError):
+        return None
+    # Only remove directories written for this cache file.
+    if os.path.basename(dirname) != dirname:
+        return None
+    if not dirname.startswith(os.path.basename(filename) + '.d'):
+        return None
+    return os.path.join(os.path.dirname(filename), dirname)
+
+
+def _write_sharded_cache(conf, cache, notes_by_branch, filename,
+                         compression=None):
+    """Write the cache data as a manifest and one shard per branch.
+
+    The manifest is written to filename. The shards, which are indexed
+    cache files holding the notes for one branch, are written to a
+    directory next to it along with a store of the note contents. The
+    contents are stored once for each blob, no matter how many
+    branches include the note. Each file is compressed with the given
+    method, if any.
+
+    Each time the cache is written the shards go to a new directory,
+    and the manifest naming it replaces the old one in a single step,
+    so readers see either the old or the new cache. The directory
+    named by the old manifest is removed afterwards.
+
+    """
+    dirname = '{}.d.{}'.format(os.path.basename(filename),
+                               binascii.hexlify(os.urandom(6)).decode())
+    directory = os.path.join(os.path.dirname(filename), dirname)
+    olddir = _get_manifest_directory(filename)
+    tmpname = '{}.{}.tmp'.format(filename, os.getpid())
+
+    file_blobs = cache['file-blobs']
+    contents = _ContentsByBlob(cache['file-contents'], file_blobs)
+
+    stamps = cache['stamps']
+    shards = []
+    os.makedirs(directory)
+    try:
+        with open(os.path.join(directory, 'contents'), 'wb') as f:
+            _write_cache_file(
+                {'notes': [], 'dates': [], 'file-contents': contents},
+                f, 'indexed', compression)
+        for n, (key, branch_notes) in enumerate(notes_by_branch.items()):
+            shard = {'branch': key, 'file': 'branch-{}'.format(n)}
+            with open(os.path.join(directory, shard['file']), 'wb') as f:
+                _write_cache_file({
+                    'notes': [
+                        {'version': k, 'files': v}
+                        for k, v in branch_notes.items()
+                    ],
+                    'dates': cache['dates'],
+                    'file-contents': {},
+                    'file-blobs': {
+                        note_filename: file_blobs[note_filename]
+                        for files in branch_notes.values()
+                        for note_filename, sha in files
+                        if note_filename in file_blobs
+                    },
+                    'stamps': {
+                        'branches': {key: stamps['branches'][key]},
+                        'tags': stamps['tags'],
+                        'tag-refs': stamps['tag-refs'],
+                        'branch-config': get_config_digest(
+                            conf, include_branch=False),
+                    },
+                }, f, 'indexed', compression)
+            shards.append(shard)
+        with open(tmpname, 'wb') as f, _compressed(f, compression) as out:
+            out.write(_MANIFEST_MAGIC)
+            out.write(_encode({
+                'directory': dirname,
+                'contents': 'contents',
+                'shards': shards,
+                'dates': cache['dates'],
+                'stamps': stamps,
+            }))
+        os.replace(tmpname, filename)
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        if os.path.exists(tmpname):
+            os.unlink(tmpname)
+        raise
+    if olddir is not None:
+        shutil.rmtree(olddir, ignore_errors=True)
+
+
+def _write_yaml_cache(cache, stream):
+    """Write the cache data as a YAML document.
+
+    The document is written one top-level key at a time, with the
+    contents of the notes last so the index is written before any note
+    is read. The notes are written one at a time so they never all need
+    to be in memory.
+
+    """
+    stream.write('---\n')
+    for key in sorted(cache, key=lambda k: (k == 'file-contents', k)):
+        value = cache[key]
+        if key != 'file-contents' or not len(value):
+            yamlutils.safe_dump(
+                {key: value}, stream, allow_unicode=True, encoding='utf-8',
+            )
+            continue
+        stream.write('{}:\n'.format(key))
+        for filename, contents in value.items():
+            # Indenting the document for a single note makes it a
+            # valid entry in the enclosing mapping.
+            text = yamlutils.safe_dump(
+                {filename: contents}, allow_unicode=True,
+            )
+            stream.write(textwrap.indent(text, '  ', lambda line: True))
+
+
+def _write_cache(cache, stream, format):
+    with timing.timer('cache.write'):
+        if format == 'yaml':
+            _write_yaml_cache(cache, stream)
+        else:
+            _write_indexed_cache(cache, stream)
+
+
+@contextlib.contextmanager
+def _compressed(f, compression):
+    "Yield a stream writing to f with the compression, if any."
+    if compression is None:
+        yield f
+        return
+    with _open_compressed(f, compression) as stream:
+        yield stream
+
+
+def _write_cache_file(cache, f, format, compression=None, encoding=None):
+    "Write the cache data to a binary file, compressing it if asked."
+    with _compressed(f, compression) as stream:
+        if format == 'yaml':
+            text = io.TextIOWrapper(stream, encoding=encoding)
+            _write_cache(cache, text, format)
+            # Flush the text and leave the binary stream open.
+            text.detach()
+        else:
+            _write_cache(cache, stream, format)
+
+
 def cache_cmd(args, conf):
     "Generates a release notes cache"
     write_cache_db(
         conf=conf,
         versions_to_include=args.version,
         outfilename=args.output,
+        format=args.format,
+        update=args.update,
+        compression=args.compression,
+        jobs=args.jobs,
     )
     return
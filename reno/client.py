@@ -0,0 +1,45 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Send commands to a server started with reno serve.
+
+The client is kept separate from reno.server, and only uses the
+standard library, so sending a command does not import the libraries
+the server uses to read the repository.
+
+"""
+
+import json
+import os
+import socket
+
+
+def call(path, argv, cwd=None):
+    """Send a command to the server listening on the socket.
+
+    Returns a dict with the exit code of the command and the text it
+    wrote to standard output and standard error. Raises OSError if
+    the server cannot be reached.
+
+    """
+    request = {'argv': list(argv), 'cwd': cwd or os.getcwd()}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError('no response from %s' % path)
+    try:
+        return json.loads(line.decode('utf-8'))
+    except ValueError:
+        raise ConnectionError('invalid response from %s' % path)
@@ -15,8 +15,6 @@ import logging
 import os.path
 import textwrap
 
-import yaml
-
 from reno import defaults
 
 LOG = logging.getLogger(__name__)
@@ -189,6 +187,42 @@ _OPTIONS = [
         codec or alias from stdlib's codec module is valid.
         """)),
 
+    Opt('parse_cache', True,
+        textwrap.dedent("""\
+        Should the parsed contents of committed note files be saved
+        inside the git repository directory (True), so that notes
+        which have not changed since an earlier run are not parsed
+        again? The cache is keyed by the SHA of the git blob holding
+        the note, so it is shared by all branches.
+        """)),
+
+    Opt('shared_cache', False,
+        textwrap.dedent("""\
+        Should cached data be saved in a directory shared by all clones
+        and worktrees of the repository (True), instead of inside the
+        git repository directory? Besides the parsed notes, the shared
+        cache holds the commits that tags refer to and the changes to
+        the notes directory made by each commit. Entries are keyed by
+        the SHAs of git objects, which never change, so they are valid
+        in any copy of the repository. Shallow clones do not use the
+        shared cache.
+        """)),
+
+    Opt('shared_cache_dir', None,
+        textwrap.dedent("""\
+        The directory for the shared cache. Defaults to ``reno`` inside
+        ``$XDG_CACHE_HOME``, or ``~/.cache/reno`` if that variable is
+        not set.
+        """)),
+
+    Opt('shared_cache_size', 256 * 1024 * 1024,
+        textwrap.dedent("""\
+        The maximum size of the shared cache, in bytes. When reno
+        starts using a cache that has grown larger, the least recently
+        used entries are removed. The size is checked at most once a
+        day.
+        """)),
+
     Opt('semver_major', ['upgrade'],
         textwrap.dedent("""\
         The sections that indicate release notes triggering major version
@@ -251,9 +285,12 @@ class Config(object):
             self._report_missing_config_files(filenames)
             return
 
+        # PyYAML is only imported when there is a file to read, so
+        # commands that do not need it start faster.
+        from reno import yamlutils
         try:
             with open(filename, 'r') as fd:
-                self._contents = yaml.safe_load(fd)
+                self._contents = yamlutils.safe_load(fd)
             LOG.info('loaded configuration file %s', filename)
         except IOError as err:
             self._report_failure_config_file(filename, err)
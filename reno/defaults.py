@@ -85,6 +85,18 @@ other:
     some details.
 """
 
+# The formats of the cache file, described in reno.cache. They are
+# defined here so the command line parser does not need to import the
+# cache module.
+CACHE_FORMATS = ('yaml', 'indexed', 'sharded')
+
+# The compression methods for the cache file.
+CACHE_COMPRESSIONS = ('gzip', 'xz')
+
+# The commands reno serve runs for its clients. Others always run in
+# the client.
+SERVER_COMMANDS = ('list', 'report', 'lint', 'semver-next')
+
 # default filename of a release notes file generated by the setuptool extension
 RELEASE_NOTES_FILENAME = 'RELEASENOTES.rst'
 
@@ -10,6 +10,11 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import json
+
+from reno import model
+from reno import timing
+
 
 def _indent_for_list(text, prefix='  '):
     """Indent some text to make it work as a list entry.
@@ -41,77 +46,324 @@ def _section_anchor(section_title, version_title, title, branch):
     )
 
 
+def format_title(title):
+    "Return the heading at the top of a report."
+    return '\n'.join(_format_title(title))
+
+
+def _format_title(title):
+    return [
+        '=' * len(title),
+        title,
+        '=' * len(title),
+        '',
+    ]
+
+
+def format_version(loader, config, version, title=None,
+                   show_source=True, branch=None):
+    """Return the part of a report describing one version.
+
+    The result is the same as the part of the output of
+    format_report() for the version.
+
+    """
+    version = model.build_version(loader, config, version)
+    with timing.timer('formatter.render'):
+        return '\n'.join(_format_version(
+            version, title, show_source, branch,
+        ))
+
+
+def format_versions(loader, config, versions, title=None,
+                    show_source=True, branch=None):
+    """Produce the result of format_version() for each of the versions.
+
+    The notes are parsed using model.iter_versions(), so a loader that
+    parses in parallel can share the work for several versions.
+
+    """
+    for version, text in iter_version_reports(
+            loader, config, versions, title=title,
+            show_source=show_source, branch=branch):
+        yield text
+
+
+def iter_version_reports(loader, config, versions, title=None,
+                         show_source=True, branch=None):
+    """Produce a (version, text) pair for each of the versions.
+
+    The text is the result of format_version(), and the version is the
+    model.Version it was rendered from.
+
+    """
+    for version in model.iter_versions(loader, config, versions):
+        with timing.timer('formatter.render'):
+            text = '\n'.join(_format_version(
+                version, title, show_source, branch,
+            ))
+        yield version, text
+
+
+def format_index(title, names):
+    """Return a document linking to the documents for each version.
+
+    :param title: The title of the document, or None.
+    :param names: The names of the documents, without the extension.
+    """
+    lines = []
+    if title:
+        lines.extend(_format_title(title))
+    lines.extend(['.. toctree::', '   :maxdepth: 1', ''])
+    lines.extend('   ' + name for name in names)
+    lines.append('')
+    return '\n'.join(lines)
+
+
+def iter_report(loader, config, versions_to_include, title=None,
+                show_source=True, branch=None, format='rst'):
+    """Produce the text of a report one version at a time.
+
+    The notes for each version are only parsed when the version, or
+    the group of versions it is parsed with, is reached, so the report
+    can be written as it is produced. Joining
+    the pieces of an "rst" report gives the same text as
+    format_report().
+
+    """
+    renderer = _RENDERERS[format](title, show_source, branch)
+    header = renderer.header()
+    if header:
+        yield header
+    for version in model.iter_versions(loader, config, versions_to_include):
+        with timing.timer('formatter.render'):
+            text = renderer.version(version)
+        yield text
+    footer = renderer.footer()
+    if footer:
+        yield footer
+
+
+def write_report(stream, loader, config, versions_to_include, title=None,
+                 show_source=True, branch=None, format='rst'):
+    "Write the report to the file-like object, one version at a time."
+    write_reports([(format, stream)], loader, config, versions_to_include,
+                  title=title, show_source=show_source, branch=branch)
+
+
+def write_reports(outputs, loader, config, versions_to_include, title=None,
+                  show_source=True, branch=None):
+    """Write the report in several formats.
+
+    The notes are read once and each version is written to all of the
+    outputs before moving on to the next one.
+
+    :param outputs: List of (format, stream) pairs, where format is
+        one of FORMATS and stream is a file-like object.
+    """
+    renderers = [
+        (stream, _RENDERERS[format](title, show_source, branch))
+        for format, stream in outputs
+    ]
+    for stream, renderer in renderers:
+        stream.write(renderer.header())
+    for version in model.iter_versions(loader, config, versions_to_include):
+        with timing.timer('formatter.render'):
+            texts = [renderer.version(version) for _, renderer in renderers]
+        for (stream, renderer), text in zip(renderers, texts):
+            stream.write(text)
+    for stream, renderer in renderers:
+        stream.write(renderer.footer())
+
+
 def format_report(loader, config, versions_to_include, title=None,
                   show_source=True, branch=None):
+    return ''.join(iter_report(
+        loader, config, versions_to_include, title=title,
+        show_source=show_source, branch=branch,
+    ))
+
+
+def _sha_text(sha):
+    # The scanner reports commit SHAs as bytes.
+    if isinstance(sha, bytes):
+        return sha.decode('ascii')
+    return sha
+
+
+class _RSTRenderer(object):
+    "Render a report as reStructuredText."
+
+    def __init__(self, title, show_source, branch):
+        self._title = title
+        self._show_source = show_source
+        self._branch = branch
+        self._first = True
+
+    def _join(self, lines):
+        text = '\n'.join(lines)
+        if not self._first:
+            text = '\n' + text
+        self._first = False
+        return text
+
+    def header(self):
+        if not self._title:
+            return ''
+        return self._join(_format_title(self._title))
+
+    def version(self, version):
+        return self._join(_format_version(
+            version, self._title, self._show_source, self._branch,
+        ))
+
+    def footer(self):
+        return ''
+
+
+class _MarkdownRenderer(object):
+    """Render a report as Markdown.
+
+    The text of the notes is copied as it is written, so any
+    reStructuredText markup in it is left alone.
+
+    """
+
+    def __init__(self, title, show_source, branch):
+        self._title = title
+        self._show_source = show_source
+
+    def _source(self, entry):
+        return '<!-- %s @ %s -->' % (entry.filename, _sha_text(entry.sha))
+
+    def header(self):
+        if not self._title:
+            return ''
+        return '# %s\n\n' % self._title
+
+    def version(self, version):
+        lines = ['## ' + version.title, '']
+        if version.date is not None:
+            lines.extend(['Release Date: ' + version.date, ''])
+        if version.prelude is not None:
+            lines.extend(['### ' + version.prelude.title, ''])
+            for entry in version.prelude.entries:
+                if self._show_source:
+                    lines.append(self._source(entry))
+                lines.extend([str(entry.text).rstrip('\n'), ''])
+        for section in version.sections:
+            lines.extend(['### ' + section.title, ''])
+            for entry in section.entries:
+                lines.append(
+                    '- ' + _indent_for_list(str(entry.text)).rstrip('\n'))
+                if self._show_source:
+                    # Indented to keep the comment inside the list item.
+                    lines.append('  ' + self._source(entry))
+            lines.append('')
+        return '\n'.join(lines) + '\n'
+
+    def footer(self):
+        return ''
+
+
+class _JSONRenderer(object):
+    "Render a report as a JSON document."
+
+    def __init__(self, title, show_source, branch):
+        self._title = title
+        self._show_source = show_source
+        self._branch = branch
+        self._first = True
+
+    def _entry(self, entry):
+        data = {'text': entry.text}
+        if self._show_source:
+            data['filename'] = entry.filename
+            data['sha'] = _sha_text(entry.sha)
+        return data
+
+    def header(self):
+        return '{"title": %s, "branch": %s, "versions": [' % (
+            json.dumps(self._title), json.dumps(self._branch))
+
+    def version(self, version):
+        prelude = []
+        if version.prelude is not None:
+            prelude = [self._entry(e) for e in version.prelude.entries]
+        data = {
+            'version': version.version,
+            'title': version.title,
+            'released': version.is_released,
+            'date': version.date,
+            'prelude': prelude,
+            'sections': [
+                {
+                    'name': section.name,
+                    'title': section.title,
+                    'entries': [self._entry(e) for e in section.entries],
+                }
+                for section in version.sections
+            ],
+        }
+        text = json.dumps(data, default=str)
+        if not self._first:
+            text = ',' + text
+        self._first = False
+        return '\n' + text
+
+    def footer(self):
+        return '\n]}\n'
+
+
+_RENDERERS = {
+    'rst': _RSTRenderer,
+    'md': _MarkdownRenderer,
+    'json': _JSONRenderer,
+}
+
+# The names of the report formats.
+FORMATS = tuple(_RENDERERS)
+
+
+def _format_version(version, title, show_source, branch):
     report = []
-    if title:
-        report.append('=' * len(title))
-        report.append(title)
-        report.append('=' * len(title))
+    report.append(_anchor(version.title, title, branch))
+    report.append('')
+    report.append(version.title)
+    report.append('=' * len(version.title))
+    report.append('')
+
+    if version.date is not None:
+        report.append('Release Date: ' + version.date)
         report.append('')
 
-    # Read all of the notes files.
-    file_contents = {}
-    for version in versions_to_include:
-        for filename, sha in loader[version]:
-            body = loader.parse_note_file(filename, sha)
-            file_contents[filename] = body
-
-    for version in versions_to_include:
-        if '-' in version:
-            # This looks like an "unreleased version".
-            version_title = config.unreleased_version_title or version
-        else:
-            version_title = version
-        report.append(_anchor(version_title, title, branch))
+    # Add the preludes.
+    if version.prelude is not None:
+        prelude = version.prelude
+        report.append(_section_anchor(
+            prelude.title, version.title, title, branch))
         report.append('')
-        report.append(version_title)
-        report.append('=' * len(version_title))
+        report.append(prelude.title)
+        report.append('-' * len(prelude.name))
         report.append('')
-
-        if config.add_release_date:
-            report.append('Release Date: ' + loader.get_version_date(version))
-            report.append('')
-
-        # Add the preludes.
-        notefiles = loader[version]
-        prelude_name = config.prelude_section_name
-        notefiles_with_prelude = [(n, sha) for n, sha in notefiles
-                                  if prelude_name in file_contents[n]]
-        if notefiles_with_prelude:
-            prelude_title = prelude_name.replace('_', ' ').title()
-            report.append(_section_anchor(
-                prelude_title, version_title, title, branch))
-            report.append('')
-            report.append(prelude_title)
-            report.append('-' * len(prelude_name))
+        for entry in prelude.entries:
+            if show_source:
+                report.append('.. %s @ %s\n' % (entry.filename, entry.sha))
+            report.append(entry.text)
             report.append('')
 
-        for n, sha in notefiles_with_prelude:
+    # Add other sections.
+    for section in version.sections:
+        report.append(_section_anchor(
+            section.title, version.title, title, branch))
+        report.append('')
+        report.append(section.title)
+        report.append('-' * len(section.title))
+        report.append('')
+        for entry in section.entries:
             if show_source:
-                report.append('.. %s @ %s\n' % (n, sha))
-            report.append(file_contents[n][prelude_name])
-            report.append('')
+                report.append('.. %s @ %s\n' % (entry.filename, entry.sha))
+            report.append('- %s' % _indent_for_list(entry.text))
+        report.append('')
 
-        # Add other sections.
-        for section_name, section_title in config.sections:
-            notes = [
-                (n, fn, sha)
-                for fn, sha in notefiles
-                if file_contents[fn].get(section_name)
-                for n in file_contents[fn].get(section_name, [])
-            ]
-            if notes:
-                report.append(_section_anchor(
-                    section_title, version_title, title, branch))
-                report.append('')
-                report.append(section_title)
-                report.append('-' * len(section_title))
-                report.append('')
-                for n, fn, sha in notes:
-                    if show_source:
-                        report.append('.. %s @ %s\n' % (fn, sha))
-                    report.append('- %s' % _indent_for_list(n))
-                report.append('')
-
-    return '\n'.join(report)
+    return report
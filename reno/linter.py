@@ -14,7 +14,6 @@ import glob
 import logging
 import os.path
 
-from reno import loader
 from reno import scanner
 
 LOG = logging.getLogger(__name__)
@@ -27,7 +26,7 @@ def lint_cmd(args, conf):
     notes = glob.glob(os.path.join(notesdir, '*.yaml'))
 
     error = 0
-    load = loader.Loader(conf, ignore_cache=True)
+    load = args.make_loader(conf, ignore_cache=True)
     allowed_section_names = [conf.prelude_section_name] + \
                             [s[0] for s in conf.sections]
 
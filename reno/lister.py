@@ -11,8 +11,8 @@
 # under the License.
 
 import logging
+import sys
 
-from reno import loader
 
 LOG = logging.getLogger(__name__)
 
@@ -21,7 +21,7 @@ def list_cmd(args, conf):
     "List notes files based on query arguments"
     LOG.debug('starting list')
     reporoot = conf.reporoot
-    ldr = loader.Loader(conf)
+    ldr = args.make_loader(conf)
     if args.version:
         versions = args.version
     else:
@@ -33,4 +33,16 @@ def list_cmd(args, conf):
             if n.startswith(reporoot):
                 n = n[len(reporoot):]
             print('\t%s (%s)' % (n, sha))
+    if args.stats:
+        _print_stats(ldr)
     return
+
+
+def _print_stats(ldr):
+    stats = ldr.scan_stats
+    if stats is None:
+        print('the notes were read from the cache file, '
+              'so the history was not scanned', file=sys.stderr)
+        return
+    for name, value in stats.as_dict().items():
+        print('%s: %s' % (name, value), file=sys.stderr)
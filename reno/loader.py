@@ -10,28 +10,33 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import collections
+import copy
 from datetime import datetime
 import logging
 import os.path
 
-import yaml
-
+from reno import cache
+from reno import notecache
 from reno import scanner
+from reno import timing
+from reno import yamlutils
 
 LOG = logging.getLogger(__name__)
 
 
-def get_cache_filename(conf):
-    return os.path.normpath(os.path.join(
-        conf.reporoot, conf.notespath, 'reno.cache'))
+# The cache file handling moved to the cache module. The name is kept
+# here for the benefit of existing callers.
+get_cache_filename = cache.get_cache_filename
 
 
 class Loader(object):
     "Load the release notes for a given repository."
 
     def __init__(self, conf,
-                 ignore_cache=False):
+                 ignore_cache=False,
+                 stop_at_latest_tag=False,
+                 scanner=None,
+                 jobs=1):
         """Initialize a Loader.
 
         The versions are presented in reverse chronological order.
@@ -43,9 +48,21 @@ class Loader(object):
         :type conf: reno.config.Config
         :param ignore_cache: Do not load a cache file if it is present.
         :type ignore_cache: bool
+        :param stop_at_latest_tag: Only scan the history since the most
+            recent release tag. Implies ignore_cache.
+        :type stop_at_latest_tag: bool
+        :param scanner: An existing Scanner for the repository to use
+            instead of creating a new one, so that several loaders can
+            share what it has already read. It must have been created
+            with the same configuration, apart from the branch.
+        :type scanner: reno.scanner.Scanner
+        :param jobs: The number of worker processes parse_note_files()
+            may use to read and parse notes.
+        :type jobs: int
         """
         self._config = conf
-        self._ignore_cache = ignore_cache
+        self._ignore_cache = ignore_cache or stop_at_latest_tag
+        self._stop_at_latest_tag = stop_at_latest_tag
 
         self._reporoot = conf.reporoot
         self._notespath = conf.notespath
@@ -54,13 +71,17 @@ class Loader(object):
         self._earliest_version = conf.earliest_version
 
         self._cache = None
-        self._scanner = None
+        self._note_cache = None
+        self._scanner = scanner
         self._scanner_output = None
         self._tags_to_dates = None
-        self._cache_filename = get_cache_filename(conf)
+        self._scan_stats = None
+        self._cache_filename = cache.get_cache_filename(conf)
         self._encoding = conf.options['encoding']
+        self._jobs = jobs
 
-        self._load_data()
+        with timing.timer('loader.load'):
+            self._load_data()
 
     def _load_data(self):
         cache_file_exists = os.path.exists(self._cache_filename)
@@ -70,29 +91,94 @@ class Loader(object):
 
         if (not self._ignore_cache) and cache_file_exists:
             LOG.debug('loading cache file %s', self._cache_filename)
-            with open(self._cache_filename, 'r', encoding=self._encoding) as f:
-                self._cache = yaml.safe_load(f.read())
-                # Save the cached scanner output to the same attribute
-                # it would be in if we had loaded it "live". This
-                # simplifies some of the logic in the other methods.
-                self._scanner_output = collections.OrderedDict(
-                    (n['version'], n['files'])
-                    for n in self._cache['notes']
-                )
-                self._tags_to_dates = collections.OrderedDict(
-                    (n['version'], n['date'])
-                    for n in self._cache['dates']
+            data = cache.read_branch_cache_db(
+                self._cache_filename, self._branch, encoding=self._encoding,
+            )
+            if data is None:
+                action, reason = (
+                    cache.RESCAN,
+                    'it has no data for {}'.format(
+                        self._branch or 'the current branch'),
                 )
+            else:
+                with timing.timer('cache.check'):
+                    action, reason = cache.check_cache_db(
+                        self._config, data, s=self._scanner,
+                    )
+            if action == cache.RESCAN:
+                LOG.info('not using cache file %s because %s',
+                         self._cache_filename, reason)
+                if data is not None:
+                    data.close()
+            else:
+                if action == cache.REFRESH:
+                    LOG.info('refreshing data from cache file %s '
+                             'because there are %s',
+                             self._cache_filename, reason)
+                    with timing.timer('cache.refresh'):
+                        data = cache.refresh_cache_db(
+                            self._config, data, s=self._scanner,
+                        )
+                else:
+                    LOG.info('using cache file %s because %s',
+                             self._cache_filename, reason)
+                self._cache = data
+
+        if self._cache is not None:
+            # Save the cached scanner output to the same attribute
+            # it would be in if we had loaded it "live". This
+            # simplifies some of the logic in the other methods.
+            self._scanner_output = self._cache.notes
+            self._tags_to_dates = self._cache.dates
         else:
-            self._scanner = scanner.Scanner(self._config)
-            self._scanner_output = self._scanner.get_notes_by_version()
+            kwds = {}
+            if self._scanner is None:
+                self._scanner = scanner.Scanner(self._config)
+            else:
+                # A shared scanner may have been created for a
+                # different branch.
+                kwds['branch'] = self._branch
+            self._scanner_output = self._scanner.get_notes_by_version(
+                stop_at_latest_tag=self._stop_at_latest_tag,
+                **kwds
+            )
             self._tags_to_dates = self._scanner.get_version_dates()
+            # The scanner may be shared with other loaders, so keep the
+            # counts for this scan before another one resets them.
+            self._scan_stats = copy.copy(self._scanner.stats)
+            if self._config.parse_cache:
+                self._note_cache = notecache.NoteCache(
+                    self._scanner.get_cache_dir(),
+                )
+
+    def close(self):
+        """Release the cache file, if the notes were read from one.
+
+        The notes cannot be parsed afterwards.
+        """
+        if self._cache is not None:
+            self._cache.close()
 
     @property
     def versions(self):
         "A list of all of the versions found."
         return list(self._scanner_output.keys())
 
+    @property
+    def scan_stats(self):
+        """The ScanStats for the scan that found the notes.
+
+        The counts are copied when the scan finishes, so they do not
+        include notes read later. None if the notes were read from the
+        cache file instead.
+        """
+        return self._scan_stats
+
+    @property
+    def jobs(self):
+        "The number of worker processes used to parse notes."
+        return self._jobs
+
     def __getitem__(self, version):
         "Return data about the files that should go into a given version."
         return self._scanner_output[version]
@@ -112,11 +198,92 @@ class Loader(object):
 
         """
         if self._cache:
-            content = self._cache['file-contents'][filename]
+            content = self._cache.get_file_contents(filename)
+            return self._clean_note_content(filename, content)
+
+        blob_sha = None
+        if sha is not None and self._note_cache is not None:
+            blob_sha = self._scanner.get_blob_sha_at_commit(filename, sha)
+        if blob_sha is not None:
+            data = self._note_cache.get(blob_sha)
+            if data is not None:
+                timing.count('loader.parse_cache_hits')
+                return self._clean_note_content(filename, data)
+
+        body = self._scanner.get_file_at_commit(filename, sha)
+        with timing.timer('loader.parse_yaml'):
+            data = yamlutils.safe_load(body)
+        # The cache holds the data as parsed, because cleaning it
+        # depends on the configuration.
+        if blob_sha is not None:
+            self._note_cache.put(blob_sha, data)
+        return self._clean_note_content(filename, data)
+
+    def parse_note_files(self, notes):
+        """Return the parsed contents of several note files, in order.
+
+        :param notes: List of (filename, sha) pairs.
+
+        When the loader was created with more than one job and there
+        are enough notes to make it worthwhile, the notes are read and
+        parsed by a pool of worker processes. The results, and any
+        warnings about their content, are the same as calling
+        parse_note_file() for each note.
+
+        """
+        if self._cache or self._jobs <= 1:
+            serial = True
         else:
-            body = self._scanner.get_file_at_commit(filename, sha)
-            content = yaml.safe_load(body)
+            serial = len(notes) < cache.MIN_PARALLEL_NOTES
+        if serial:
+            return [self.parse_note_file(filename, sha)
+                    for filename, sha in notes]
+
+        # Find the blobs that need to be read, skipping notes in the
+        # working copy and notes already in the parse cache. The
+        # others are parsed here, as usual.
+        blob_shas = []
+        cached = {}
+        for i, (filename, sha) in enumerate(notes):
+            blob_sha = None
+            if sha is not None:
+                blob_sha = self._scanner.get_blob_sha_at_commit(
+                    filename, sha)
+            if blob_sha is not None:
+                blob_sha = blob_sha.decode('ascii')
+                if self._note_cache is not None:
+                    data = self._note_cache.get(blob_sha)
+                    if data is not None:
+                        cached[i] = data
+                        blob_sha = None
+            blob_shas.append(blob_sha)
+        to_read = [b for b in blob_shas if b is not None]
+        LOG.info('reading %d notes with %d workers',
+                 len(to_read), self._jobs)
+        # The workers read the blobs, so count them here.
+        self._scanner.stats.blobs_read += len(to_read)
+        loaded = cache.parse_blobs(self._reporoot, to_read, self._jobs)
+
+        results = []
+        for i, ((filename, sha), blob_sha) in enumerate(
+                zip(notes, blob_shas)):
+            if i in cached:
+                timing.count('loader.parse_cache_hits')
+                data = cached[i]
+            elif blob_sha is None:
+                # The note is in the working copy.
+                results.append(self.parse_note_file(filename, sha))
+                continue
+            else:
+                # Waiting for the workers to read and parse the note.
+                with timing.timer('loader.parse_yaml'):
+                    data = next(loaded)
+                if self._note_cache is not None:
+                    self._note_cache.put(blob_sha, data)
+            results.append(self._clean_note_content(filename, data))
+        return results
 
+    def _clean_note_content(self, filename, content):
         cleaned_content = {}
 
         for section_name, section_content in content.items():
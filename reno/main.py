@@ -11,17 +11,17 @@
 # under the License.
 
 import argparse
+import importlib
+import json
 import logging
+import os
 import sys
 
-from reno import cache
 from reno import config
-from reno import create
 from reno import defaults
-from reno import linter
-from reno import lister
-from reno import report
-from reno import semver
+from reno import formatter
+from reno import timing
+
 
 _query_args = [
     (('--version',),
@@ -58,13 +58,34 @@ _query_args = [
 ]
 
 
+def _command(module, name):
+    """Return a function that runs a command defined in a reno module.
+
+    The module is only imported when the command runs, so starting
+    reno does not import the libraries used by the other commands.
+
+    """
+    def run(args, conf):
+        with timing.timer('main.import'):
+            func = getattr(importlib.import_module('reno.' + module), name)
+        return func(args, conf)
+    return run
+
+
+def _make_loader(conf, **kwds):
+    with timing.timer('main.import'):
+        from reno import loader
+    return loader.Loader(conf, **kwds)
+
+
 def _build_query_arg_group(parser):
     group = parser.add_argument_group('query')
     for args, kwds in _query_args:
         group.add_argument(*args, **kwds)
 
 
-def main(argv=sys.argv[1:]):
+def build_parser():
+    "Return the parser for the command line arguments."
     parser = argparse.ArgumentParser()
     parser.add_argument(
         '-v', '--verbose',
@@ -87,6 +108,28 @@ def main(argv=sys.argv[1:]):
         default=defaults.RELEASE_NOTES_SUBDIR,
         help='location of release notes YAML files',
     )
+    parser.add_argument(
+        '--server',
+        default=os.environ.get('RENO_SERVER'),
+        help=('send the %s commands to the server listening on this '
+              'socket, defaults to $RENO_SERVER' %
+              ', '.join(defaults.SERVER_COMMANDS)),
+    )
+    parser.add_argument(
+        '--timings',
+        default=False,
+        action='store_true',
+        help='print the time spent in each phase of the command to stderr',
+    )
+    parser.add_argument(
+        '--timings-file',
+        default=None,
+        help=('write the time spent in each phase of the command, and '
+              'other counters, to this file as JSON'),
+    )
+    # Commands call this to create their Loader, so the server can
+    # give them one it has kept from an earlier request.
+    parser.set_defaults(make_loader=_make_loader)
     subparsers = parser.add_subparsers(
         title='commands',
         description='valid commands',
@@ -117,7 +160,7 @@ def main(argv=sys.argv[1:]):
         nargs='?',
         help='root of the git repository',
     )
-    do_new.set_defaults(func=create.create_cmd)
+    do_new.set_defaults(func=_command('create', 'create_cmd'))
 
     do_list = subparsers.add_parser(
         'list',
@@ -130,7 +173,14 @@ def main(argv=sys.argv[1:]):
         nargs='?',
         help='root of the git repository',
     )
-    do_list.set_defaults(func=lister.list_cmd)
+    do_list.add_argument(
+        '--stats',
+        default=False,
+        action='store_true',
+        help=('print counts of the work done scanning the history '
+              'to stderr'),
+    )
+    do_list.set_defaults(func=_command('lister', 'list_cmd'))
 
     do_report = subparsers.add_parser(
         'report',
@@ -142,10 +192,22 @@ def main(argv=sys.argv[1:]):
         nargs='?',
         help='root of the git repository',
     )
-    do_report.add_argument(
+    output_group = do_report.add_mutually_exclusive_group()
+    output_group.add_argument(
         '--output', '-o',
+        default=[],
+        action='append',
+        help=('output filename, defaults to stdout, prefix with FORMAT: '
+              'to choose the format (%s, defaults to rst), '
+              'may be repeated to write several formats from one scan' %
+              ', '.join(formatter.FORMATS)),
+    )
+    output_group.add_argument(
+        '--output-dir',
         default=None,
-        help='output filename, defaults to stdout',
+        help=('write each version to a separate reStructuredText file in '
+              'the directory, with an index.rst linking to them, leaving '
+              'unchanged files alone'),
     )
     do_report.add_argument(
         '--no-show-source',
@@ -159,8 +221,15 @@ def main(argv=sys.argv[1:]):
         default='Release Notes',
         help='set the main title of the generated report',
     )
+    do_report.add_argument(
+        '--jobs', '-j',
+        default=1,
+        type=int,
+        help=('the number of worker processes to use for parsing notes, '
+              'defaults to 1, which parses them in this process'),
+    )
     _build_query_arg_group(do_report)
-    do_report.set_defaults(func=report.report_cmd)
+    do_report.set_defaults(func=_command('report', 'report_cmd'))
 
     do_cache = subparsers.add_parser(
         'cache',
@@ -179,8 +248,38 @@ def main(argv=sys.argv[1:]):
               'defaults to the cache file within the notesdir, '
               'use "-" for stdout'),
     )
+    do_cache.add_argument(
+        '--format',
+        default='yaml',
+        choices=defaults.CACHE_FORMATS,
+        help=('the cache file format, "indexed" is faster to read '
+              'and "sharded" stores each branch in a separate file, '
+              'but both require a newer version of reno, '
+              'defaults to "yaml"'),
+    )
+    do_cache.add_argument(
+        '--compression',
+        default=None,
+        choices=defaults.CACHE_COMPRESSIONS,
+        help=('compress the cache file, defaults to the method matching '
+              'the extension of the output file (.gz or .xz) or none'),
+    )
+    do_cache.add_argument(
+        '--jobs', '-j',
+        default=1,
+        type=int,
+        help=('the number of worker processes to use for reading notes, '
+              'defaults to 1, which reads them in this process'),
+    )
+    do_cache.add_argument(
+        '--update',
+        default=False,
+        action='store_true',
+        help=('reuse the data in the existing cache file for branches '
+              'and notes that have not changed'),
+    )
     _build_query_arg_group(do_cache)
-    do_cache.set_defaults(func=cache.cache_cmd)
+    do_cache.set_defaults(func=_command('cache', 'cache_cmd'))
 
     do_linter = subparsers.add_parser(
         'lint',
@@ -192,7 +291,7 @@ def main(argv=sys.argv[1:]):
         nargs='?',
         help='root of the git repository',
     )
-    do_linter.set_defaults(func=linter.lint_cmd)
+    do_linter.set_defaults(func=_command('linter', 'lint_cmd'))
 
     do_semver = subparsers.add_parser(
         'semver-next',
@@ -209,8 +308,69 @@ def main(argv=sys.argv[1:]):
         default=config.Config.get_default('branch'),
         help='the branch to scan, defaults to the current',
     )
-    do_semver.set_defaults(func=semver.semver_next_cmd)
+    do_semver.set_defaults(func=_command('semver', 'semver_next_cmd'))
 
+    do_serve = subparsers.add_parser(
+        'serve',
+        help='answer commands sent by clients over a Unix socket',
+    )
+    do_serve.add_argument(
+        'reporoot',
+        default='.',
+        nargs='?',
+        help='root of the git repository to scan when starting',
+    )
+    do_serve.add_argument(
+        '--socket',
+        default=os.environ.get('RENO_SERVER'),
+        help='the path of the socket, defaults to $RENO_SERVER',
+    )
+    do_serve.set_defaults(func=_command('server', 'serve_cmd'))
+
+    return parser
+
+
+def _call_server(args, argv):
+    """Run the command in the server, if there is one.
+
+    Returns the exit code of the command, or None if it should run in
+    this process instead.
+
+    """
+    if not args.server or args.command not in defaults.SERVER_COMMANDS:
+        return None
+    from reno import client
+    try:
+        response = client.call(args.server, argv)
+    except OSError as err:
+        logging.getLogger(__name__).warning(
+            'could not reach the server at %s (%s), '
+            'running the command here', args.server, err)
+        return None
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    return response['returncode']
+
+
+def run_command(args, conf):
+    "Run the command, recording how long each phase takes if asked."
+    if not (args.timings or args.timings_file):
+        return args.func(args, conf)
+    timing.enable()
+    try:
+        with timing.timer('total'):
+            return args.func(args, conf)
+    finally:
+        timing.disable()
+        if args.timings:
+            sys.stderr.write(timing.format_summary())
+        if args.timings_file:
+            with open(args.timings_file, 'w', encoding='utf-8') as f:
+                json.dump(timing.get_results(), f, indent=2)
+
+
+def main(argv=sys.argv[1:]):
+    parser = build_parser()
     args = parser.parse_args(argv)
     # no arguments, print help messaging, then exit with error(1)
     if not args.command:
@@ -222,7 +382,11 @@ def main(argv=sys.argv[1:]):
         format='%(message)s',
     )
 
+    returncode = _call_server(args, argv)
+    if returncode is not None:
+        return returncode
+
     conf = config.Config(args.reporoot, args.relnotesdir)
     conf.override_from_parsed_args(args)
 
-    return args.func(args, conf)
+    return run_command(args, conf)
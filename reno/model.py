@@ -0,0 +1,170 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""The release notes for a version, organized for rendering.
+
+The notes for a version are read once and sorted into the configured
+sections, so renderers only need to walk the result.
+
+"""
+
+
+class Entry(object):
+    """One item in a section of the release notes.
+
+    :param text: The text of the item.
+    :param filename: The name of the note file the item came from.
+    :param sha: The SHA of the commit the note file was read from, or
+        None for a note in the working copy.
+    """
+
+    def __init__(self, text, filename, sha):
+        self.text = text
+        self.filename = filename
+        self.sha = sha
+
+    def __repr__(self):
+        return 'Entry(%r, %r, %r)' % (self.text, self.filename, self.sha)
+
+
+class Section(object):
+    """A section of the release notes for a version.
+
+    :param name: The name of the section used in note files.
+    :param title: The title of the section.
+    :param entries: The list of Entry instances, in the order the note
+        files are listed for the version.
+    """
+
+    def __init__(self, name, title, entries):
+        self.name = name
+        self.title = title
+        self.entries = entries
+
+
+class Version(object):
+    """The release notes for one version.
+
+    :param version: The version number.
+    :param title: The title to show for the version, which is
+        different from the version number for unreleased versions.
+    :param date: The release date, or None if it is not shown.
+    :param prelude: The Section holding the preludes, or None.
+    :param sections: The other non-empty Sections, in the order given
+        in the configuration.
+    """
+
+    def __init__(self, version, title, date, prelude, sections):
+        self.version = version
+        self.title = title
+        self.date = date
+        self.prelude = prelude
+        self.sections = sections
+        self._index = {s.name: s for s in sections}
+
+    @property
+    def is_released(self):
+        # Unreleased versions are named for the previous tag and the
+        # number of commits since it.
+        return '-' not in self.version
+
+    def get_section(self, name):
+        "Return the Section with the name, or None if it is empty."
+        if self.prelude is not None and name == self.prelude.name:
+            return self.prelude
+        return self._index.get(name)
+
+
+# The number of notes parsed ahead by iter_versions(), so they can be
+# parsed in parallel.
+_PREFETCH_NOTES = 256
+
+
+def build_version(loader, config, version, contents=None):
+    """Return a Version describing the notes for the version.
+
+    Each note file is parsed once and each of its sections is visited
+    once, so the cost is linear in the number of entries.
+
+    :param contents: Optional list of the parsed contents of the notes
+        for the version, in order, if they have already been parsed.
+    """
+    notes = loader[version]
+    if contents is None:
+        contents = [loader.parse_note_file(filename, sha)
+                    for filename, sha in notes]
+    if '-' in version:
+        # This looks like an "unreleased version".
+        version_title = config.unreleased_version_title or version
+    else:
+        version_title = version
+    date = None
+    if config.add_release_date:
+        date = loader.get_version_date(version)
+
+    prelude_name = config.prelude_section_name
+    section_titles = dict(config.sections)
+    preludes = []
+    entries = {name: [] for name in section_titles}
+    for (filename, sha), note in zip(notes, contents):
+        for section_name, section_content in note.items():
+            if section_name == prelude_name:
+                preludes.append(Entry(section_content, filename, sha))
+            elif section_name in entries and section_content:
+                entries[section_name].extend(
+                    Entry(text, filename, sha)
+                    for text in section_content
+                )
+
+    prelude = None
+    if preludes:
+        prelude = Section(
+            prelude_name,
+            prelude_name.replace('_', ' ').title(),
+            preludes,
+        )
+    sections = [
+        Section(name, title, entries[name])
+        for name, title in config.sections
+        if entries[name]
+    ]
+    return Version(version, version_title, date, prelude, sections)
+
+
+def iter_versions(loader, config, versions):
+    """Produce a Version for each of the versions, in order.
+
+    When the loader parses notes in parallel, the notes for a group of
+    versions are parsed together, using loader.parse_note_files(), so
+    there is enough work to share out. The size of the groups is limited so
+    that only some of the notes are held in memory at once.
+
+    """
+    versions = list(versions)
+    # Without workers to share the notes out to, nothing is gained by
+    # parsing ahead, so each version is built as it is reached.
+    limit = _PREFETCH_NOTES if loader.jobs > 1 else 0
+    start = 0
+    while start < len(versions):
+        end = start
+        notes = []
+        while end < len(versions) and (
+                end == start or len(notes) < limit):
+            notes.extend(loader[versions[end]])
+            end += 1
+        contents = iter(loader.parse_note_files(notes))
+        for version in versions[start:end]:
+            yield build_version(
+                loader, config, version,
+                [next(contents) for note in loader[version]],
+            )
+        start = end
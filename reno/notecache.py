@@ -0,0 +1,344 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import hashlib
+import json
+import logging
+import os
+import os.path
+import tempfile
+import time
+
+from dulwich import diff_tree
+from dulwich import objects
+
+LOG = logging.getLogger(__name__)
+
+# Increment this when the structure of the parsed notes changes so
+# that entries written by older versions of reno are ignored.
+FORMAT_VERSION = 2
+
+# The minimum number of seconds between prunings of a shared cache.
+PRUNE_INTERVAL = 24 * 60 * 60
+
+# The file whose modification time records when a cache was pruned.
+_PRUNE_STAMP = '.last-prune'
+
+
+def write_file(filename, data):
+    """Write the text to the file atomically.
+
+    The text is written to a temporary file that is renamed, so
+    concurrent readers never see a partial file. Errors are logged and
+    otherwise ignored, since everything reno caches can be rebuilt.
+
+    """
+    dirname = os.path.dirname(filename)
+    try:
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmpname = tempfile.mkstemp(dir=dirname, prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmpname, filename)
+        except Exception:
+            os.unlink(tmpname)
+            raise
+    except OSError as err:
+        LOG.debug('could not write %s: %s', filename, err)
+
+
+class _JSONCache(object):
+    """Persistent cache of JSON data stored under immutable keys.
+
+    Each entry is a separate file, named for its key, so any number of
+    processes can share the cache. Reading an entry updates its
+    modification time, which prune() uses to find the least recently
+    used entries.
+
+    Subclasses set name and version.
+
+    """
+
+    name = None
+    version = None
+
+    def __init__(self, directory):
+        self._directory = os.path.join(
+            directory, '{}-v{}'.format(self.name, self.version))
+
+    def _get_filename(self, key):
+        if hasattr(key, 'decode'):
+            key = key.decode('ascii')
+        return os.path.join(self._directory, key[:2], key[2:])
+
+    def _get(self, key):
+        filename = self._get_filename(key)
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if data.get('version') != self.version:
+            return None
+        try:
+            os.utime(filename)
+        except OSError:
+            pass
+        return data['content']
+
+    def _put(self, key, content):
+        try:
+            data = json.dumps({'version': self.version,
+                               'content': content})
+        except (TypeError, ValueError):
+            LOG.debug('cannot cache %s entry %s', self.name, key)
+            return
+        if json.loads(data)['content'] != content:
+            # Keys that are not strings, for example, do not survive
+            # the round trip.
+            LOG.debug('cannot cache %s entry %s', self.name, key)
+            return
+        write_file(self._get_filename(key), data)
+
+
+class NoteCache(_JSONCache):
+    """Persistent cache of parsed note files.
+
+    Git blobs are immutable, so the parsed contents of a note can be
+    stored under the SHA of the blob holding its text and reused by
+    any later run that finds the same blob, regardless of the branch,
+    commit, or filename through which it was reached.
+
+    Entries are stored as JSON, one file per blob, because it is much
+    faster to load than YAML.
+
+    """
+
+    name = 'notes'
+    version = FORMAT_VERSION
+
+    def get(self, blob_sha):
+        "Return the parsed contents of the blob, or None."
+        content = self._get(blob_sha)
+        if content is not None:
+            LOG.debug('found parsed contents of blob %s in cache', blob_sha)
+        return content
+
+    def put(self, blob_sha, content):
+        """Save the parsed contents of the blob.
+
+        Content that cannot be represented in JSON without changing
+        its value is not saved. Errors writing the file are logged and
+        otherwise ignored, since the cache is only an optimization.
+
+        """
+        self._put(blob_sha, content)
+
+
+def _digest(value):
+    return hashlib.sha1(
+        json.dumps(value, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+
+
+def _encode_entry(entry):
+    if entry is None or entry.path is None:
+        return None
+    return [entry.path.decode('utf-8', 'surrogateescape'),
+            entry.mode, entry.sha.decode('ascii')]
+
+
+def _decode_entry(entry):
+    if entry is None:
+        return None
+    path, mode, sha = entry
+    return objects.TreeEntry(
+        path.encode('utf-8', 'surrogateescape'), mode, sha.encode('ascii'))
+
+
+class ChangeCache(_JSONCache):
+    """Persistent cache of the changes between trees of notes.
+
+    The changes are stored under the SHAs of the trees being compared,
+    so they can be reused for any commit with the same notes directory
+    and parents, in any clone of the repository.
+
+    """
+
+    name = 'changes'
+    version = 1
+
+    def get(self, old_trees, new_tree):
+        """Return the list of changes between the trees, or None.
+
+        :param old_trees: The SHA of the tree in the parent commit, a
+            list of them for a merge commit, or None.
+        :param new_tree: The SHA of the tree in the commit, or None.
+        """
+        content = self._get(self._get_key(old_trees, new_tree))
+        if content is None:
+            return None
+        return [self._decode_change(c) for c in content]
+
+    def put(self, old_trees, new_tree, changes):
+        "Save the list of changes between the trees."
+        self._put(
+            self._get_key(old_trees, new_tree),
+            [self._encode_change(c) for c in changes],
+        )
+
+    @staticmethod
+    def _get_key(old_trees, new_tree):
+        def _decode(sha):
+            return sha.decode('ascii') if sha is not None else None
+        if isinstance(old_trees, list):
+            old_trees = [_decode(t) for t in old_trees]
+        else:
+            old_trees = _decode(old_trees)
+        return _digest([old_trees, _decode(new_tree)])
+
+    def _encode_change(self, change):
+        # Merge commits produce a list of changes for each path.
+        if isinstance(change, list):
+            return [self._encode_change(c) for c in change]
+        return {
+            'type': change.type,
+            'old': _encode_entry(change.old),
+            'new': _encode_entry(change.new),
+        }
+
+    def _decode_change(self, change):
+        if isinstance(change, list):
+            return [self._decode_change(c) for c in change]
+        return diff_tree.TreeChange(
+            change['type'],
+            _decode_entry(change['old']),
+            _decode_entry(change['new']),
+        )
+
+
+class TagCache(_JSONCache):
+    """Persistent cache of the commits and dates of tags.
+
+    Finding the commit a tag refers to means reading the tag objects,
+    which is slow for repositories with many tags. Tag objects are
+    immutable, so the results are stored under a digest of the names
+    and SHAs of all of the tags.
+
+    """
+
+    name = 'tags'
+    version = 1
+
+    def get(self, tags):
+        """Return a mapping of tag names to (commit SHA, date) pairs.
+
+        :param tags: Mapping of tag names to the SHAs they refer to.
+        """
+        content = self._get(self._get_key(tags))
+        if content is None:
+            return None
+        return {
+            tag: (sha.encode('ascii'), date)
+            for tag, (sha, date) in content.items()
+        }
+
+    def put(self, tags, peeled):
+        "Save the mapping of tag names to (commit SHA, date) pairs."
+        self._put(self._get_key(tags), {
+            tag: [sha.decode('ascii'), date]
+            for tag, (sha, date) in peeled.items()
+        })
+
+    @staticmethod
+    def _get_key(tags):
+        return _digest(sorted(
+            (tag, sha.decode('ascii')) for tag, sha in tags.items()
+        ))
+
+
+def get_shared_cache_dir(conf):
+    """Return the directory for the cache shared by all repositories.
+
+    The shared_cache_dir option is used if it is set. Otherwise the
+    directory is "reno" inside $XDG_CACHE_HOME, or ~/.cache.
+
+    """
+    if conf.shared_cache_dir:
+        return os.path.expanduser(conf.shared_cache_dir)
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'reno')
+
+
+def prune(directory, max_size):
+    """Remove the least recently used entries from a cache directory.
+
+    Entries are removed, oldest first, until the total size of the
+    files in the directory is no more than max_size bytes. Files being
+    written by other processes are left alone.
+
+    Returns the number of files removed.
+
+    """
+    entries = []
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(directory):
+        for name in filenames:
+            # Skip files being written and the stamp file.
+            if name.startswith('.'):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                # Removed by another process.
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+    if total <= max_size:
+        return 0
+    LOG.debug('pruning %s, %d bytes used', directory, total)
+    removed = 0
+    for mtime, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def prune_if_due(directory, max_size, interval=PRUNE_INTERVAL):
+    """Call prune() if the directory has not been pruned recently.
+
+    Finding the size of a large cache means looking at every file in
+    it, so it is only done once every interval seconds. The time of
+    the last pruning is recorded in a stamp file in the directory.
+
+    Returns the number of files removed.
+
+    """
+    stamp = os.path.join(directory, _PRUNE_STAMP)
+    try:
+        if time.time() - os.stat(stamp).st_mtime < interval:
+            return 0
+    except OSError:
+        pass
+    # Update the stamp first, so other processes starting now do not
+    # also prune.
+    write_file(stamp, '')
+    return prune(directory, max_size)
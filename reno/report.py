@@ -10,29 +10,143 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import contextlib
+import logging
+import os
+import os.path
+import re
+import sys
+
 from reno import formatter
-from reno import loader
+
+LOG = logging.getLogger(__name__)
+
+# The name of the document linking to the documents for the versions.
+_INDEX = 'index'
+
+# The file listing the documents written to an output directory, so
+# the ones for versions no longer in the report can be removed.
+_MANIFEST = '.reno-report'
+
+
+def _parse_output(value):
+    """Return the format and filename for an --output value.
+
+    The value is a filename, optionally prefixed with the name of a
+    format and a colon. A prefix that is not a known format, such as a
+    drive letter, is part of the filename.
+
+    """
+    format, sep, filename = value.partition(':')
+    if sep and format in formatter.FORMATS:
+        return format, filename
+    return 'rst', value
+
+
+def _get_version_name(version):
+    "Return the name of the document for a version."
+    return re.sub(r'[^\w.+-]', '_', version)
+
+
+def _write_if_changed(filename, text, encoding):
+    """Write the text to the file, unless the file already holds it.
+
+    Leaving unchanged files alone preserves their modification times,
+    so tools that rebuild files newer than their output skip them.
+    Returns True if the file was written.
+
+    """
+    try:
+        with open(filename, 'r', encoding=encoding) as f:
+            if f.read() == text:
+                return False
+    except (IOError, ValueError):
+        # Missing, or not text in the expected encoding.
+        pass
+    with open(filename, 'w', encoding=encoding) as f:
+        f.write(text)
+    return True
+
+
+def _read_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, _MANIFEST), 'r',
+                  encoding='utf-8') as f:
+            return set(f.read().splitlines())
+    except IOError:
+        return set()
+
+
+def _write_output_dir(output_dir, ldr, conf, versions, title=None,
+                      show_source=True, branch=None):
+    """Write the report as a directory of reStructuredText documents.
+
+    Each version is written to a separate document, named for the
+    version, and an index document links to them in order. Documents
+    whose contents have not changed are not rewritten, and documents
+    written for versions that are no longer part of the report are
+    removed.
+
+    Returns the number of documents written.
+
+    """
+    encoding = conf.options['encoding']
+    os.makedirs(output_dir, exist_ok=True)
+    previous = _read_manifest(output_dir)
+    names = []
+    written = 0
+    for version, text in formatter.iter_version_reports(
+            ldr, conf, versions, title=title,
+            show_source=show_source, branch=branch):
+        name = _get_version_name(version.version)
+        names.append(name)
+        filename = os.path.join(output_dir, name + '.rst')
+        if _write_if_changed(filename, text, encoding):
+            LOG.info('wrote %s', filename)
+            written += 1
+    filename = os.path.join(output_dir, _INDEX + '.rst')
+    if _write_if_changed(filename, formatter.format_index(title, names),
+                         encoding):
+        LOG.info('wrote %s', filename)
+        written += 1
+    for name in sorted(previous - set(names)):
+        filename = os.path.join(output_dir, name + '.rst')
+        LOG.info('removing %s', filename)
+        try:
+            os.unlink(filename)
+        except OSError as err:
+            LOG.warning('could not remove %s: %s', filename, err)
+    _write_if_changed(os.path.join(output_dir, _MANIFEST),
+                      ''.join(name + '\n' for name in names), 'utf-8')
+    return written
 
 
 def report_cmd(args, conf):
     "Generates a release notes report"
-    ldr = loader.Loader(conf)
+    ldr = args.make_loader(conf, jobs=args.jobs)
     encoding = conf.options['encoding']
     if args.version:
         versions = args.version
     else:
         versions = ldr.versions
-    text = formatter.format_report(
-        ldr,
-        conf,
-        versions,
-        title=args.title,
-        show_source=args.show_source,
-        branch=args.branch,
-    )
-    if args.output:
-        with open(args.output, 'w', encoding=encoding) as f:
-            f.write(text)
+    kwds = {
+        'title': args.title,
+        'show_source': args.show_source,
+        'branch': args.branch,
+    }
+    if args.output_dir:
+        _write_output_dir(args.output_dir, ldr, conf, versions, **kwds)
+    elif args.output:
+        with contextlib.ExitStack() as stack:
+            outputs = [
+                (format, stack.enter_context(
+                    open(filename, 'w', encoding=encoding)))
+                for format, filename in (
+                    _parse_output(o) for o in args.output
+                )
+            ]
+            formatter.write_reports(outputs, ldr, conf, versions, **kwds)
     else:
-        print(text)
+        formatter.write_report(sys.stdout, ldr, conf, versions, **kwds)
+        sys.stdout.write('\n')
     return
@@ -12,6 +12,7 @@
 
 import collections
 import fnmatch
+import hashlib
 import logging
 import os.path
 import re
@@ -23,6 +24,9 @@ from dulwich import objects
 from dulwich import porcelain
 from dulwich import repo
 
+from reno import notecache
+from reno import timing
+
 LOG = logging.getLogger(__name__)
 
 
@@ -66,7 +70,66 @@ def _note_file(name):
     return False
 
 
-def _changes_in_subdir(repo, walk_entry, subdir):
+class ScanStats(object):
+    """Counts of the work done by a Scanner.
+
+    The counts are reset when get_notes_by_version() starts a scan, so
+    they describe the most recent scan and anything read from the
+    repository since.
+
+    :ivar commits_visited: The number of commits examined.
+    :ivar merge_commits: The number of those commits with more than one
+        parent.
+    :ivar tree_lookups: The number of paths looked up in trees, to find
+        the notes directory or a note file.
+    :ivar unchanged_subtrees: The number of commits that did not change
+        the notes directory, so did not need to be compared.
+    :ivar subtree_cache_hits: The number of commits whose changes were
+        found in a cache instead of comparing the trees.
+    :ivar diffs_computed: The number of times trees were compared.
+    :ivar changes_aggregated: The number of changes to notes found.
+    :ivar tags_peeled: The number of tags followed to their commits.
+    :ivar blobs_read: The number of note files read from the history.
+    :ivar stop_point: The tag the scan stopped at, or None if it
+        reached the start of the history.
+    """
+
+    COUNTERS = (
+        'commits_visited',
+        'merge_commits',
+        'tree_lookups',
+        'unchanged_subtrees',
+        'subtree_cache_hits',
+        'diffs_computed',
+        'changes_aggregated',
+        'tags_peeled',
+        'blobs_read',
+    )
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        "Set the counters to zero."
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.stop_point = None
+
+    def as_dict(self):
+        "Return the counters and the stop point, in a fixed order."
+        result = collections.OrderedDict(
+            (name, getattr(self, name)) for name in self.COUNTERS
+        )
+        result['stop_point'] = self.stop_point
+        return result
+
+    def __repr__(self):
+        return 'ScanStats(%s)' % ', '.join(
+            '%s=%r' % item for item in self.as_dict().items()
+        )
+
+
+def _changes_in_subdir(repo, walk_entry, subdir, change_cache=None):
     """Iterator producing changes of interest to reno.
 
     The default changes() method of a WalkEntry computes all of the
@@ -83,6 +146,9 @@ def _changes_in_subdir(repo, walk_entry, subdir):
     the manipulation done by this function have the subdir prefix
     stripped.
 
+    If change_cache is given, it is a notecache.ChangeCache used to
+    avoid comparing the same trees again.
+
     """
     commit = walk_entry.commit
     store = repo.object_store
@@ -118,8 +184,19 @@ def _changes_in_subdir(repo, walk_entry, subdir):
     else:
         commit_subtree = None
     if parent_subtree == commit_subtree:
+        repo.stats.unchanged_subtrees += 1
         return []
-    return changes_func(store, parent_subtree, commit_subtree)
+    if change_cache is None:
+        repo.stats.diffs_computed += 1
+        return changes_func(store, parent_subtree, commit_subtree)
+    changes = change_cache.get(parent_subtree, commit_subtree)
+    if changes is None:
+        repo.stats.diffs_computed += 1
+        changes = list(changes_func(store, parent_subtree, commit_subtree))
+        change_cache.put(parent_subtree, commit_subtree, changes)
+    else:
+        repo.stats.subtree_cache_hits += 1
+    return changes
 
 
 class _ChangeAggregator(object):
@@ -391,8 +468,28 @@ class RenoRepo(repo.Repo):
     _shas_to_tags = None
     _tags_to_dates = None
 
+    # Optional notecache.TagCache, set by the Scanner.
+    tag_cache = None
+
+    def __init__(self, *args, **kwds):
+        super(RenoRepo, self).__init__(*args, **kwds)
+        self.stats = ScanStats()
+
+    def get_common_dir(self):
+        "Return the git directory shared by all worktrees of the repository."
+        # Older versions of dulwich do not support worktrees and have
+        # no commondir().
+        if hasattr(self, 'commondir'):
+            return self.commondir()
+        return self.controldir()
+
+    def is_shallow(self):
+        "Return True if the repository is a shallow clone."
+        return os.path.exists(os.path.join(self.get_common_dir(), 'shallow'))
+
     def _get_commit_from_tag(self, tag, tag_sha):
         """Return the commit referenced by the tag and when it was tagged."""
+        self.stats.tags_peeled += 1
         tag_obj = self[tag_sha]
 
         if isinstance(tag_obj, objects.Tag):
@@ -427,17 +524,28 @@ class RenoRepo(repo.Repo):
         return tagged_sha, date
 
     def _load_tags(self):
-        self._all_tags = {
-            k.partition(b'/tags/')[-1].decode('utf-8'): v
-            for k, v in self.get_refs().items()
-            if k.startswith(b'refs/tags/')
-        }
-        self._shas_to_tags = {}
-        self._tags_to_dates = {}
-        for tag, tag_sha in self._all_tags.items():
-            tagged_sha, date = self._get_commit_from_tag(tag, tag_sha)
-            self._shas_to_tags.setdefault(tagged_sha, []).append((tag, date))
-            self._tags_to_dates[tag] = date
+        with timing.timer('scanner.load_tags'):
+            self._all_tags = {
+                k.partition(b'/tags/')[-1].decode('utf-8'): v
+                for k, v in self.get_refs().items()
+                if k.startswith(b'refs/tags/')
+            }
+            peeled = None
+            if self.tag_cache is not None:
+                peeled = self.tag_cache.get(self._all_tags)
+            if peeled is None:
+                peeled = {
+                    tag: self._get_commit_from_tag(tag, tag_sha)
+                    for tag, tag_sha in self._all_tags.items()
+                }
+                if self.tag_cache is not None:
+                    self.tag_cache.put(self._all_tags, peeled)
+            self._shas_to_tags = {}
+            self._tags_to_dates = {}
+            for tag, (tagged_sha, date) in peeled.items():
+                self._shas_to_tags.setdefault(tagged_sha, []).append(
+                    (tag, date))
+                self._tags_to_dates[tag] = date
 
     def get_tags_on_commit(self, sha):
         "Return the tag(s) on a commit, in application order."
@@ -449,6 +557,7 @@ class RenoRepo(repo.Repo):
 
     def _get_subtree(self, tree, path):
         "Given a tree SHA and a path, return the SHA of the subtree."
+        self.stats.tree_lookups += 1
         try:
             mode, tree_sha = tree.lookup_path(self.get_object,
                                               path.encode('utf-8'))
@@ -479,11 +588,24 @@ class RenoRepo(repo.Repo):
                     return f.read()
             except IOError:
                 return None
+        with timing.timer('scanner.read_blob'):
+            blob_sha = self.get_blob_sha_at_commit(filename, sha)
+            if blob_sha is None:
+                return None
+            blob = self[blob_sha]
+            self.stats.blobs_read += 1
+            return blob.data
+
+    def get_blob_sha_at_commit(self, filename, sha):
+        """Return the SHA of the blob holding the file at the commit.
+
+        If the file does not exist at the commit, return None.
+
+        """
         # Get the tree associated with the commit identified by the
         # input SHA, then look through the items in the tree to find
-        # the one with the path matching the filename. Take the
-        # associated SHA from the tree and get the file contents from
-        # the repository.
+        # the one with the path matching the filename and take the
+        # associated SHA from the tree.
         if hasattr(sha, 'encode'):
             sha = sha.encode('ascii')
         commit = self[sha]
@@ -493,15 +615,34 @@ class RenoRepo(repo.Repo):
                 # Dulwich doesn't handle Windows paths, we need to take care of
                 # it ourselves
                 filename = filename.replace('\\', '/')
+            self.stats.tree_lookups += 1
             mode, blob_sha = tree.lookup_path(self.get_object,
                                               filename.encode('utf-8'))
         except KeyError:
             # Some part of the filename wasn't found, so the file is
             # not present. Return the sentinel value.
             return None
-        else:
-            blob = self[blob_sha]
-            return blob.data
+        return blob_sha
+
+
+# The shared cache directories already pruned by this process.
+_pruned_dirs = set()
+
+
+def _prune_shared_cache(conf):
+    """Limit the size of the shared cache.
+
+    The cache is checked at most once per process, and only when it
+    has not been pruned by any process recently.
+
+    """
+    directory = notecache.get_shared_cache_dir(conf)
+    if directory in _pruned_dirs:
+        return
+    _pruned_dirs.add(directory)
+    removed = notecache.prune_if_due(directory, conf.shared_cache_size)
+    if removed:
+        LOG.info('removed %d old entries from %s', removed, directory)
 
 
 class Scanner(object):
@@ -532,8 +673,30 @@ class Scanner(object):
             for fn in self.conf.ignore_notes
         )
         self._encoding = conf.options['encoding']
+        self._change_cache = None
+        # Counts of the work done by the most recent scan.
+        self.stats = self._repo.stats
+        # The changes found in each commit, kept for scans of other
+        # branches that share history with this one.
+        self._changes_by_commit = {}
+        self._shared_cache = conf.shared_cache
+        if self._shared_cache and self._repo.is_shallow():
+            # The first commit, used to find the entries for the
+            # project, is not part of the history of a shallow clone.
+            LOG.info('not using the shared cache because %s is a '
+                     'shallow clone', self.reporoot)
+            self._shared_cache = False
+        if self._shared_cache:
+            cache_dir = self.get_cache_dir()
+            _prune_shared_cache(conf)
+            self._change_cache = notecache.ChangeCache(cache_dir)
+            self._repo.tag_cache = notecache.TagCache(cache_dir)
 
     def _get_ref(self, name):
+        with timing.timer('scanner.get_ref'):
+            return self._find_ref(name)
+
+    def _find_ref(self, name):
         if name:
             candidates = [
                 'refs/heads/' + name,
@@ -592,12 +755,15 @@ class Scanner(object):
             results.extend(tags)
         return results
 
-    def _get_current_version(self, branch=None):
-        "Return the current version of the repository, like git describe."
-        # This is similar to _get_tags_on_branch() except that it
-        # counts up to where the tag appears and it returns when it
-        # finds the first tagged commit (there is no need to scan the
-        # rest of the branch).
+    def _get_latest_tag(self, branch=None):
+        """Return the most recent release tag on the first-parent history.
+
+        Returns a tuple containing the tag name, the SHA of the tagged
+        commit, and the number of commits between the head of the
+        branch and the tag. If there is no tag, the name and SHA are
+        None and the count is the length of the history.
+
+        """
         commit = self._repo[self._get_ref(branch)]
         count = 0
         while commit:
@@ -606,18 +772,34 @@ class Scanner(object):
             sha = commit.sha().hexdigest().encode('ascii')
             tags = self._get_valid_tags_on_commit(sha)
             if tags:
-                if count:
-                    val = '{}-{}'.format(tags[-1], count)
-                else:
-                    val = tags[-1]
-                return val
+                return (tags[-1], sha, count)
             if commit.parents:
                 # Only traverse the first parent of each node.
                 commit = self._repo[commit.parents[0]]
                 count += 1
             else:
                 commit = None
-        return '0.0.0'
+        return (None, None, count)
+
+    def _get_current_version(self, branch=None, latest_tag=None):
+        """Return the current version of the repository, like git describe.
+
+        If latest_tag is given, it is the result of _get_latest_tag()
+        for the branch, so the history is not walked again.
+
+        """
+        # This is similar to _get_tags_on_branch() except that it
+        # counts up to where the tag appears and it returns when it
+        # finds the first tagged commit (there is no need to scan the
+        # rest of the branch).
+        if latest_tag is None:
+            latest_tag = self._get_latest_tag(branch)
+        tag, sha, count = latest_tag
+        if tag is None:
+            return '0.0.0'
+        if count:
+            return '{}-{}'.format(tag, count)
+        return tag
 
     def _strip_pre_release(self, tag):
         """Return tag with pre-release identifier removed if present."""
@@ -671,7 +853,7 @@ class Scanner(object):
         )
         return None
 
-    def _topo_traversal(self, branch):
+    def _topo_traversal(self, branch, exclude=None):
         """Generator that yields the branch entries in topological order.
 
         The topo ordering in dulwich does not match the git command line
@@ -688,6 +870,10 @@ class Scanner(object):
         # |/
         # *   a7f573d original commit on master
 
+        If exclude is given, it is a list of commit SHAs whose history
+        should not be traversed, in the same way as the exclude
+        argument to the dulwich walker.
+
         """
         head = self._get_ref(branch)
 
@@ -701,10 +887,11 @@ class Scanner(object):
         # entire graph once. It doesn't matter what order we do this
         # the first time, since we're just recording the relationships
         # of the nodes.
-        for e in self._repo.get_walker(head):
-            all[e.commit.id] = e
-            for p in e.commit.parents:
-                children.setdefault(p, set()).add(e.commit.id)
+        with timing.timer('scanner.topo_prepass'):
+            for e in self._repo.get_walker(head, exclude=exclude):
+                all[e.commit.id] = e
+                for p in e.commit.parents:
+                    children.setdefault(p, set()).add(e.commit.id)
 
         # Track what we have already emitted.
         emitted = set()
@@ -762,7 +949,8 @@ class Scanner(object):
                     # later, as long as we haven't already processed
                     # it.
                     first_parent = entry.commit.parents[0]
-                    if (first_parent not in todo
+                    if (first_parent in all
+                            and first_parent not in todo
                             and first_parent not in emitted):
                         todo.appendleft(first_parent)
                     continue
@@ -803,6 +991,9 @@ class Scanner(object):
                 # to grow very large, but it's not clear the output
                 # will be produced in the right order.
                 for p in entry.commit.parents:
+                    if p not in all:
+                        # The parent was excluded from the walk.
+                        continue
                     if p not in todo and p not in emitted:
                         todo.appendleft(p)
 
@@ -817,6 +1008,52 @@ class Scanner(object):
         return self._repo.get_file_at_commit(filename, sha,
                                              encoding=self._encoding)
 
+    def get_blob_sha_at_commit(self, filename, sha):
+        "Return the SHA of the blob for the file at the commit, or None."
+        return self._repo.get_blob_sha_at_commit(filename, sha)
+
+    def get_cache_dir(self):
+        """Return the directory for reno's cached data.
+
+        The directory is inside the git repository, unless the shared
+        cache is enabled and the repository is not a shallow clone.
+
+        """
+        if self._shared_cache:
+            return os.path.join(
+                notecache.get_shared_cache_dir(self.conf),
+                self.get_repository_id(),
+            )
+        return os.path.join(self._repo.controldir(), 'reno')
+
+    def get_repository_id(self):
+        """Return a string identifying the project in the repository.
+
+        The value is the SHA of the first commit in the history of
+        HEAD, so clones and worktrees of the same project share it. It
+        is saved in the git repository so the history is only walked
+        once.
+
+        """
+        filename = os.path.join(
+            self._repo.get_common_dir(), 'reno', 'repository-id')
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                repo_id = f.read().strip()
+        except IOError:
+            repo_id = None
+        if repo_id:
+            return repo_id
+        sha = self._repo.head()
+        while True:
+            commit = self._repo[sha]
+            if not commit.parents:
+                break
+            sha = commit.parents[0]
+        repo_id = sha.decode('ascii')
+        notecache.write_file(filename, repo_id + '\n')
+        return repo_id
+
     def _file_exists_at_commit(self, filename, sha):
         "Return true if the file exists at the given commit."
         return bool(self.get_file_at_commit(filename, sha,
@@ -922,13 +1159,113 @@ class Scanner(object):
                 return candidate
         return None
 
+    def get_tag_refs(self):
+        "Return a dict mapping tag names to the SHAs of their refs."
+        return {
+            k.partition(b'/tags/')[-1].decode('utf-8'): v.decode('ascii')
+            for k, v in self._repo.get_refs().items()
+            if k.startswith(b'refs/tags/')
+        }
+
+    def get_tags_digest(self):
+        "Return a digest of the names and targets of all of the tags."
+        digest = hashlib.sha1()
+        for name, sha in sorted(self.get_tag_refs().items()):
+            digest.update('{} {}\n'.format(name, sha).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get_index_digest(self):
+        "Return a digest of the notes files in the index."
+        prefix = self.conf.notespath.rstrip('/') + '/'
+        if os.path.sep == '\\':
+            prefix = prefix.replace('\\', '/')
+        prefix = prefix.encode('utf-8')
+        digest = hashlib.sha1()
+        index = self._repo.open_index()
+        # Index.items() is not available in older versions of dulwich.
+        for path in sorted(iter(index)):
+            if path.startswith(prefix):
+                # Conflicted entries have no single SHA.
+                sha = getattr(index[path], 'sha', b'')
+                digest.update(path + b' ' + sha + b'\n')
+        return digest.hexdigest()
+
+    def reload_tags(self):
+        """Forget the tags read from the repository.
+
+        The tags are read again the next time they are needed, so a
+        long-lived Scanner sees tags that were added, moved, or
+        removed since it was created. The changes found in each commit
+        do not depend on the tags and are kept.
+
+        """
+        self._repo._all_tags = None
+        self._repo._shas_to_tags = None
+        self._repo._tags_to_dates = None
+
+    def is_shallow(self):
+        "Return True if the repository is a shallow clone."
+        return self._repo.is_shallow()
+
+    def get_tagged_commit(self, tag, tag_sha):
+        "Return the SHA of the commit a tag ref points to."
+        if hasattr(tag_sha, 'encode'):
+            tag_sha = tag_sha.encode('ascii')
+        return self._repo._get_commit_from_tag(tag, tag_sha)[0]
+
+    def is_ancestor(self, ancestor, descendant):
+        "Return True if the ancestor commit is in the history of the other."
+        if ancestor == descendant:
+            return True
+        # The walker yields the commits reachable from the ancestor
+        # that are not reachable from the descendant, so there are
+        # none if the ancestor is part of the history.
+        walker = self._repo.get_walker(include=[ancestor],
+                                       exclude=[descendant])
+        for entry in walker:
+            return False
+        return True
+
+    def get_branch_state(self, branch=None):
+        """Return a dict describing the head of the branch.
+
+        The result includes the SHA of the commit at the head of the
+        branch and the SHA of the notes directory tree in that
+        commit, or None if there is no notes directory.
+
+        """
+        sha = self._get_ref(branch)
+        commit = self._repo[sha]
+        notespath = self.conf.notespath
+        if os.path.sep == '\\':
+            notespath = notespath.replace('\\', '/')
+        subtree = self._repo._get_subtree(self._repo[commit.tree], notespath)
+        return {
+            'commit': sha.decode('ascii'),
+            'notes-tree': subtree.id.decode('ascii') if subtree else None,
+        }
+
+    def _get_changes(self, walk_entry, notesdir):
+        "Return the list of changes to notes files in the commit."
+        key = (walk_entry.commit.id, notesdir)
+        changes = self._changes_by_commit.get(key)
+        if changes is not None:
+            self.stats.subtree_cache_hits += 1
+        else:
+            with timing.timer('scanner.diff'):
+                changes = list(_changes_in_subdir(
+                    self._repo, walk_entry, notesdir, self._change_cache,
+                ))
+            self._changes_by_commit[key] = changes
+        return changes
+
     def get_version_dates(self):
         "Return a dict mapping versions to dates."
         if self._repo._tags_to_dates is not None:
             return self._repo._tags_to_dates.copy()
         return {}
 
-    def get_notes_by_version(self, branch=None):
+    def get_notes_by_version(self, branch=None, stop_at_latest_tag=False):
         """Return an OrderedDict mapping versions to lists of notes files.
 
         The versions are presented in reverse chronological order.
@@ -938,7 +1275,19 @@ class Scanner(object):
 
         :param branch: The branch to scan. If not provided, using the branch
             configured in ``self.conf``.
+        :param stop_at_latest_tag: Only scan the history back to the most
+            recent release tag reachable from the head of the branch,
+            ignoring the earliest_version and stop_at_branch_base
+            settings. The version for that tag is always included in the
+            output, even if it has no notes.
+
+        Counts of the work done by the scan are left in ``self.stats``.
         """
+        self.stats.reset()
+        with timing.timer('scanner.scan'):
+            return self._get_notes_by_version(branch, stop_at_latest_tag)
+
+    def _get_notes_by_version(self, branch=None, stop_at_latest_tag=False):
 
         reporoot = self.reporoot
         notesdir = self.conf.notespath
@@ -962,22 +1311,48 @@ class Scanner(object):
         current_version = self._get_current_version(branch)
         LOG.debug('current repository version: %s' % current_version)
 
-        # Determine all of the tags known on the branch, in their date
-        # order. We scan the commit history in topological order to ensure
-        # we have the commits in the right version, so we might encounter
-        # the tags in a different order during that phase.
-        versions_by_date = self._get_tags_on_branch(branch)
-        LOG.debug('versions by date %r' % (versions_by_date,))
-        if earliest_version and earliest_version not in versions_by_date:
-            raise ValueError(
-                'earliest-version set to unknown revision {!r}'.format(
-                    earliest_version))
+        # Commits to leave out of the history traversal, along with
+        # all of their ancestors.
+        exclude = None
+
+        if stop_at_latest_tag:
+            # Only the notes added since the most recent release are
+            # interesting, so there is no need to find all of the tags
+            # on the branch or to look for the base of the branch.
+            latest_tag, latest_sha, count = self._get_latest_tag(branch)
+            if latest_tag is None:
+                LOG.debug('no release tag found on the branch')
+                versions_by_date = []
+                earliest_version = None
+                stop_at_branch_base = False
+                scan_stop_tag = None
+            else:
+                LOG.debug('stopping at latest tag %s (%d commits back)',
+                          latest_tag, count)
+                versions_by_date = [latest_tag]
+                earliest_version = latest_tag
+                scan_stop_tag = latest_tag
+                # Visit the tagged commit, so any notes added in it
+                # are associated with the tag, but nothing before it.
+                exclude = list(self._repo[latest_sha].parents)
+        else:
+            # Determine all of the tags known on the branch, in their
+            # date order. We scan the commit history in topological
+            # order to ensure we have the commits in the right version,
+            # so we might encounter the tags in a different order during
+            # that phase.
+            versions_by_date = self._get_tags_on_branch(branch)
+            LOG.debug('versions by date %r' % (versions_by_date,))
+            if earliest_version and earliest_version not in versions_by_date:
+                raise ValueError(
+                    'earliest-version set to unknown revision {!r}'.format(
+                        earliest_version))
 
-        # If the user has told us where to stop, use that as the
-        # default.
-        scan_stop_tag = self._find_scan_stop_point(
-            earliest_version, versions_by_date,
-            collapse_pre_releases, branch)
+            # If the user has told us where to stop, use that as the
+            # default.
+            scan_stop_tag = self._find_scan_stop_point(
+                earliest_version, versions_by_date,
+                collapse_pre_releases, branch)
 
         # If the user has not told us where to stop, try to work it
         # out for ourselves.
@@ -1111,10 +1486,14 @@ class Scanner(object):
         aggregator = _ChangeAggregator()
 
         # Process the git commit history.
-        for counter, entry in enumerate(self._topo_traversal(branch), 1):
+        for counter, entry in enumerate(
+                self._topo_traversal(branch, exclude=exclude), 1):
 
             sha = entry.commit.id
             tags_on_commit = self._get_valid_tags_on_commit(sha)
+            self.stats.commits_visited += 1
+            if len(entry.commit.parents) > 1:
+                self.stats.merge_commits += 1
 
             LOG.debug('%06d %s %s', counter, sha, tags_on_commit)
 
@@ -1132,8 +1511,10 @@ class Scanner(object):
             # change has only the basename of the path file, so we
             # need to prefix that with the notesdir before giving it
             # to the tracker.
-            changes = _changes_in_subdir(self._repo, entry, notesdir)
-            for change in aggregator.aggregate_changes(entry, changes):
+            changes = self._get_changes(entry, notesdir)
+            changes = aggregator.aggregate_changes(entry, changes)
+            self.stats.changes_aggregated += len(changes)
+            for change in changes:
                 uniqueid = change[0]
 
                 if uniqueid in self._ignore_uids:
@@ -1173,6 +1554,7 @@ class Scanner(object):
                     ('reached end of branch after %d commits at %s '
                      'with tags %s'),
                     counter, sha, tags)
+                self.stats.stop_point = scan_stop_tag
                 break
 
         # Invert earliest_seen to make a list of notes files for each
@@ -1252,6 +1634,11 @@ class Scanner(object):
                 LOG.debug('stopping trimming at %s', earliest_version)
                 break
 
+        if stop_at_latest_tag and earliest_version:
+            # Callers comparing against the most recent release need
+            # to see it, even when there are no notes attached to it.
+            trimmed.setdefault(earliest_version, [])
+
         LOG.debug(
             'found %d versions and %d files',
             len(trimmed.keys()), sum(len(ov) for ov in trimmed.values()),
@@ -19,10 +19,18 @@ from reno import loader
 LOG = logging.getLogger(__name__)
 
 
-def compute_next_version(conf):
-    "Compute the next semantic version based on the available release notes."
+def compute_next_version(conf, make_loader=None):
+    """Compute the next semantic version based on the available release notes.
+
+    :param make_loader: Optional callable used to create the Loader,
+        taking the same arguments as the Loader class.
+    """
     LOG.debug('starting semver-next')
-    ldr = loader.Loader(conf, ignore_cache=True)
+    if make_loader is None:
+        make_loader = loader.Loader
+    # Only the notes added since the most recent release matter, so
+    # there is no reason to scan the history before that tag.
+    ldr = make_loader(conf, ignore_cache=True, stop_at_latest_tag=True)
     LOG.debug('known versions: %s', ldr.versions)
 
     # We want to include any notes in the local working directory or
@@ -71,12 +79,18 @@ def compute_next_version(conf):
                     LOG.debug('found breaking change in %r section of %s',
                               section, filename)
                     return '{}.0.0'.format(base_version.major + 1)
+            if inc_minor:
+                # Nothing but a breaking change can affect the result
+                # now, so skip the other checks.
+                continue
             for section in conf.semver_minor:
                 if notes.get(section, []):
                     LOG.debug('found feature in %r section of %s',
                               section, filename)
                     inc_minor = True
                     break
+            if inc_minor or inc_patch:
+                continue
             for section in conf.semver_patch:
                 if notes.get(section, []):
                     LOG.debug('found bugfix in %r section of %s',
@@ -97,5 +111,5 @@ def compute_next_version(conf):
 
 def semver_next_cmd(args, conf):
     "Calculate next semantic version number"
-    print(compute_next_version(conf))
+    print(compute_next_version(conf, args.make_loader))
     return 0
@@ -0,0 +1,297 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Answer reno commands from a long-running process.
+
+Tools that run reno over and over pay for starting Python, importing
+the libraries, reading the tags, and scanning the history each time.
+The server keeps the repositories it has scanned open and answers
+commands sent over a Unix socket, reusing the results of earlier scans
+until the branch, the tags, the notes, or the configuration change.
+
+Each request, sent by reno.client, is one line of JSON holding the
+command line arguments and the working directory of the client. The
+response is one line of JSON holding the exit code and the text
+written to standard output and standard error.
+
+"""
+
+import contextlib
+import copy
+import hashlib
+import io
+import json
+import logging
+import os
+import os.path
+import socket
+import socketserver
+
+from dulwich import errors
+
+from reno import cache
+from reno import config
+from reno import defaults
+from reno import loader
+from reno import main
+from reno import scanner
+
+LOG = logging.getLogger(__name__)
+
+# The commands the server runs. Others always run in the client.
+COMMANDS = defaults.SERVER_COMMANDS
+
+
+def _get_dir_digest(dirname):
+    "Return a digest of the names, sizes, and times of files in a directory."
+    digest = hashlib.sha1()
+    try:
+        entries = sorted(os.scandir(dirname), key=lambda e: e.name)
+    except OSError:
+        return None
+    for entry in entries:
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        digest.update('{} {} {}\n'.format(
+            entry.name, st.st_size, st.st_mtime_ns).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class _Session(object):
+    """The scanners and loaders kept between requests.
+
+    Requests with the same configuration share a Scanner, so the
+    repository and the changes found in each commit are only read
+    once. A Loader is reused until the repository state it was built
+    from changes.
+
+    """
+
+    def __init__(self):
+        self._scanners = {}
+        self._loaders = {}
+
+    def _get_scanner(self, conf):
+        key = (conf.reporoot, conf.relnotesdir,
+               cache.get_config_digest(conf, include_branch=False))
+        if key not in self._scanners:
+            # The loaders tell the scanner which branch to scan.
+            scanner_conf = copy.copy(conf)
+            scanner_conf.override(branch=None)
+            self._scanners[key] = [scanner.Scanner(scanner_conf), None]
+        entry = self._scanners[key]
+        tags = entry[0].get_tags_digest()
+        if entry[1] is not None and entry[1] != tags:
+            LOG.info('the tags in %s have changed', conf.reporoot)
+            entry[0].reload_tags()
+        entry[1] = tags
+        return entry[0]
+
+    def _get_inputs(self, conf, s):
+        "Return a description of the repository state the notes depend on."
+        try:
+            inputs = s.get_branch_state(conf.branch)
+        except ValueError:
+            # The branch does not exist, so let the loader report it.
+            return None
+        inputs['tags'] = s.get_tags_digest()
+        if not conf.branch:
+            # Notes in the index and the working copy are included in
+            # the notes for the current branch.
+            inputs['index'] = s.get_index_digest()
+            inputs['notes'] = _get_dir_digest(
+                os.path.join(conf.reporoot, conf.notespath))
+        inputs['cache'] = _get_dir_digest(
+            os.path.dirname(cache.get_cache_filename(conf)))
+        return inputs
+
+    def get_loader(self, conf, **kwds):
+        """Return a Loader for the configuration.
+
+        The keyword arguments are passed to the Loader. A Loader
+        created by an earlier request is returned if the configuration
+        and arguments match and the repository has not changed.
+
+        """
+        try:
+            s = self._get_scanner(conf)
+        except errors.NotGitRepository:
+            # The loader will use the cache file, if there is one.
+            return loader.Loader(conf, **kwds)
+        key = (conf.reporoot, json.dumps(
+            [conf.relnotesdir, conf.options, kwds],
+            sort_keys=True, default=str,
+        ))
+        inputs = self._get_inputs(conf, s)
+        previous = self._loaders.get(key)
+        if inputs is not None and previous is not None:
+            if previous[0] == inputs:
+                LOG.debug('reusing the notes found by an earlier request')
+                return previous[1]
+            previous[1].close()
+        ldr = loader.Loader(conf, scanner=s, **kwds)
+        self._loaders[key] = (inputs, ldr)
+        return ldr
+
+    def forget(self, reporoot):
+        "Discard the scanners and loaders for a repository."
+        for key, (inputs, ldr) in list(self._loaders.items()):
+            if key[0] == reporoot:
+                ldr.close()
+                del self._loaders[key]
+        for key in list(self._scanners):
+            if key[0] == reporoot:
+                del self._scanners[key]
+
+
+def _is_valid_request(request):
+    return (
+        isinstance(request, dict)
+        and isinstance(request.get('argv'), list)
+        and all(isinstance(arg, str) for arg in request['argv'])
+        and isinstance(request.get('cwd'), str)
+    )
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+        except ValueError:
+            request = None
+        if _is_valid_request(request):
+            response = self.server.run(request['argv'], request['cwd'])
+        else:
+            response = {
+                'returncode': 2,
+                'stdout': '',
+                'stderr': 'reno serve: invalid request\n',
+            }
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class _Server(socketserver.UnixStreamServer):
+    """Answer requests one at a time using a shared _Session.
+
+    Requests are not handled concurrently because commands change the
+    working directory and the standard streams of the process.
+
+    """
+
+    def __init__(self, path, parser):
+        self.parser = parser
+        self.session = _Session()
+        socketserver.UnixStreamServer.__init__(self, path, _RequestHandler)
+
+    def server_bind(self):
+        # Commands run as the user running the server, and can write
+        # files, so only that user may connect.
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+
+    def run(self, argv, cwd):
+        "Run the command and return the response to send to the client."
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        handler = logging.StreamHandler(stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        root = logging.getLogger()
+        previous_dir = os.getcwd()
+        returncode = 1
+        with contextlib.redirect_stdout(stdout), \
+                contextlib.redirect_stderr(stderr):
+            try:
+                os.chdir(cwd)
+                args = self.parser.parse_args(argv)
+                if args.command not in COMMANDS:
+                    self.parser.error(
+                        'the server does not run %s' % args.command)
+                handler.setLevel(args.verbosity)
+                root.addHandler(handler)
+                returncode = self._run_command(args)
+            except SystemExit as err:
+                # Raised by the parser for bad arguments and --help.
+                returncode = err.code
+            except Exception as err:
+                # The client is always sent a response, so it does not
+                # run the command again itself.
+                stderr.write('%s\n' % err)
+            finally:
+                root.removeHandler(handler)
+                os.chdir(previous_dir)
+        return {
+            'returncode': returncode or 0,
+            'stdout': stdout.getvalue(),
+            'stderr': stderr.getvalue(),
+        }
+
+    def _run_command(self, args):
+        args.reporoot = os.path.abspath(args.reporoot)
+        try:
+            conf = config.Config(args.reporoot, args.relnotesdir)
+            conf.override_from_parsed_args(args)
+            args.make_loader = self.session.get_loader
+            return main.run_command(args, conf)
+        except Exception:
+            LOG.exception('%s failed', args.command)
+            # Start again from the repository on the next request, in
+            # case the error came from something kept from earlier.
+            self.session.forget(args.reporoot)
+            return 1
+
+
+def _is_listening(path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def serve_cmd(args, conf):
+    "Answer commands sent by clients over a Unix socket"
+    if not hasattr(socket, 'AF_UNIX'):
+        LOG.error('the server needs Unix sockets, '
+                  'which are not available on this platform')
+        return 1
+    path = args.socket
+    if not path:
+        LOG.error('set the socket path with --socket or RENO_SERVER')
+        return 1
+    if os.path.exists(path):
+        if _is_listening(path):
+            LOG.error('a server is already listening on %s', path)
+            return 1
+        # Left behind by a server that did not exit cleanly.
+        os.unlink(path)
+
+    server = _Server(path, main.build_parser())
+    try:
+        # Scan the repository now, so the first request is answered
+        # from a warm session.
+        conf.reporoot = os.path.abspath(conf.reporoot)
+        server.session.get_loader(conf)
+        LOG.info('listening on %s', path)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
+    return 0
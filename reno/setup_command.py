@@ -64,7 +64,7 @@ def load_config(distribution):
         output_file = defaults.RELEASE_NOTES_FILENAME
 
     conf = config.Config(repo_root, rel_notes_dir)
-    cache_file = loader.get_cache_filename(conf)
+    cache_file = cache.get_cache_filename(conf)
 
     return (conf, output_file, cache_file)
 
@@ -128,12 +128,12 @@ class BuildReno(cmd.Command):
         log.info('wrote cache file to %s', cache_filename)
 
         ldr = loader.Loader(conf)
-        text = formatter.format_report(
-            ldr,
-            conf,
-            ldr.versions,
-            title=self.distribution.metadata.name,
-        )
         with open(self.output_file, 'w') as f:
-            f.write(text)
+            formatter.write_report(
+                f,
+                ldr,
+                conf,
+                ldr.versions,
+                title=self.distribution.metadata.name,
+            )
         log.info('wrote release notes to %s', self.output_file)
@@ -9,25 +9,495 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import concurrent.futures
+import copy
+import hashlib
+import json
 import os.path
+import re
 
 from docutils import nodes
 from docutils.parsers import rst
 from docutils.parsers.rst import directives
 from docutils import statemachine
+from dulwich import errors
 from dulwich import repo
+from sphinx import addnodes
 from sphinx.util import logging
 from sphinx.util.nodes import nested_parse_with_titles
 
 import reno
+from reno import cache
 from reno import config
 from reno import defaults
 from reno import formatter
 from reno import loader
+from reno import scanner
 
 LOG = logging.getLogger(__name__)
 
 
+def _get_options_digest(conf):
+    return hashlib.sha1(json.dumps(
+        [conf.reporoot, conf.relnotesdir, conf.options],
+        sort_keys=True, default=str,
+    ).encode('utf-8')).hexdigest()
+
+
+class _LoaderRegistry(object):
+    """Loaders and scanners shared by the directives in a build.
+
+    Directives with the same configuration share a Loader, so each
+    set of notes is only scanned and parsed once. Directives that
+    differ only in the branch to scan share a Scanner, so the
+    repository, its tags, and the changes found in each commit are
+    only read once.
+
+    """
+
+    def __init__(self):
+        self._scanners = {}
+        self._loaders = {}
+
+    def get_scanner(self, conf):
+        """Return a Scanner for the configuration.
+
+        Returns None if the repository root is not a git repository.
+
+        """
+        key = (conf.reporoot, conf.relnotesdir,
+               cache.get_config_digest(conf, include_branch=False))
+        if key not in self._scanners:
+            # The loaders tell the scanner which branch to scan, so
+            # it must not fall back to the branch of the first
+            # directive to use it.
+            scanner_conf = copy.copy(conf)
+            scanner_conf.override(branch=None)
+            try:
+                self._scanners[key] = scanner.Scanner(scanner_conf)
+            except errors.NotGitRepository:
+                # The loader will use the cache file, if there is one.
+                self._scanners[key] = None
+        return self._scanners[key]
+
+    def get_loader(self, conf, jobs=1):
+        """Return a Loader for the configuration.
+
+        :param jobs: The number of worker processes the loader may use
+            to parse notes, if it is created.
+        """
+        key = _get_options_digest(conf)
+        if key not in self._loaders:
+            self._loaders[key] = loader.Loader(
+                conf, scanner=self.get_scanner(conf), jobs=jobs,
+            )
+        return self._loaders[key]
+
+    def close(self):
+        "Release the cache files read by the loaders."
+        for ldr in self._loaders.values():
+            ldr.close()
+
+
+# The registry is kept for the duration of a build, and not in the
+# environment, because scanners hold open repositories that cannot be
+# pickled.
+_registry = None
+
+
+def _get_registry():
+    global _registry
+    if _registry is None:
+        _registry = _LoaderRegistry()
+    return _registry
+
+
+def _reset_registry(app, *args):
+    global _registry
+    if _registry is not None:
+        _registry.close()
+    _registry = None
+
+
+def _get_inputs(conf, s):
+    """Return a description of the repository state the notes depend on.
+
+    The description includes the commit and notes directory tree at
+    the head of the branch, the tags, and the configuration, so the
+    documents using the notes can be read again when any of them
+    change. Returns None if there is no repository to examine.
+
+    """
+    if s is None:
+        return None
+    try:
+        inputs = s.get_branch_state(conf.branch)
+    except ValueError:
+        # The branch does not exist.
+        return None
+    inputs['tags'] = s.get_tags_digest()
+    inputs['config'] = _get_options_digest(conf)
+    if not conf.branch:
+        # Notes staged in the index are included in the report for
+        # the current branch.
+        inputs['index'] = s.get_index_digest()
+    return inputs
+
+
+def _get_outdated(app, env, added, changed, removed):
+    """Return the documents with release notes that have changed.
+
+    Sphinx only reads a document again when its source changes, so
+    compare the repository state recorded for each release-notes
+    directive with the current state. Builds that do not use the
+    directive do no extra work.
+
+    """
+    registry = _get_registry()
+    outdated = []
+    for docname, records in getattr(env, 'reno_inputs', {}).items():
+        if docname in changed or docname in removed:
+            continue
+        for reporoot, relnotessubdir, overrides, inputs in records:
+            conf = config.Config(reporoot, relnotessubdir)
+            conf.override(**overrides)
+            current = _get_inputs(conf, registry.get_scanner(conf))
+            if current != inputs:
+                LOG.info('release notes used in %s have changed', docname)
+                outdated.append(docname)
+                break
+    return outdated
+
+
+def _purge_doc(app, env, docname):
+    getattr(env, 'reno_inputs', {}).pop(docname, None)
+    # Keep the parsed versions from the last time the document was
+    # read, so they can be reused when it is read again.
+    fragments = getattr(env, 'reno_fragments', {}).pop(docname, None)
+    if fragments:
+        if not hasattr(env, 'reno_old_fragments'):
+            env.reno_old_fragments = {}
+        env.reno_old_fragments[docname] = fragments
+
+
+def _merge_info(app, env, docnames, other):
+    if not hasattr(env, 'reno_inputs'):
+        env.reno_inputs = {}
+    if not hasattr(env, 'reno_fragments'):
+        env.reno_fragments = {}
+    for docname in docnames:
+        if docname in getattr(other, 'reno_inputs', {}):
+            env.reno_inputs[docname] = other.reno_inputs[docname]
+        if docname in getattr(other, 'reno_fragments', {}):
+            env.reno_fragments[docname] = other.reno_fragments[docname]
+
+
+def _find_reporoot(reporoot_opt, relnotessubdir_opt):
+    """Find root directory of project."""
+    reporoot = os.path.abspath(reporoot_opt)
+    # When building on RTD.org the root directory may not be
+    # the current directory, so look for it.
+    try:
+        return repo.Repo.discover(reporoot).path
+    except Exception:
+        pass
+
+    for root in ('.', '..', '../..'):
+        if os.path.exists(os.path.join(root, relnotessubdir_opt)):
+            return root
+
+    raise Exception(
+        'Could not discover root directory; tried: %s' % ', '.join([
+            os.path.abspath(root) for root in ('.', '..', '../..')
+        ])
+    )
+
+
+def _get_config(options):
+    """Return the configuration for the options of a directive.
+
+    Returns a tuple containing the Config, the repository root, the
+    release notes directory, and the options overridden by the
+    directive.
+
+    """
+    branch = options.get('branch')
+    relnotessubdir = options.get(
+        'relnotessubdir', defaults.RELEASE_NOTES_SUBDIR,
+    )
+    reporoot = _find_reporoot(
+        options.get('reporoot', '.'), relnotessubdir,
+    )
+    ignore_notes = [
+        name.strip()
+        for name in options.get('ignore-notes', '').split(',')
+    ]
+    conf = config.Config(reporoot, relnotessubdir)
+    opt_overrides = {}
+    if 'notesdir' in options:
+        opt_overrides['notesdir'] = options.get('notesdir')
+    version_opt = options.get('version')
+    # FIXME(dhellmann): Force these flags True for now and figure
+    # out how Sphinx passes a "false" flag later.
+    # 'collapse-pre-releases' in options
+    opt_overrides['collapse_pre_releases'] = True
+    # Only stop at the branch base if we have not been told
+    # explicitly which versions to include.
+    opt_overrides['stop_at_branch_base'] = (version_opt is None)
+    if 'earliest-version' in options:
+        opt_overrides['earliest_version'] = options.get(
+            'earliest-version')
+    if 'unreleased-version-title' in options:
+        opt_overrides['unreleased_version_title'] = options.get(
+            'unreleased-version-title')
+
+    if branch:
+        opt_overrides['branch'] = branch
+    if ignore_notes:
+        opt_overrides['ignore_notes'] = ignore_notes
+    conf.override(**opt_overrides)
+    return conf, reporoot, relnotessubdir, opt_overrides
+
+
+def _get_version_key(ldr, conf, version, title, branch):
+    """Return the key for the parsed report for one version.
+
+    The key covers everything the text of the report for the version
+    depends on, so the parsed text can be reused until one of them
+    changes. Returns None if the version includes notes from the
+    working copy, which can change without changing the key.
+
+    """
+    notes = ldr[version]
+    if any(sha is None for filename, sha in notes):
+        return None
+    date = ldr.get_version_date(version) if conf.add_release_date else None
+    return hashlib.sha1(json.dumps(
+        [reno.__version__, _get_options_digest(conf), title, branch,
+         version, date, notes],
+        default=str,
+    ).encode('utf-8')).hexdigest()
+
+
+def _format_report(ldr, conf, title, version_opt, branch, cached=()):
+    """Return the report for a directive, in parts.
+
+    Returns a tuple containing the text of the title, or None, and a
+    list of (key, text) pairs for the versions. The key is None if the
+    version cannot be cached, and the text is None if the key is in
+    cached.
+
+    """
+    if version_opt is not None:
+        versions = [
+            v.strip()
+            for v in version_opt.split(',')
+        ]
+    else:
+        versions = ldr.versions
+    LOG.info('got versions %s' % (versions,))
+    keys = [
+        _get_version_key(ldr, conf, version, title, branch)
+        for version in versions
+    ]
+    texts = formatter.format_versions(
+        ldr, conf,
+        [v for v, k in zip(versions, keys) if k is None or k not in cached],
+        title=title, branch=branch,
+    )
+    parts = []
+    for key in keys:
+        if key is not None and key in cached:
+            parts.append((key, None))
+        else:
+            parts.append((key, next(texts)))
+    return (formatter.format_title(title) if title else None), parts
+
+
+def _get_report_key(conf, title, version_opt):
+    return hashlib.sha1(json.dumps(
+        [_get_options_digest(conf), title, version_opt],
+    ).encode('utf-8')).hexdigest()
+
+
+_DIRECTIVE_RE = re.compile(r'^(\s*)\.\. release-notes::(.*)$')
+_OPTION_RE = re.compile(r'^:([\w-]+):(.*)$')
+
+
+def _find_directives(text):
+    """Return the title and options of the release-notes directives.
+
+    This is a simple scan of the reStructuredText source that does
+    not handle every way of writing a directive. Directives it gets
+    wrong are scanned when they are read, as usual.
+
+    """
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        match = _DIRECTIVE_RE.match(line)
+        if not match:
+            continue
+        indent = len(match.group(1))
+        content = [match.group(2).strip()] if match.group(2).strip() else []
+        options = {}
+        in_options = True
+        for body in lines[i + 1:]:
+            if body.strip() and len(body) - len(body.lstrip()) <= indent:
+                break
+            body = body.strip()
+            option = _OPTION_RE.match(body)
+            if in_options and option:
+                options[option.group(1)] = option.group(2).strip()
+                continue
+            in_options = False
+            if body:
+                content.append(body)
+        yield ' '.join(content), options
+
+
+def _render_reports(reports):
+    """Scan the repository and return the reports for the directives.
+
+    The directives must have the same configuration, so they can share
+    one Loader. Returns a dict mapping the keys of the reports to
+    their text.
+
+    """
+    ldr = None
+    results = {}
+    for key, options, title in reports:
+        conf = _get_config(options)[0]
+        if ldr is None:
+            ldr = loader.Loader(conf)
+        results[key] = _format_report(
+            ldr, conf, title, options.get('version'), options.get('branch'),
+        )
+    return results
+
+
+def _prescan(app, env, docnames):
+    """Scan the notes for all of the directives to be read.
+
+    When reno_prescan_jobs is set, the reports for the directives in
+    the documents about to be read are produced in a pool of
+    processes, so the branches are scanned at the same time instead of
+    one after the other as the directives are read.
+
+    """
+    jobs = app.config.reno_prescan_jobs
+    env.reno_prescanned = {}
+    if not jobs:
+        return
+    # Group the directives by configuration, so each is scanned once.
+    reports = {}
+    for docname in docnames:
+        try:
+            with open(env.doc2path(docname), 'r',
+                      encoding=app.config.source_encoding) as f:
+                text = f.read()
+        except (IOError, UnicodeDecodeError):
+            continue
+        if '.. release-notes::' not in text:
+            continue
+        for title, options in _find_directives(text):
+            try:
+                conf = _get_config(options)[0]
+            except Exception:
+                continue
+            key = _get_report_key(conf, title, options.get('version'))
+            reports.setdefault(_get_options_digest(conf), {})[key] = (
+                key, options, title)
+    if len(reports) < 2:
+        # There is nothing to do at the same time.
+        return
+    LOG.info('scanning release notes for %d configurations with %d workers'
+             % (len(reports), jobs))
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs) as executor:
+        futures = [
+            executor.submit(_render_reports, list(group.values()))
+            for group in reports.values()
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                env.reno_prescanned.update(future.result())
+            except Exception as err:
+                # The directive will scan again and report the error.
+                LOG.debug('could not scan release notes: %s' % (err,))
+
+
+def _clear_read_state(app, env):
+    # The reports and the parsed versions from the previous build are
+    # only needed while the documents are read, so do not save them
+    # with the environment.
+    env.reno_prescanned = {}
+    env.reno_old_fragments = {}
+
+
+# Nodes that the parser registers with the document in ways that are
+# not repeated when a cached version is reused.
+_UNCACHEABLE_NODES = (
+    nodes.footnote,
+    nodes.footnote_reference,
+    nodes.citation,
+    nodes.citation_reference,
+    nodes.substitution_definition,
+    nodes.substitution_reference,
+    nodes.system_message,
+    nodes.pending,
+    addnodes.desc,
+)
+
+
+def _iter_nodes(node, condition=None):
+    "Iterate over the node and its descendants, optionally filtered."
+    # findall() replaced traverse() in docutils 0.18.
+    findall = getattr(node, 'findall', None)
+    if findall is None:
+        return iter(node.traverse(condition))
+    return findall(condition)
+
+
+def _is_cacheable(children):
+    for child in children:
+        for node in _iter_nodes(child, nodes.Element):
+            if isinstance(node, _UNCACHEABLE_NODES):
+                return False
+            if node.get('anonymous'):
+                return False
+            if isinstance(node, nodes.target) and (
+                    'refuri' in node or 'refname' in node):
+                return False
+    return True
+
+
+def _detach(children):
+    "Return copies of the nodes that do not refer to their document."
+    copies = [child.deepcopy() for child in children]
+    for copy_ in copies:
+        for node in _iter_nodes(copy_):
+            node.document = None
+    return copies
+
+
+def _register(document, node):
+    """Register the names and IDs of reused nodes with the document.
+
+    The IDs are assigned again, because the ones from the earlier
+    build may now be used by other nodes.
+
+    """
+    for child in _iter_nodes(node, nodes.Element):
+        if isinstance(child, nodes.section):
+            child['ids'] = []
+            document.note_implicit_target(child, child)
+        elif isinstance(child, nodes.target) and child['names']:
+            child['ids'] = []
+            document.note_explicit_target(child, child)
+        if 'refname' in child:
+            document.note_refname(child)
+
+
 class ReleaseNotesDirective(rst.Directive):
 
     has_content = True
@@ -48,86 +518,99 @@ class ReleaseNotesDirective(rst.Directive):
         'unreleased-version-title': directives.unchanged,
     }
 
-    def _find_reporoot(self, reporoot_opt, relnotessubdir_opt):
-        """Find root directory of project."""
-        reporoot = os.path.abspath(reporoot_opt)
-        # When building on RTD.org the root directory may not be
-        # the current directory, so look for it.
-        try:
-            return repo.Repo.discover(reporoot).path
-        except Exception:
-            pass
-
-        for root in ('.', '..', '../..'):
-            if os.path.exists(os.path.join(root, relnotessubdir_opt)):
-                return root
-
-        raise Exception(
-            'Could not discover root directory; tried: %s' % ', '.join([
-                os.path.abspath(root) for root in ('.', '..', '../..')
-            ])
+    def _note_inputs(self, conf, reporoot, relnotessubdir, overrides, s):
+        """Record what the output of the directive depends on.
+
+        The repository state is checked by _get_outdated() at the
+        start of the next build. Files that are not part of the
+        history, such as the configuration file, the cache file, and
+        notes that have not been committed, are given to Sphinx to
+        check for changes.
+
+        """
+        env = self.state.document.settings.env
+        if not hasattr(env, 'reno_inputs'):
+            env.reno_inputs = {}
+        env.reno_inputs.setdefault(env.docname, []).append(
+            (reporoot, relnotessubdir, overrides, _get_inputs(conf, s)),
         )
+        filenames = [
+            os.path.join(conf.reporoot, conf.relnotesdir, 'config.yaml'),
+            os.path.join(conf.reporoot, 'reno.yaml'),
+            cache.get_cache_filename(conf),
+        ]
+        notesdir = os.path.join(conf.reporoot, conf.notespath)
+        if not conf.branch and os.path.isdir(notesdir):
+            # Changes to notes in the working copy are included in the
+            # report for the current branch.
+            filenames.extend(
+                os.path.join(notesdir, name)
+                for name in os.listdir(notesdir)
+            )
+        for filename in filenames:
+            if os.path.exists(filename):
+                env.note_dependency(os.path.abspath(filename))
 
     def run(self):
         title = ' '.join(self.content)
         branch = self.options.get('branch')
-        relnotessubdir = self.options.get(
-            'relnotessubdir', defaults.RELEASE_NOTES_SUBDIR,
-        )
-        reporoot = self._find_reporoot(
-            self.options.get('reporoot', '.'), relnotessubdir,
-        )
-        ignore_notes = [
-            name.strip()
-            for name in self.options.get('ignore-notes', '').split(',')
-        ]
-        conf = config.Config(reporoot, relnotessubdir)
-        opt_overrides = {}
-        if 'notesdir' in self.options:
-            opt_overrides['notesdir'] = self.options.get('notesdir')
         version_opt = self.options.get('version')
-        # FIXME(dhellmann): Force these flags True for now and figure
-        # out how Sphinx passes a "false" flag later.
-        # 'collapse-pre-releases' in self.options
-        opt_overrides['collapse_pre_releases'] = True
-        # Only stop at the branch base if we have not been told
-        # explicitly which versions to include.
-        opt_overrides['stop_at_branch_base'] = (version_opt is None)
-        if 'earliest-version' in self.options:
-            opt_overrides['earliest_version'] = self.options.get(
-                'earliest-version')
-        if 'unreleased-version-title' in self.options:
-            opt_overrides['unreleased_version_title'] = self.options.get(
-                'unreleased-version-title')
-
-        if branch:
-            opt_overrides['branch'] = branch
-        if ignore_notes:
-            opt_overrides['ignore_notes'] = ignore_notes
-        conf.override(**opt_overrides)
-
-        notesdir = os.path.join(relnotessubdir, conf.notesdir)
-        LOG.info('scanning %s for %s release notes' % (
-                 os.path.join(conf.reporoot, notesdir),
-                 branch or 'current branch'))
-
-        ldr = loader.Loader(conf)
-        if version_opt is not None:
-            versions = [
-                v.strip()
-                for v in version_opt.split(',')
-            ]
-        else:
-            versions = ldr.versions
-        LOG.info('got versions %s' % (versions,))
-        text = formatter.format_report(
-            ldr,
-            conf,
-            versions,
-            title=title,
-            branch=branch,
+        conf, reporoot, relnotessubdir, opt_overrides = _get_config(
+            self.options)
+
+        env = self.state.document.settings.env
+        registry = _get_registry()
+        self._note_inputs(
+            conf, reporoot, relnotessubdir, opt_overrides,
+            registry.get_scanner(conf),
         )
+        # The versions parsed for this document, in this build or the
+        # last one.
+        cached = dict(
+            getattr(env, 'reno_old_fragments', {}).get(env.docname, {}))
+        if not hasattr(env, 'reno_fragments'):
+            env.reno_fragments = {}
+        fragments = env.reno_fragments.setdefault(env.docname, {})
+        cached.update(fragments)
+
+        key = _get_report_key(conf, title, version_opt)
+        report = getattr(env, 'reno_prescanned', {}).get(key)
+        if report is None:
+            notesdir = os.path.join(relnotessubdir, conf.notesdir)
+            LOG.info('scanning %s for %s release notes' % (
+                     os.path.join(conf.reporoot, notesdir),
+                     branch or 'current branch'))
+            report = _format_report(
+                registry.get_loader(conf, env.config.reno_jobs),
+                conf, title, version_opt, branch,
+                cached=cached,
+            )
+        title_text, versions = report
+
         source_name = '<%s %s>' % (__name__, branch or 'current branch')
+        node = nodes.section()
+        node.document = self.state.document
+        parent = node
+        if title_text:
+            parent = self._parse(title_text, source_name)[0]
+            node.append(parent)
+        for version_key, text in versions:
+            if version_key in cached:
+                children = [
+                    child.deepcopy() for child in cached[version_key]
+                ]
+                parent.extend(children)
+                for child in children:
+                    _register(self.state.document, child)
+            else:
+                children = self._parse(text, source_name)
+                parent.extend(children)
+            if version_key is not None and _is_cacheable(children):
+                fragments[version_key] = _detach(children)
+        return node.children
+
+    def _parse(self, text, source_name):
+        "Parse the text and return the resulting nodes."
         result = statemachine.ViewList()
         for line_num, line in enumerate(text.splitlines(), 1):
             LOG.debug('%4d: %s', line_num, line)
@@ -136,13 +619,26 @@ class ReleaseNotesDirective(rst.Directive):
         node = nodes.section()
         node.document = self.state.document
         nested_parse_with_titles(self.state, result, node)
-        return node.children
+        children = node.children
+        node.children = []
+        return children
 
 
 def setup(app):
     app.add_directive('release-notes', ReleaseNotesDirective)
+    app.connect('builder-inited', _reset_registry)
+    app.connect('build-finished', _reset_registry)
+    app.connect('env-get-outdated', _get_outdated)
+    app.connect('env-purge-doc', _purge_doc)
+    app.connect('env-merge-info', _merge_info)
+    app.connect('env-before-read-docs', _prescan)
+    app.connect('env-updated', _clear_read_state)
+    app.add_config_value('reno_prescan_jobs', 0, '')
+    app.add_config_value('reno_jobs', 1, '')
     metadata_dict = {
         'version': reno.__version__,
+        # Increment when the data saved in the environment changes.
+        'env_version': 2,
         'parallel_read_safe': True
     }
     return metadata_dict
@@ -13,6 +13,9 @@
 # under the License.
 
 import collections
+import concurrent.futures
+import io
+import os.path
 from unittest import mock
 
 import fixtures
@@ -21,7 +24,12 @@ import textwrap
 
 from reno import cache
 from reno import config
+from reno import loader
+from reno import notecache
+from reno import scanner
+from reno import yamlutils
 from reno.tests import base
+from reno.tests import test_scanner
 
 
 class TestCache(base.TestCase):
@@ -62,6 +70,9 @@ class TestCache(base.TestCase):
     def _get_dates(self):
         return {'1.0.0': 1547874431}
 
+    def _get_blob_sha(self, filename, sha):
+        return ('blob-' + sha).encode('ascii')
+
     def setUp(self):
         super(TestCache, self).setUp()
         self.useFixture(
@@ -72,6 +83,14 @@ class TestCache(base.TestCase):
             fixtures.MockPatch('reno.scanner.Scanner.get_version_dates',
                                new=self._get_dates)
         )
+        self.useFixture(
+            fixtures.MockPatch('reno.scanner.Scanner.get_blob_sha_at_commit',
+                               new=self._get_blob_sha)
+        )
+        self.useFixture(
+            fixtures.MockPatch('reno.cache.get_stamps',
+                               return_value={'tags': 'digest'})
+        )
         self.c = config.Config('.')
 
     @mock.patch('reno.scanner.Scanner.get_notes_by_version')
@@ -106,6 +125,13 @@ class TestCache(base.TestCase):
                     'fixes': ['We fixed all the bugs!'],
                 },
             },
+            'file-blobs': {
+                'note1': 'blob-shaA',
+                'note2': 'blob-shaB',
+                'note3': 'blob-shaC',
+                'note4': 'blob-shaD',
+            },
+            'stamps': {'tags': 'digest'},
         }
 
         db = cache.build_cache_db(
@@ -117,3 +143,638 @@ class TestCache(base.TestCase):
         mock_get_notes.assert_has_calls([
             mock.call(None), mock.call('stable/1.0')])
         self.assertEqual(expected, db)
+
+    def test_blobs_read_once(self):
+        s = mock.Mock()
+        s.get_file_at_commit.side_effect = self._get_note_body
+        contents = cache._NoteContents(s, collections.OrderedDict([
+            ('note1', ('shaA', 'blob1')),
+            ('note2', ('shaB', 'blob1')),
+            ('note3', (None, None)),
+        ]))
+        items = list(contents.items())
+        self.assertEqual(['note1', 'note2', 'note3'],
+                         [filename for filename, c in items])
+        self.assertEqual(items[0][1], items[1][1])
+        self.assertEqual(2, s.get_file_at_commit.call_count)
+
+    @mock.patch('reno.scanner.Scanner.get_notes_by_version')
+    @mock.patch('reno.scanner.Scanner.get_series_branches')
+    def test_blob_lookups_shared_by_branches(self, mock_get_branches,
+                                             mock_get_notes):
+        mock_get_notes.side_effect = [
+            collections.OrderedDict([('1.0.0', [('note1', 'shaA')])]),
+            collections.OrderedDict([('1.0.1', [('note1', 'shaA')])]),
+        ]
+        mock_get_branches.return_value = ['stable/1.0']
+        with mock.patch('reno.scanner.Scanner.get_blob_sha_at_commit',
+                        return_value=b'blob1') as get_blob:
+            cache.build_cache_db(self.c, versions_to_include=[])
+        get_blob.assert_called_once_with('note1', 'shaA')
+
+
+class TestCacheFormats(base.TestCase):
+
+    cache = {
+        'notes': [
+            {'version': '1.0.0',
+             'files': [['note1', 'shaA'], ['note2', 'shaB']]},
+            {'version': '0.1.0',
+             'files': [['note3', 'shaC']]},
+        ],
+        'dates': [{'version': '1.0.0', 'date': 1547874431}],
+        'file-contents': {
+            'note1': {'prelude': 'This is the prelude.\n'},
+            'note2': {'fixes': ['Fixed \u2603.', 'Multiple\nlines.']},
+            'note3': {'features': ['We added a feature!']},
+        },
+        'file-blobs': {
+            'note1': 'blobA',
+            'note2': 'blobB',
+            'note3': 'blobC',
+        },
+        'stamps': {
+            'branches': {
+                'HEAD': {'commit': 'shaB', 'notes-tree': 'treeB'},
+                'stable/0.1': {'commit': 'shaC', 'notes-tree': 'treeC'},
+            },
+            'tags': 'digest',
+            'tag-refs': {},
+            'config': 'digest',
+        },
+    }
+
+    notes_by_branch = collections.OrderedDict([
+        ('HEAD', collections.OrderedDict([
+            ('1.0.0', [['note1', 'shaA'], ['note2', 'shaB']]),
+        ])),
+        ('stable/0.1', collections.OrderedDict([
+            ('0.1.0', [['note3', 'shaC'], ['note1', 'shaA']]),
+        ])),
+    ])
+
+    def setUp(self):
+        super(TestCacheFormats, self).setUp()
+        self.useFixture(
+            fixtures.MockPatch('reno.cache._build_cache',
+                               return_value=(self.cache,
+                                             self.notes_by_branch))
+        )
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.c = config.Config(self.tmpdir)
+        self.c.override(encoding='utf-8')
+
+    def _round_trip(self, format):
+        filename = os.path.join(self.tmpdir, 'reno.cache')
+        cache.write_cache_db(self.c, [], outfilename=filename, format=format)
+        return cache.read_cache_db(filename, encoding='utf-8')
+
+    def _check(self, data):
+        self.assertEqual(['1.0.0', '0.1.0'], list(data.notes.keys()))
+        self.assertEqual(
+            [['note1', 'shaA'], ['note2', 'shaB']],
+            [list(f) for f in data.notes['1.0.0']],
+        )
+        self.assertEqual({'1.0.0': 1547874431}, dict(data.dates))
+        for filename, contents in self.cache['file-contents'].items():
+            self.assertEqual(contents, data.get_file_contents(filename))
+
+    def test_yaml(self):
+        self._check(self._round_trip('yaml'))
+
+    def test_indexed(self):
+        self._check(self._round_trip('indexed'))
+
+    def test_indexed_contents_decoded_lazily(self):
+        data = self._round_trip('indexed')
+        contents = data._file_contents
+        self.assertIsNone(contents._offsets)
+        self.assertEqual(['1.0.0', '0.1.0'], list(data.notes.keys()))
+        self.assertIsNone(contents._offsets)
+        data.get_file_contents('note1')
+        self.assertEqual(['note1'], list(contents._decoded.keys()))
+
+    def test_indexed_decoded_contents_bounded(self):
+        self.useFixture(fixtures.MockPatchObject(
+            cache._IndexedContents, 'max_decoded', 2))
+        data = self._round_trip('indexed')
+        for filename in ['note1', 'note2', 'note1', 'note3']:
+            data.get_file_contents(filename)
+        self.assertEqual(
+            ['note1', 'note3'],
+            list(data._file_contents._decoded.keys()),
+        )
+        self.assertEqual(
+            self.cache['file-contents']['note2'],
+            data.get_file_contents('note2'),
+        )
+
+    def test_indexed_close(self):
+        data = self._round_trip('indexed')
+        mapped = data._file_contents._data
+        self.assertFalse(mapped.closed)
+        data.close()
+        self.assertTrue(mapped.closed)
+
+    def test_yaml_close(self):
+        data = self._round_trip('yaml')
+        data.close()
+        self._check(data)
+
+    def test_indexed_default_filename(self):
+        cache.write_cache_db(self.c, [], format='indexed')
+        data = cache.read_cache_db(cache.get_cache_filename(self.c))
+        self._check(data)
+
+    def test_unknown_format(self):
+        self.assertRaises(
+            ValueError,
+            cache.write_cache_db, self.c, [], format='xml',
+        )
+
+    def test_yaml_streamed_matches_single_dump(self):
+        filename = os.path.join(self.tmpdir, 'reno.cache')
+        cache.write_cache_db(self.c, [], outfilename=filename, format='yaml')
+        with open(filename, 'r', encoding='utf-8') as f:
+            streamed = yamlutils.safe_load(f)
+        expected = yamlutils.safe_load(yamlutils.safe_dump(self.cache))
+        self.assertEqual(expected, streamed)
+
+    def _check_streamed(self, format, stream, index_marker):
+        def get_file(filename, sha):
+            # The index is written before any note is read.
+            self.assertIn(index_marker, stream.getvalue())
+            return 'fixes:\n  - Fixed {}.\n'.format(filename)
+
+        s = mock.Mock()
+        s.get_file_at_commit.side_effect = get_file
+        data = dict(self.cache)
+        data['file-contents'] = cache._NoteContents(s, {
+            'note1': ('shaA', 'blobA'),
+            'note2': ('shaB', 'blobB'),
+        })
+        cache._write_cache(data, stream, format)
+        self.assertEqual(2, s.get_file_at_commit.call_count)
+
+    def test_yaml_streamed(self):
+        self._check_streamed('yaml', io.StringIO(), 'notes:')
+
+    def test_indexed_streamed(self):
+        self._check_streamed('indexed', io.BytesIO(), b'"notes"')
+
+    def _check_compressed(self, filename, signature, **kwds):
+        cache.write_cache_db(self.c, [], outfilename=filename, **kwds)
+        with open(filename, 'rb') as f:
+            self.assertEqual(signature, f.read(len(signature)))
+        self._check(cache.read_cache_db(filename, encoding='utf-8'))
+
+    def test_gzip_yaml(self):
+        self._check_compressed(
+            os.path.join(self.tmpdir, 'reno.cache'), b'\x1f\x8b',
+            format='yaml', compression='gzip',
+        )
+
+    def test_xz_indexed(self):
+        self._check_compressed(
+            os.path.join(self.tmpdir, 'reno.cache'), b'\xfd7zXZ\x00',
+            format='indexed', compression='xz',
+        )
+
+    def test_compression_from_extension(self):
+        self._check_compressed(
+            os.path.join(self.tmpdir, 'reno.cache.gz'), b'\x1f\x8b',
+            format='indexed',
+        )
+        self._check_compressed(
+            os.path.join(self.tmpdir, 'reno.cache.xz'), b'\xfd7zXZ\x00',
+            format='yaml',
+        )
+
+    def test_gzip_reproducible(self):
+        filename = os.path.join(self.tmpdir, 'reno.cache.gz')
+        output = []
+        for i in range(2):
+            cache.write_cache_db(self.c, [], outfilename=filename)
+            with open(filename, 'rb') as f:
+                output.append(f.read())
+        self.assertEqual(output[0], output[1])
+
+    def test_sharded_compressed(self):
+        filename = os.path.join(self.tmpdir, 'reno.cache')
+        self._check_compressed(
+            filename, b'\x1f\x8b', format='sharded', compression='gzip',
+        )
+        data = cache.read_branch_cache_db(filename, 'stable/0.1')
+        self.assertEqual(['0.1.0'], list(data.notes.keys()))
+        self.assertEqual(
+            self.cache['file-contents']['note3'],
+            data.get_file_contents('note3'),
+        )
+
+    def test_unknown_compression(self):
+        self.assertRaises(
+            ValueError,
+            cache.write_cache_db, self.c, [], compression='zip',
+        )
+
+    def test_sharded(self):
+        data = self._round_trip('sharded')
+        self._check(data)
+        self.assertEqual(
+            ['HEAD', 'stable/0.1'], list(data.branch_notes.keys()))
+
+    def test_sharded_branch(self):
+        filename = os.path.join(self.tmpdir, 'reno.cache')
+        cache.write_cache_db(self.c, [], outfilename=filename,
+                             format='sharded')
+        data = cache.read_branch_cache_db(filename, 'stable/0.1')
+        self.assertEqual(['0.1.0'], list(data.notes.keys()))
+        self.assertEqual(
+            {'note1': 'blobA', 'note3': 'blobC'}, data.file_blobs)
+        self.assertEqual(
+            self.cache['file-contents']['note3'],
+            data.get_file_contents('note3'),
+        )
+        self.assertEqual(['stable/0.1'], list(data.stamps['branches']))
+        self.assertIn('branch-config', data.stamps)
+
+    def test_sharded_missing_branch(self):
+        filename = os.path.join(self.tmpdir, 'reno.cache')
+        cache.write_cache_db(self.c, [], outfilename=filename,
+                             format='sharded')
+        self.assertIsNone(
+            cache.read_branch_cache_db(filename, 'stable/0.2'))
+
+    def test_sharded_contents_deduplicated(self):
+        filename = os.path.join(self.tmpdir, 'reno.cache')
+        cache.write_cache_db(self.c, [], outfilename=filename,
+                             format='sharded')
+        contents = cache.read_cache_db(
+            os.path.join(self._get_shard_dir(filename), 'contents'))
+        self.assertEqual(
+            ['blobA', 'blobB', 'blobC'],
+            sorted(contents._file_contents),
+        )
+
+    def _get_shard_dir(self, filename):
+        with open(filename, 'rb') as f:
+            f.read(len(cache._MANIFEST_MAGIC))
+            return cache._read_manifest(filename, f.read())[0]['directory']
+
+    def test_sharded_rewrite(self):
+        filename = os.path.join(self.tmpdir, 'reno.cache')
+        cache.write_cache_db(self.c, [], outfilename=filename,
+                             format='sharded')
+        first = self._get_shard_dir(filename)
+        cache.write_cache_db(self.c, [], outfilename=filename,
+                             format='sharded')
+        second = self._get_shard_dir(filename)
+        # The new shards are written next to the old ones, and the old
+        # ones are removed once the manifest has been replaced.
+        self.assertNotEqual(first, second)
+        self.assertEqual(
+            ['reno.cache', os.path.basename(second)],
+            sorted(os.listdir(self.tmpdir)),
+        )
+        self._check(cache.read_cache_db(filename))
+
+    def test_sharded_rewrite_keeps_unrelated_directories(self):
+        filename = os.path.join(self.tmpdir, 'reno.cache')
+        other = os.path.join(self.tmpdir, 'other')
+        os.mkdir(other)
+        with open(filename, 'wb') as f:
+            f.write(cache._MANIFEST_MAGIC + b'{"directory": "other"}\n')
+        cache.write_cache_db(self.c, [], outfilename=filename,
+                             format='sharded')
+        self.assertTrue(os.path.isdir(other))
+
+    def test_sharded_stdout(self):
+        self.assertRaises(
+            ValueError,
+            cache.write_cache_db, self.c, [], outfilename='-',
+            format='sharded',
+        )
+
+    def test_other_formats_not_split_by_branch(self):
+        filename = os.path.join(self.tmpdir, 'reno.cache')
+        cache.write_cache_db(self.c, [], outfilename=filename,
+                             format='indexed')
+        data = cache.read_branch_cache_db(filename, 'stable/0.1')
+        self.assertEqual(['1.0.0', '0.1.0'], list(data.notes.keys()))
+
+
+class TestFreshness(test_scanner.Base):
+
+    def setUp(self):
+        super(TestFreshness, self).setUp()
+        self._make_python_package()
+        self._add_notes_file('slug1')
+        self.repo.git('tag', '-s', '-m', 'first tag', '1.0.0')
+        self._add_notes_file('slug2')
+        self.cache_file = os.path.join(self.temp_dir, 'reno.cache')
+        cache.write_cache_db(self.c, [], outfilename=self.cache_file,
+                             format='indexed')
+
+    def _check(self):
+        data = cache.read_cache_db(self.cache_file)
+        return data, cache.check_cache_db(self.c, data)[0]
+
+    def test_unchanged(self):
+        data, action = self._check()
+        self.assertEqual(cache.USE, action)
+
+    def test_no_stamps(self):
+        data = cache.read_cache_db(self.cache_file)
+        data.stamps = None
+        self._add_notes_file('slug3')
+        self.assertEqual(
+            cache.USE, cache.check_cache_db(self.c, data)[0])
+
+    def test_stamps_walk_history_once(self):
+        self.repo.add_file('not-a-release-note.txt')
+        s = scanner.Scanner(self.c)
+        with mock.patch.object(s, '_get_latest_tag',
+                               wraps=s._get_latest_tag) as latest:
+            stamps = cache.get_stamps(self.c, s, [None])
+        latest.assert_called_once_with(None)
+        self.assertEqual('1.0.0-2', stamps['branches']['HEAD']['version'])
+
+    def test_commit_without_notes(self):
+        self.repo.add_file('not-a-release-note.txt')
+        data, action = self._check()
+        self.assertEqual(cache.REFRESH, action)
+        self.assertEqual(['1.0.0-1', '1.0.0'], list(data.notes.keys()))
+        data = cache.refresh_cache_db(self.c, data)
+        self.assertEqual(['1.0.0-2', '1.0.0'], list(data.notes.keys()))
+
+    def test_loader_close(self):
+        cache.write_cache_db(self.c, [], format='indexed')
+        ldr = loader.Loader(self.c)
+        mapped = ldr._cache._file_contents._data
+        ldr.close()
+        self.assertTrue(mapped.closed)
+
+    def test_refresh_close(self):
+        self.repo.add_file('not-a-release-note.txt')
+        data, action = self._check()
+        mapped = data._file_contents._data
+        data = cache.refresh_cache_db(self.c, data)
+        data.close()
+        self.assertTrue(mapped.closed)
+
+    def test_new_note(self):
+        self._add_notes_file('slug3')
+        data, action = self._check()
+        self.assertEqual(cache.RESCAN, action)
+
+    def test_history_rewritten(self):
+        # Replace the commit after the tag with one making the same
+        # change to the notes, so the notes tree does not change.
+        self.repo.git('reset', '--soft', 'HEAD~1')
+        self.repo.git('commit', '-m', 'rewritten')
+        data, action = self._check()
+        self.assertEqual(cache.RESCAN, action)
+
+    def test_new_tag(self):
+        self.repo.git('tag', '-s', '-m', 'second tag', '2.0.0')
+        data, action = self._check()
+        self.assertEqual(cache.RESCAN, action)
+
+    def test_config_changed(self):
+        self.c.override(collapse_pre_releases=False)
+        data, action = self._check()
+        self.assertEqual(cache.RESCAN, action)
+
+    def test_other_branch_changed(self):
+        self.repo.git('checkout', '-b', 'stable/2.0')
+        self.repo.git('checkout', '-')
+        cache.write_cache_db(self.c, [], outfilename=self.cache_file,
+                             format='indexed')
+        self.repo.git('checkout', 'stable/2.0')
+        self._add_notes_file('slug3')
+        self.repo.git('tag', '-s', '-m', 'stable tag', '2.0.0')
+        self.repo.git('checkout', '-')
+        data, action = self._check()
+        self.assertEqual(cache.USE, action)
+
+    def test_branch_missing(self):
+        self.c.override(branch='stable/2.0')
+        self.repo.git('branch', 'stable/2.0')
+        cache.write_cache_db(self.c, [], outfilename=self.cache_file,
+                             format='indexed')
+        self.repo.git('branch', '-D', 'stable/2.0')
+        data, action = self._check()
+        self.assertEqual(cache.USE, action)
+        self.assertIn('does not exist', self.fake_logger.output)
+
+    def test_tag_missing(self):
+        self.repo.git('tag', '-d', '1.0.0')
+        data, action = self._check()
+        self.assertEqual(cache.USE, action)
+        self.assertIn('does not have the tags 1.0.0',
+                      self.fake_logger.output)
+
+    def test_shallow_clone(self):
+        clone = os.path.join(self.temp_dir, 'clone')
+        self.repo.git('clone', '--depth', '1',
+                      'file://' + self.reporoot, clone)
+        clone_conf = config.Config(clone)
+        data = cache.read_cache_db(self.cache_file)
+        self.assertEqual(
+            cache.USE, cache.check_cache_db(clone_conf, data)[0])
+        self.assertIn('shallow clone', self.fake_logger.output)
+
+    def test_empty_ignore_notes(self):
+        self.c.override(ignore_notes=[''])
+        data, action = self._check()
+        self.assertEqual(cache.USE, action)
+
+    def test_loader_reads_compressed(self):
+        cache.write_cache_db(self.c, [], format='indexed',
+                             compression='xz')
+        ldr = loader.Loader(self.c)
+        self.assertIsNotNone(ldr._cache)
+        self.assertEqual(['1.0.0-1', '1.0.0'], ldr.versions)
+
+    def test_sharded_branch(self):
+        self.repo.git('branch', 'stable/2.0')
+        cache.write_cache_db(self.c, [], outfilename=self.cache_file,
+                             format='sharded')
+        self.c.override(branch='stable/2.0')
+        data = cache.read_branch_cache_db(self.cache_file, 'stable/2.0')
+        self.assertEqual(cache.USE, cache.check_cache_db(self.c, data)[0])
+        self.assertEqual(['1.0.0-1', '1.0.0'], list(data.notes.keys()))
+
+    def test_sharded_branch_changed(self):
+        self.repo.git('branch', 'stable/2.0')
+        cache.write_cache_db(self.c, [], outfilename=self.cache_file,
+                             format='sharded')
+        self.repo.git('checkout', 'stable/2.0')
+        self._add_notes_file('slug3')
+        self.repo.git('checkout', '-')
+        self.c.override(branch='stable/2.0')
+        data = cache.read_branch_cache_db(self.cache_file, 'stable/2.0')
+        self.assertEqual(
+            cache.RESCAN, cache.check_cache_db(self.c, data)[0])
+        # The shard for the current branch is still valid.
+        self.c.override(branch=None)
+        data = cache.read_branch_cache_db(self.cache_file, None)
+        self.assertEqual(cache.USE, cache.check_cache_db(self.c, data)[0])
+
+
+class TestUpdate(test_scanner.Base):
+
+    def setUp(self):
+        super(TestUpdate, self).setUp()
+        self._make_python_package()
+        self._add_notes_file('slug1')
+        self.repo.git('tag', '-s', '-m', 'first tag', '1.0.0')
+        self._add_notes_file('slug2')
+        self.cache_file = os.path.join(self.temp_dir, 'reno.cache')
+        cache.write_cache_db(self.c, [], outfilename=self.cache_file,
+                             format='indexed')
+        self.previous = cache.read_cache_db(self.cache_file)
+
+    def _update(self):
+        self.useFixture(
+            fixtures.MockPatch('reno.scanner.Scanner.get_notes_by_version',
+                               side_effect=AssertionError('scanned'))
+        )
+        return cache.build_cache_db(self.c, [], previous=self.previous)
+
+    def _scan(self):
+        return cache.build_cache_db(self.c, [])
+
+    def _notes(self, db):
+        return [(n['version'], [f for f, sha in n['files']])
+                for n in db['notes']]
+
+    def test_unchanged_not_scanned(self):
+        expected = self._scan()
+        db = self._update()
+        self.assertEqual(self._notes(expected), self._notes(db))
+        self.assertEqual(expected['file-contents'], db['file-contents'])
+        self.assertEqual(expected['stamps'], db['stamps'])
+
+    def test_commit_without_notes_not_scanned(self):
+        self.repo.add_file('not-a-release-note.txt')
+        expected = self._scan()
+        db = self._update()
+        self.assertEqual(self._notes(expected), self._notes(db))
+        self.assertEqual('1.0.0-2', db['notes'][0]['version'])
+        self.assertEqual(expected['stamps'], db['stamps'])
+
+    def test_new_note_scanned(self):
+        self._add_notes_file('slug3')
+        db = cache.build_cache_db(self.c, [], previous=self.previous)
+        self.assertEqual(self._notes(self._scan()), self._notes(db))
+        self.assertEqual(3, len(db['file-contents']))
+
+    def test_new_tag_scanned(self):
+        self.repo.git('tag', '-s', '-m', 'second tag', '2.0.0')
+        db = cache.build_cache_db(self.c, [], previous=self.previous)
+        self.assertEqual(
+            ['2.0.0', '1.0.0'],
+            [n['version'] for n in db['notes']],
+        )
+
+    def test_config_changed_scanned(self):
+        self.c.override(collapse_pre_releases=False)
+        self.assertRaises(AssertionError, self._update)
+
+    def test_file_contents_reused(self):
+        self._add_notes_file('slug3')
+        with mock.patch('reno.scanner.Scanner.get_file_at_commit',
+                        wraps=scanner.Scanner(self.c).get_file_at_commit
+                        ) as get_file:
+            cache.build_cache_db(self.c, [], previous=self.previous)
+        self.assertEqual(1, get_file.call_count)
+
+    def test_write_update(self):
+        self._add_notes_file('slug3')
+        cache.write_cache_db(self.c, [], outfilename=self.cache_file,
+                             format='indexed', update=True)
+        data = cache.read_cache_db(self.cache_file)
+        self.assertEqual(cache.USE, cache.check_cache_db(self.c, data)[0])
+        self.assertEqual(3, len(data.file_blobs))
+        self.assertEqual([], [f for f in os.listdir(self.temp_dir)
+                              if f.endswith('.tmp')])
+
+
+class TestParallel(test_scanner.Base):
+
+    def setUp(self):
+        super(TestParallel, self).setUp()
+        self._make_python_package()
+        for i in range(4):
+            self._add_notes_file(
+                'note{}'.format(i),
+                contents='features:\n  - Feature {}.\n'.format(i),
+            )
+        self.repo.git('tag', '-s', '-m', 'first tag', '1.0.0')
+        self.useFixture(
+            fixtures.MockPatch('reno.cache.MIN_PARALLEL_NOTES', 1))
+
+    def test_same_as_serial(self):
+        expected = cache.build_cache_db(self.c, [])
+        db = cache.build_cache_db(self.c, [], jobs=2)
+        self.assertEqual(expected['file-contents'], db['file-contents'])
+        self.assertEqual(4, len(db['file-contents']))
+
+    def test_batches(self):
+        self.useFixture(
+            fixtures.MockPatch('reno.cache._PARALLEL_BATCH_SIZE', 3))
+        expected = cache.build_cache_db(self.c, [])
+        db = cache.build_cache_db(self.c, [], jobs=2)
+        self.assertEqual(expected['file-contents'], db['file-contents'])
+
+    def test_working_copy(self):
+        filename = os.path.join('releasenotes', 'notes',
+                                'staged-0000000000000099.yaml')
+        with open(os.path.join(self.reporoot, filename), 'w') as f:
+            f.write('features:\n  - Staged.\n')
+        self.repo.git('add', filename)
+        expected = cache.build_cache_db(self.c, [])
+        db = cache.build_cache_db(self.c, [], jobs=2)
+        self.assertEqual(expected['file-contents'], db['file-contents'])
+        self.assertEqual({'features': ['Staged.']},
+                         db['file-contents'][filename])
+
+    def test_pool_arguments(self):
+        # The initializer arguments to the pool need Python 3.7.
+        with mock.patch('concurrent.futures.ProcessPoolExecutor',
+                        wraps=concurrent.futures.ProcessPoolExecutor) as pool:
+            cache.build_cache_db(self.c, [], jobs=2)
+        pool.assert_called_once_with(max_workers=2)
+
+    def test_loader(self):
+        serial = loader.Loader(self.c)
+        notes = serial['1.0.0']
+        expected = [serial.parse_note_file(f, sha) for f, sha in notes]
+        self.c.override(shared_cache_dir=self.useFixture(
+            fixtures.TempDir()).path)
+        ldr = loader.Loader(self.c, jobs=2)
+        with mock.patch('reno.cache.parse_blobs',
+                        wraps=cache.parse_blobs) as parse_blobs:
+            self.assertEqual(expected, ldr.parse_note_files(notes))
+        parse_blobs.assert_called_once()
+        self.assertEqual(4, len(expected))
+
+    def test_loader_counts_blobs(self):
+        self.c.override(parse_cache=False)
+        ldr = loader.Loader(self.c, jobs=2)
+        ldr.parse_note_files(ldr['1.0.0'])
+        # The blobs read by the workers are counted.
+        self.assertEqual(4, ldr._scanner.stats.blobs_read)
+
+    def test_loader_reads_parse_cache_once(self):
+        self.c.override(shared_cache_dir=self.useFixture(
+            fixtures.TempDir()).path)
+        ldr = loader.Loader(self.c, jobs=2)
+        notes = ldr['1.0.0']
+        expected = ldr.parse_note_files(notes)
+        with mock.patch('reno.notecache.NoteCache.get',
+                        autospec=True,
+                        side_effect=notecache.NoteCache.get) as get:
+            self.assertEqual(expected, ldr.parse_note_files(notes))
+        self.assertEqual(len(notes), get.call_count)
@@ -12,8 +12,11 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import io
+import json
 from unittest import mock
 
+from reno import cache
 from reno import config
 from reno import formatter
 from reno import loader
@@ -37,9 +40,10 @@ class TestFormatterBase(base.TestCase):
 
         def _load(ldr):
             ldr._scanner_output = self.scanner_output
-            ldr._cache = {
-                'file-contents': self.note_bodies
-            }
+            ldr._cache = cache.CacheData(
+                notes=self.scanner_output, dates={},
+                file_contents=self.note_bodies,
+            )
 
         self.c = config.Config('reporoot')
 
@@ -112,6 +116,90 @@ class TestFormatter(TestFormatterBase):
         actual = list(sorted([prelude_pos, features_pos, issues_pos]))
         self.assertEqual(expected, actual)
 
+    def test_write_report(self):
+        for title in ('This is the title', None):
+            expected = formatter.format_report(
+                loader=self.ldr,
+                config=self.c,
+                versions_to_include=self.versions,
+                title=title,
+            )
+            stream = io.StringIO()
+            formatter.write_report(
+                stream,
+                loader=self.ldr,
+                config=self.c,
+                versions_to_include=self.versions,
+                title=title,
+            )
+            self.assertEqual(expected, stream.getvalue())
+
+    def test_notes_parsed_per_version(self):
+        with mock.patch.object(self.ldr, 'parse_note_file',
+                               wraps=self.ldr.parse_note_file) as parse:
+            report = formatter.iter_report(
+                loader=self.ldr,
+                config=self.c,
+                versions_to_include=self.versions,
+            )
+            self.assertIn('This is the prelude.', next(report))
+            parse.assert_called_once_with('note1', 'shaA')
+
+
+class TestOtherFormats(TestFormatterBase):
+
+    note_bodies = TestFormatter.note_bodies
+
+    def _report(self, format, show_source=True):
+        return ''.join(formatter.iter_report(
+            loader=self.ldr,
+            config=self.c,
+            versions_to_include=self.versions,
+            title='This is the title',
+            show_source=show_source,
+            format=format,
+        ))
+
+    def test_markdown(self):
+        result = self._report('md')
+        self.assertTrue(result.startswith('# This is the title\n\n'))
+        self.assertIn('## 1.0.0\n', result)
+        self.assertIn('### Prelude\n', result)
+        self.assertIn('### New Features\n\n- We added a feature!\n'
+                      '  <!-- note3 @ shaC -->\n', result)
+
+    def test_markdown_without_source(self):
+        self.assertNotIn('<!--', self._report('md', show_source=False))
+
+    def test_json(self):
+        result = json.loads(self._report('json'))
+        self.assertEqual('This is the title', result['title'])
+        self.assertEqual(['0.0.0', '1.0.0'],
+                         [v['version'] for v in result['versions']])
+        self.assertEqual(
+            [{'text': 'This is the prelude.',
+              'filename': 'note1', 'sha': 'shaA'}],
+            result['versions'][0]['prelude'])
+        self.assertEqual(
+            ['features', 'issues'],
+            [s['name'] for s in result['versions'][1]['sections']])
+
+    def test_write_reports(self):
+        streams = {format: io.StringIO() for format in formatter.FORMATS}
+        with mock.patch.object(self.ldr, 'parse_note_file',
+                               wraps=self.ldr.parse_note_file) as parse:
+            formatter.write_reports(
+                list(streams.items()),
+                loader=self.ldr,
+                config=self.c,
+                versions_to_include=self.versions,
+                title='This is the title',
+            )
+        # Each note is only parsed once for all of the formats.
+        self.assertEqual(3, parse.call_count)
+        for format, stream in streams.items():
+            self.assertEqual(self._report(format), stream.getvalue())
+
 
 class TestFormatterCustomSections(TestFormatterBase):
     note_bodies = {
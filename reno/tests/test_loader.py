@@ -19,8 +19,10 @@ from unittest import mock
 import fixtures
 import yaml
 
+from reno import cache
 from reno import config
 from reno import loader
+from reno import notecache
 from reno.tests import base
 
 
@@ -45,9 +47,10 @@ class TestValidate(base.TestCase):
     def _make_loader(self, note_bodies):
         def _load(ldr):
             ldr._scanner_output = self.scanner_output
-            ldr._cache = {
-                'file-contents': {'note1': note_bodies},
-            }
+            ldr._cache = cache.CacheData(
+                notes={}, dates={},
+                file_contents={'note1': note_bodies},
+            )
 
         with mock.patch('reno.loader.Loader._load_data', _load):
             return loader.Loader(
@@ -87,3 +90,55 @@ class TestValidate(base.TestCase):
         ldr = self._make_loader(note_bodies)
         ldr.parse_note_file('note1', None)
         self.assertIn('dict', self.logger.output)
+
+
+class TestParseCache(base.TestCase):
+
+    note_body = textwrap.dedent('''
+    issues: |
+      This is a single string.
+    ''')
+
+    def setUp(self):
+        super(TestParseCache, self).setUp()
+        self.c = config.Config('reporoot')
+        self.cache_dir = self.useFixture(fixtures.TempDir()).path
+        self.scanner = mock.Mock()
+        self.scanner.get_blob_sha_at_commit.return_value = 'a' * 40
+        self.scanner.get_file_at_commit.return_value = self.note_body
+
+    def _make_loader(self):
+        def _load(ldr):
+            ldr._scanner_output = {'0.0.0': [('note1', 'shaA')]}
+            ldr._scanner = self.scanner
+            ldr._note_cache = notecache.NoteCache(self.cache_dir)
+
+        with mock.patch('reno.loader.Loader._load_data', _load):
+            return loader.Loader(self.c)
+
+    def test_parse_once(self):
+        first = self._make_loader().parse_note_file('note1', 'shaA')
+        second = self._make_loader().parse_note_file('note1', 'shaA')
+        self.assertEqual({'issues': ['This is a single string.\n']}, first)
+        self.assertEqual(first, second)
+        self.scanner.get_file_at_commit.assert_called_once_with(
+            'note1', 'shaA')
+
+    def test_config_not_cached(self):
+        # Only sections other than the prelude are wrapped in lists,
+        # so the cached data must not depend on the prelude name.
+        self.c.override(prelude_section_name='issues')
+        first = self._make_loader().parse_note_file('note1', 'shaA')
+        self.c.override(prelude_section_name='prelude')
+        second = self._make_loader().parse_note_file('note1', 'shaA')
+        self.assertEqual({'issues': 'This is a single string.\n'}, first)
+        self.assertEqual({'issues': ['This is a single string.\n']}, second)
+        self.scanner.get_file_at_commit.assert_called_once_with(
+            'note1', 'shaA')
+
+    def test_working_copy_not_cached(self):
+        ldr = self._make_loader()
+        ldr.parse_note_file('note1', None)
+        ldr.parse_note_file('note1', None)
+        self.assertEqual(2, self.scanner.get_file_at_commit.call_count)
+        self.scanner.get_blob_sha_at_commit.assert_not_called()
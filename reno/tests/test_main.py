@@ -0,0 +1,79 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import os.path
+import subprocess
+import sys
+import textwrap
+
+import fixtures
+
+import reno
+from reno import main
+from reno.tests import base
+
+# The libraries that are slow to import and that starting reno, or
+# creating a note, should not need.
+_HEAVY_MODULES = ('dulwich', 'yaml', 'packaging', 'pbr')
+
+_SCRIPT = textwrap.dedent('''
+import json
+import sys
+from reno import main
+try:
+    main.main(sys.argv[1:])
+except SystemExit:
+    pass
+json.dump(sorted(sys.modules), sys.stderr)
+''')
+
+
+class TestStartupImports(base.TestCase):
+
+    def setUp(self):
+        super(TestStartupImports, self).setUp()
+        self.useFixture(fixtures.TempHomeDir())
+        self.tempdir = self.useFixture(fixtures.TempDir()).path
+
+    def _get_imported(self, *argv):
+        # Run in a new interpreter, so nothing has been imported yet.
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.path.dirname(
+            os.path.dirname(os.path.abspath(reno.__file__)))
+        result = subprocess.run(
+            [sys.executable, '-c', _SCRIPT] + list(argv),
+            cwd=self.tempdir,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+        )
+        modules = json.loads(result.stderr.decode('utf-8').splitlines()[-1])
+        return sorted(
+            m for m in modules if m.split('.')[0] in _HEAVY_MODULES
+        )
+
+    def test_help(self):
+        self.assertEqual([], self._get_imported('--help'))
+
+    def test_new(self):
+        self.assertEqual([], self._get_imported('new', 'slug'))
+
+
+class TestDefaults(base.TestCase):
+
+    def test_no_workers_by_default(self):
+        parser = main.build_parser()
+        for command in ['report', 'cache']:
+            self.assertEqual(1, parser.parse_args([command]).jobs)
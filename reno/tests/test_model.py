@@ -0,0 +1,134 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from unittest import mock
+
+import fixtures
+
+from reno import model
+from reno.tests import test_formatter
+
+
+class TestBuildVersion(test_formatter.TestFormatterBase):
+
+    scanner_output = {
+        '0.0.0': [('note1', 'shaA')],
+        '1.0.0': [('note2', 'shaB'), ('note3', 'shaC')],
+        '1.0.0-2': [('note4', 'shaD')],
+    }
+
+    note_bodies = {
+        'note1': {
+            'prelude': 'This is the prelude.',
+        },
+        'note2': {
+            'fixes': ['First fix.'],
+            'features': ['First feature.', 'Second feature.'],
+        },
+        'note3': {
+            'features': ['Third feature.'],
+            'upgrade': None,
+            'unknown': ['Not a configured section.'],
+        },
+        'note4': {
+            'other': ['Unreleased.'],
+        },
+    }
+
+    def _entries(self, section):
+        return [(e.text, e.filename, e.sha) for e in section.entries]
+
+    def test_prelude(self):
+        version = model.build_version(self.ldr, self.c, '0.0.0')
+        self.assertEqual('Prelude', version.prelude.title)
+        self.assertEqual(
+            [('This is the prelude.', 'note1', 'shaA')],
+            self._entries(version.prelude))
+        self.assertEqual([], version.sections)
+        self.assertIs(version.prelude, version.get_section('prelude'))
+
+    def test_sections(self):
+        version = model.build_version(self.ldr, self.c, '1.0.0')
+        self.assertIsNone(version.prelude)
+        # Configured order, skipping empty and unknown sections.
+        self.assertEqual(['features', 'fixes'],
+                         [s.name for s in version.sections])
+        self.assertEqual(
+            [('First feature.', 'note2', 'shaB'),
+             ('Second feature.', 'note2', 'shaB'),
+             ('Third feature.', 'note3', 'shaC')],
+            self._entries(version.get_section('features')))
+        self.assertEqual('Bug Fixes', version.get_section('fixes').title)
+        self.assertIsNone(version.get_section('upgrade'))
+        self.assertIsNone(version.get_section('unknown'))
+
+    def test_unreleased_title(self):
+        self.c.override(unreleased_version_title='Next')
+        version = model.build_version(self.ldr, self.c, '1.0.0-2')
+        self.assertEqual('Next', version.title)
+        self.assertFalse(version.is_released)
+
+    def test_release_date(self):
+        version = model.build_version(self.ldr, self.c, '1.0.0')
+        self.assertIsNone(version.date)
+        self.c.override(add_release_date=True)
+        self.ldr._tags_to_dates = {}
+        version = model.build_version(self.ldr, self.c, '1.0.0')
+        self.assertEqual('Unknown', version.date)
+
+    def test_notes_parsed_once(self):
+        with mock.patch.object(self.ldr, 'parse_note_file',
+                               wraps=self.ldr.parse_note_file) as parse:
+            model.build_version(self.ldr, self.c, '1.0.0')
+        self.assertEqual(
+            [mock.call('note2', 'shaB'), mock.call('note3', 'shaC')],
+            parse.call_args_list)
+
+
+class TestIterVersions(TestBuildVersion):
+
+    versions = ['0.0.0', '1.0.0', '1.0.0-2']
+
+    def _sections(self, versions):
+        return [
+            (v.version, [(s.name, self._entries(s)) for s in v.sections])
+            for v in versions
+        ]
+
+    def test_same_as_build_version(self):
+        self.ldr._jobs = 2
+        expected = [model.build_version(self.ldr, self.c, v)
+                    for v in self.versions]
+        actual = list(model.iter_versions(self.ldr, self.c, self.versions))
+        self.assertEqual(self._sections(expected), self._sections(actual))
+
+    def test_prefetch(self):
+        self.ldr._jobs = 2
+        self.useFixture(fixtures.MockPatch('reno.model._PREFETCH_NOTES', 2))
+        with mock.patch.object(self.ldr, 'parse_note_files',
+                               wraps=self.ldr.parse_note_files) as parse:
+            list(model.iter_versions(self.ldr, self.c, self.versions))
+        self.assertEqual(
+            [mock.call([('note1', 'shaA'), ('note2', 'shaB'),
+                        ('note3', 'shaC')]),
+             mock.call([('note4', 'shaD')])],
+            parse.call_args_list)
+
+    def test_no_prefetch_without_jobs(self):
+        with mock.patch.object(self.ldr, 'parse_note_files',
+                               wraps=self.ldr.parse_note_files) as parse:
+            list(model.iter_versions(self.ldr, self.c, self.versions))
+        self.assertEqual(
+            [mock.call([('note1', 'shaA')]),
+             mock.call([('note2', 'shaB'), ('note3', 'shaC')]),
+             mock.call([('note4', 'shaD')])],
+            parse.call_args_list)
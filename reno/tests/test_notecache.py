@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import datetime
+import json
+import os.path
+
+from dulwich import diff_tree
+from dulwich import objects
+import fixtures
+
+from reno import config
+from reno import notecache
+from reno.tests import base
+
+
+class TestNoteCache(base.TestCase):
+
+    blob_sha = b'0123456789abcdef0123456789abcdef01234567'
+
+    def setUp(self):
+        super(TestNoteCache, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.cache = notecache.NoteCache(self.tmpdir)
+
+    def test_missing(self):
+        self.assertIsNone(self.cache.get(self.blob_sha))
+
+    def test_round_trip(self):
+        content = {'prelude': 'text', 'fixes': ['one', 'two']}
+        self.cache.put(self.blob_sha, content)
+        self.assertEqual(content, self.cache.get(self.blob_sha))
+        self.assertEqual(content, self.cache.get(self.blob_sha.decode()))
+
+    def test_other_format_version_ignored(self):
+        self.cache.put(self.blob_sha, {'fixes': ['one']})
+        filename = self.cache._get_filename(self.blob_sha)
+        with open(filename, 'w') as f:
+            json.dump({'version': -1, 'content': {'fixes': ['one']}}, f)
+        self.assertIsNone(self.cache.get(self.blob_sha))
+
+    def test_unserializable_content_skipped(self):
+        self.cache.put(self.blob_sha, {'fixes': [datetime.date.today()]})
+        self.cache.put(self.blob_sha, {1: 'integer key'})
+        self.assertFalse(os.path.exists(
+            self.cache._get_filename(self.blob_sha)))
+
+
+class TestChangeCache(base.TestCase):
+
+    old_tree = b'1111111111111111111111111111111111111111'
+    new_tree = b'2222222222222222222222222222222222222222'
+    blob_sha = b'0123456789abcdef0123456789abcdef01234567'
+
+    def setUp(self):
+        super(TestChangeCache, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.cache = notecache.ChangeCache(self.tmpdir)
+
+    def test_missing(self):
+        self.assertIsNone(self.cache.get(self.old_tree, self.new_tree))
+
+    def test_round_trip(self):
+        entry = objects.TreeEntry(b'note-1234.yaml', 0o100644, self.blob_sha)
+        changes = [
+            diff_tree.TreeChange(diff_tree.CHANGE_ADD, None, entry),
+            [diff_tree.TreeChange(diff_tree.CHANGE_MODIFY, entry, entry),
+             diff_tree.TreeChange(diff_tree.CHANGE_DELETE, entry, None)],
+        ]
+        self.cache.put(self.old_tree, self.new_tree, changes)
+        self.assertEqual(
+            changes, self.cache.get(self.old_tree, self.new_tree))
+
+    def test_merge_key(self):
+        self.cache.put([self.old_tree, self.new_tree], self.new_tree, [])
+        self.assertIsNone(self.cache.get(self.old_tree, self.new_tree))
+        self.assertEqual(
+            [], self.cache.get([self.old_tree, self.new_tree], self.new_tree))
+
+
+class TestTagCache(base.TestCase):
+
+    tags = {'1.0.0': b'1111111111111111111111111111111111111111'}
+    peeled = {'1.0.0': (b'2222222222222222222222222222222222222222', 1000)}
+
+    def setUp(self):
+        super(TestTagCache, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.cache = notecache.TagCache(self.tmpdir)
+
+    def test_round_trip(self):
+        self.cache.put(self.tags, self.peeled)
+        self.assertEqual(self.peeled, self.cache.get(self.tags))
+
+    def test_tags_changed(self):
+        self.cache.put(self.tags, self.peeled)
+        tags = dict(self.tags)
+        tags['2.0.0'] = b'3333333333333333333333333333333333333333'
+        self.assertIsNone(self.cache.get(tags))
+
+
+class TestSharedCacheDir(base.TestCase):
+
+    def setUp(self):
+        super(TestSharedCacheDir, self).setUp()
+        self.c = config.Config('.')
+
+    def test_xdg_cache_home(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            'XDG_CACHE_HOME', '/tmp/xdg'))
+        self.assertEqual('/tmp/xdg/reno',
+                         notecache.get_shared_cache_dir(self.c))
+
+    def test_home(self):
+        self.useFixture(fixtures.EnvironmentVariable('XDG_CACHE_HOME'))
+        self.useFixture(fixtures.EnvironmentVariable('HOME', '/tmp/home'))
+        self.assertEqual('/tmp/home/.cache/reno',
+                         notecache.get_shared_cache_dir(self.c))
+
+    def test_option(self):
+        self.c.override(shared_cache_dir='/tmp/shared')
+        self.assertEqual('/tmp/shared',
+                         notecache.get_shared_cache_dir(self.c))
+
+
+class TestPrune(base.TestCase):
+
+    def setUp(self):
+        super(TestPrune, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.cache = notecache.NoteCache(self.tmpdir)
+        self.shas = ['{:040x}'.format(i) for i in range(4)]
+        for i, sha in enumerate(self.shas):
+            self.cache.put(sha, {'fixes': ['x' * 100]})
+            os.utime(self.cache._get_filename(sha), (i, i))
+        self.entry_size = os.path.getsize(
+            self.cache._get_filename(self.shas[0]))
+
+    def _remaining(self):
+        return [sha for sha in self.shas
+                if os.path.exists(self.cache._get_filename(sha))]
+
+    def test_under_limit(self):
+        self.assertEqual(0, notecache.prune(self.tmpdir, 10000))
+        self.assertEqual(self.shas, self._remaining())
+
+    def test_oldest_removed(self):
+        self.assertEqual(
+            2, notecache.prune(self.tmpdir, self.entry_size * 2))
+        self.assertEqual(self.shas[2:], self._remaining())
+
+    def test_prune_if_due(self):
+        self.assertEqual(
+            2, notecache.prune_if_due(self.tmpdir, self.entry_size * 2))
+        self.cache.put('f' * 40, {'fixes': ['x' * 100]})
+        # Pruned recently, so the new entry is kept for now.
+        self.assertEqual(
+            0, notecache.prune_if_due(self.tmpdir, self.entry_size * 2))
+        self.assertEqual(
+            1, notecache.prune_if_due(self.tmpdir, self.entry_size * 2,
+                                      interval=0))
+
+    def test_read_entries_kept(self):
+        self.cache.get(self.shas[0])
+        notecache.prune(self.tmpdir, self.entry_size * 2)
+        self.assertEqual([self.shas[0], self.shas[3]], self._remaining())
@@ -0,0 +1,102 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import os.path
+
+import fixtures
+
+from reno import formatter
+from reno import report
+from reno.tests import base
+from reno.tests import test_formatter
+
+
+class TestParseOutput(base.TestCase):
+
+    def test_filename(self):
+        self.assertEqual(('rst', 'notes.txt'),
+                         report._parse_output('notes.txt'))
+
+    def test_format(self):
+        self.assertEqual(('md', 'notes.md'),
+                         report._parse_output('md:notes.md'))
+        self.assertEqual(('json', 'out/notes.json'),
+                         report._parse_output('json:out/notes.json'))
+
+    def test_unknown_prefix(self):
+        self.assertEqual(('rst', 'C:\\notes.rst'),
+                         report._parse_output('C:\\notes.rst'))
+
+
+class TestOutputDir(test_formatter.TestFormatterBase):
+
+    note_bodies = test_formatter.TestFormatter.note_bodies
+
+    def setUp(self):
+        super(TestOutputDir, self).setUp()
+        self.output_dir = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'notes')
+
+    def _write(self, versions=None):
+        return report._write_output_dir(
+            self.output_dir, self.ldr, self.c, versions or self.versions,
+            title='Release Notes',
+        )
+
+    def _read(self, name):
+        with open(os.path.join(self.output_dir, name)) as f:
+            return f.read()
+
+    def test_files(self):
+        self.assertEqual(3, self._write())
+        self.assertEqual(
+            ['.reno-report', '0.0.0.rst', '1.0.0.rst', 'index.rst'],
+            sorted(os.listdir(self.output_dir)))
+        self.assertEqual(
+            formatter.format_version(self.ldr, self.c, '1.0.0',
+                                     title='Release Notes'),
+            self._read('1.0.0.rst'))
+        index = self._read('index.rst')
+        self.assertTrue(index.startswith(
+            formatter.format_title('Release Notes')))
+        self.assertIn('.. toctree::', index)
+        self.assertLess(index.index('   0.0.0\n'),
+                        index.index('   1.0.0\n'))
+
+    def test_unchanged_files_not_written(self):
+        self._write()
+        filename = os.path.join(self.output_dir, '1.0.0.rst')
+        os.utime(filename, (0, 0))
+        self.assertEqual(0, self._write())
+        self.assertEqual(0, os.stat(filename).st_mtime)
+
+    def test_changed_file_written(self):
+        self._write()
+        self.note_bodies['note1'] = {'prelude': 'A new prelude.'}
+        self.addCleanup(self.note_bodies.__setitem__, 'note1',
+                        {'prelude': 'This is the prelude.'})
+        self.assertEqual(1, self._write())
+        self.assertIn('A new prelude.', self._read('0.0.0.rst'))
+
+    def test_stale_files_removed(self):
+        self._write()
+        with open(os.path.join(self.output_dir, 'other.rst'), 'w') as f:
+            f.write('Not written by reno.\n')
+        self.assertEqual(1, self._write(['1.0.0']))
+        self.assertEqual(
+            ['.reno-report', '1.0.0.rst', 'index.rst', 'other.rst'],
+            sorted(os.listdir(self.output_dir)))
+
+    def test_version_name(self):
+        self.assertEqual('stable_1.0.0-2',
+                         report._get_version_name('stable/1.0.0-2'))
@@ -12,6 +12,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import copy
+import io
 import itertools
 import logging
 import os.path
@@ -28,6 +30,8 @@ from testtools.content import text_content
 
 from reno import config
 from reno import create
+from reno import loader
+from reno import main
 from reno import scanner
 from reno.tests import base
 from reno import utils
@@ -1825,6 +1829,50 @@ class ScanStopPointRegularVersionsTest(Base):
         )
 
 
+class IndexDigestTest(Base):
+
+    def setUp(self):
+        super(IndexDigestTest, self).setUp()
+        self._make_python_package()
+        self._add_notes_file('slug1')
+        self.scanner = scanner.Scanner(self.c)
+
+    def _stage(self, filename):
+        with open(os.path.join(self.reporoot, filename), 'w') as f:
+            f.write('features:\n  - New.\n')
+        self.repo.git('add', filename)
+
+    def test_note_staged(self):
+        before = self.scanner.get_index_digest()
+        self._stage(os.path.join('releasenotes', 'notes',
+                                 'new-0000000000000099.yaml'))
+        self.assertNotEqual(before, self.scanner.get_index_digest())
+
+    def test_other_file_staged(self):
+        before = self.scanner.get_index_digest()
+        self._stage('other.txt')
+        self.assertEqual(before, self.scanner.get_index_digest())
+
+    def test_index_without_items(self):
+        # Older versions of dulwich only support iterating over the
+        # paths in the index and looking up each entry.
+        index = self.scanner._repo.open_index()
+        entries = {path: index[path] for path in index}
+
+        class OldIndex(object):
+
+            def __iter__(self):
+                return iter(entries)
+
+            def __getitem__(self, path):
+                return entries[path]
+
+        expected = self.scanner.get_index_digest()
+        with mock.patch.object(self.scanner._repo, 'open_index',
+                               return_value=OldIndex()):
+            self.assertEqual(expected, self.scanner.get_index_digest())
+
+
 class GetRefTest(Base):
 
     def setUp(self):
@@ -1994,6 +2042,58 @@ class VersionTest(Base):
         )
 
 
+class LatestTagTest(Base):
+
+    def setUp(self):
+        super(LatestTagTest, self).setUp()
+        self._make_python_package()
+        self.f1 = self._add_notes_file('slug1')
+        self.repo.git('tag', '-s', '-m', 'first tag', '1.0.0')
+        self.f2 = self._add_notes_file('slug2')
+        self.repo.git('tag', '-s', '-m', 'second tag', '2.0.0')
+
+    def _get_results(self):
+        self.scanner = scanner.Scanner(self.c)
+        raw_results = self.scanner.get_notes_by_version(
+            stop_at_latest_tag=True,
+        )
+        return [
+            (k, [f for (f, n) in v])
+            for (k, v) in raw_results.items()
+        ]
+
+    def test_tagged_head(self):
+        self.assertEqual(
+            [('2.0.0', [self.f2])],
+            self._get_results(),
+        )
+
+    def test_head_after_tag(self):
+        f3 = self._add_notes_file('slug3')
+        self.assertEqual(
+            [('2.0.0-1', [f3]),
+             ('2.0.0', [self.f2])],
+            self._get_results(),
+        )
+
+    def test_tag_without_notes(self):
+        self.repo.add_file('not-a-release-note.txt')
+        self.repo.git('tag', '-s', '-m', 'third tag', '3.0.0')
+        self.assertEqual(
+            [('3.0.0', [])],
+            self._get_results(),
+        )
+
+    def test_ignores_earliest_version(self):
+        self.c.override(earliest_version='1.0.0')
+        f3 = self._add_notes_file('slug3')
+        self.assertEqual(
+            [('2.0.0-1', [f3]),
+             ('2.0.0', [self.f2])],
+            self._get_results(),
+        )
+
+
 class AggregateChangesTest(Base):
 
     def setUp(self):
@@ -2477,3 +2577,178 @@ class GetSeriesBranchesTest(Base):
             ['stable/a', 'stable/b'],
             self.scanner.get_series_branches(),
         )
+
+
+class SharedCacheTest(Base):
+
+    def setUp(self):
+        super(SharedCacheTest, self).setUp()
+        self._make_python_package()
+        self.f1 = self._add_notes_file('slug1')
+        self.repo.git('tag', '-s', '-m', 'first tag', '1.0.0')
+        self.f2 = self._add_notes_file('slug2')
+        self.cache_dir = os.path.join(self.temp_dir, 'shared')
+        self.c.override(shared_cache=True, shared_cache_dir=self.cache_dir)
+        self.useFixture(
+            fixtures.MockPatchObject(scanner, '_pruned_dirs', set()))
+
+    def _get_results(self):
+        raw_results = scanner.Scanner(self.c).get_notes_by_version()
+        return [
+            (k, [f for (f, n) in v])
+            for (k, v) in raw_results.items()
+        ]
+
+    def test_same_results(self):
+        expected = [('1.0.0-1', [self.f2]), ('1.0.0', [self.f1])]
+        self.assertEqual(expected, self._get_results())
+        self.assertEqual(expected, self._get_results())
+
+    def test_changes_reused(self):
+        self._get_results()
+        with mock.patch('dulwich.diff_tree.tree_changes') as tree_changes:
+            results = self._get_results()
+        tree_changes.assert_not_called()
+        self.assertEqual(
+            [('1.0.0-1', [self.f2]), ('1.0.0', [self.f1])], results)
+
+    def test_tags_reused(self):
+        self._get_results()
+        with mock.patch.object(scanner.RenoRepo,
+                               '_get_commit_from_tag') as peel:
+            results = self._get_results()
+        peel.assert_not_called()
+        self.assertEqual(
+            [('1.0.0-1', [self.f2]), ('1.0.0', [self.f1])], results)
+
+    def test_cache_dir(self):
+        s = scanner.Scanner(self.c)
+        root = self.repo.git('rev-list', '--max-parents=0', 'HEAD').strip()
+        self.assertEqual(root, s.get_repository_id())
+        self.assertEqual(
+            os.path.join(self.cache_dir, root), s.get_cache_dir())
+
+    def test_clone_shares_cache_dir(self):
+        clone = os.path.join(self.temp_dir, 'clone')
+        self.repo.git('clone', self.reporoot, clone)
+        clone_conf = config.Config(clone)
+        clone_conf.override(shared_cache=True,
+                            shared_cache_dir=self.cache_dir)
+        self.assertEqual(
+            scanner.Scanner(self.c).get_cache_dir(),
+            scanner.Scanner(clone_conf).get_cache_dir(),
+        )
+
+    def test_shallow_clone_not_shared(self):
+        clone = os.path.join(self.temp_dir, 'clone')
+        self.repo.git('clone', '--depth', '1',
+                      'file://' + self.reporoot, clone)
+        clone_conf = config.Config(clone)
+        clone_conf.override(shared_cache=True,
+                            shared_cache_dir=self.cache_dir)
+        s = scanner.Scanner(clone_conf)
+        self.assertEqual(
+            os.path.join(clone, '.git', 'reno'), s.get_cache_dir())
+        self.assertIsNone(s._change_cache)
+        self.assertIn('shallow clone', self.fake_logger.output)
+
+    def test_pruned_once(self):
+        with mock.patch('reno.notecache.prune', return_value=0) as prune:
+            scanner.Scanner(self.c)
+            scanner.Scanner(self.c)
+        prune.assert_called_once_with(self.cache_dir,
+                                      self.c.shared_cache_size)
+
+
+class ChangesMemoTest(Base):
+
+    def test_changes_reused(self):
+        self._make_python_package()
+        self._add_notes_file('slug1')
+        self.repo.git('tag', '-s', '-m', 'first tag', '1.0.0')
+        self._add_notes_file('slug2')
+        s = scanner.Scanner(self.c)
+        expected = s.get_notes_by_version()
+        with mock.patch.object(scanner, '_changes_in_subdir') as changes:
+            results = s.get_notes_by_version()
+        changes.assert_not_called()
+        self.assertEqual(expected, results)
+
+
+class StatsTest(Base):
+
+    def setUp(self):
+        super(StatsTest, self).setUp()
+        self._make_python_package()
+        self.f1 = self._add_notes_file('slug1')
+        self.repo.git('tag', '-s', '-m', 'first tag', '1.0.0')
+        self.repo.git('checkout', '-b', 'test_merge_commit')
+        self.f2 = self._add_notes_file('slug2')
+        self.repo.git('checkout', 'master')
+        self.repo.add_file('ignore-1.txt')
+        self.repo.git('merge', '--no-ff', 'test_merge_commit')
+        self.scanner = scanner.Scanner(self.c)
+
+    def _count_commits(self):
+        return len(self.repo.git('rev-list', 'HEAD').split())
+
+    def test_counts(self):
+        self.scanner.get_notes_by_version()
+        stats = self.scanner.stats
+        self.assertEqual(self._count_commits(), stats.commits_visited)
+        self.assertEqual(1, stats.merge_commits)
+        self.assertEqual(1, stats.tags_peeled)
+        self.assertEqual(2, stats.changes_aggregated)
+        self.assertGreater(stats.diffs_computed, 0)
+        self.assertGreater(stats.unchanged_subtrees, 0)
+        self.assertGreater(stats.tree_lookups, 0)
+        self.assertEqual(0, stats.subtree_cache_hits)
+        self.assertEqual(0, stats.blobs_read)
+        self.assertIsNone(stats.stop_point)
+
+    def test_reset_for_each_scan(self):
+        self.scanner.get_notes_by_version()
+        self.scanner.get_notes_by_version()
+        stats = self.scanner.stats
+        self.assertEqual(self._count_commits(), stats.commits_visited)
+        self.assertEqual(0, stats.diffs_computed)
+        self.assertEqual(0, stats.tags_peeled)
+        # The changes in every commit were kept from the first scan.
+        self.assertEqual(stats.commits_visited, stats.subtree_cache_hits)
+
+    def test_stop_point(self):
+        self._add_notes_file('slug3')
+        self.scanner.get_notes_by_version(stop_at_latest_tag=True)
+        self.assertEqual('1.0.0', self.scanner.stats.stop_point)
+
+    def test_blobs_read(self):
+        notes = self.scanner.get_notes_by_version()
+        filename, sha = notes['1.0.0'][0]
+        self.scanner.get_file_at_commit(filename, sha)
+        self.assertEqual(1, self.scanner.stats.blobs_read)
+
+    def test_as_dict(self):
+        self.scanner.get_notes_by_version()
+        stats = self.scanner.stats.as_dict()
+        self.assertEqual(
+            list(scanner.ScanStats.COUNTERS) + ['stop_point'],
+            list(stats),
+        )
+        self.assertEqual(
+            self.scanner.stats.commits_visited, stats['commits_visited'])
+
+    def test_loader_keeps_own_stats(self):
+        ldr = loader.Loader(self.c, ignore_cache=True, scanner=self.scanner)
+        expected = ldr.scan_stats.as_dict()
+        other_conf = copy.copy(self.c)
+        other_conf.override(branch='test_merge_commit')
+        loader.Loader(other_conf, ignore_cache=True, scanner=self.scanner)
+        self.assertNotEqual(expected, self.scanner.stats.as_dict())
+        self.assertEqual(expected, ldr.scan_stats.as_dict())
+
+    def test_list_stats(self):
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as err:
+            main.main(['list', '--stats', self.reporoot])
+        self.assertIn(
+            'commits_visited: %d\n' % self._count_commits(), err.getvalue())
+        self.assertIn('stop_point: None\n', err.getvalue())
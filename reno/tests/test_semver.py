@@ -62,6 +62,8 @@ class TestSemVer(base.TestCase):
                                new=self._get_dates)
         )
         self.c = config.Config('.')
+        # The note SHAs used here do not exist in any repository.
+        self.c.override(parse_cache=False)
 
     @mock.patch('reno.scanner.Scanner.get_notes_by_version')
     def test_same(self, mock_get_notes):
@@ -167,3 +169,20 @@ class TestSemVer(base.TestCase):
         expected = '1.1.2'
         actual = semver.compute_next_version(self.c)
         self.assertEqual(expected, actual)
+
+    @mock.patch('reno.scanner.Scanner.get_notes_by_version')
+    def test_scan_stops_at_latest_tag(self, mock_get_notes):
+        mock_get_notes.return_value = collections.OrderedDict([
+            ('1.1.1', []),
+        ])
+        semver.compute_next_version(self.c)
+        mock_get_notes.assert_called_once_with(stop_at_latest_tag=True)
+
+    @mock.patch('reno.scanner.Scanner.get_notes_by_version')
+    def test_major_after_minor(self, mock_get_notes):
+        mock_get_notes.return_value = collections.OrderedDict([
+            ('1.1.1-2', [('minor', 'shaA'), ('major', 'shaB')]),
+        ])
+        expected = '2.0.0'
+        actual = semver.compute_next_version(self.c)
+        self.assertEqual(expected, actual)
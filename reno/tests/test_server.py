@@ -0,0 +1,183 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os.path
+import socket
+import socketserver
+import stat
+import threading
+import unittest
+from unittest import mock
+
+from reno import client
+from reno import main
+from reno import server
+from reno.tests import test_scanner
+
+
+class TestSession(test_scanner.Base):
+
+    def setUp(self):
+        super(TestSession, self).setUp()
+        self._make_python_package()
+        self.f1 = self._add_notes_file(
+            'slug1', contents='features:\n  - One.\n')
+        self.repo.git('tag', '-s', '-m', 'first tag', '1.0.0')
+        self.session = server._Session()
+
+    def _files(self, ldr):
+        return [(v, [f for f, sha in ldr[v]]) for v in ldr.versions]
+
+    def test_reuse_loader(self):
+        self.assertIs(self.session.get_loader(self.c),
+                      self.session.get_loader(self.c))
+
+    def test_different_arguments(self):
+        self.assertIsNot(
+            self.session.get_loader(self.c),
+            self.session.get_loader(self.c, ignore_cache=True),
+        )
+
+    def test_new_commit(self):
+        self.session.get_loader(self.c)
+        f2 = self._add_notes_file('slug2')
+        self.assertEqual(
+            [('1.0.0-1', [f2]), ('1.0.0', [self.f1])],
+            self._files(self.session.get_loader(self.c)))
+
+    def test_new_tag(self):
+        f2 = self._add_notes_file('slug2')
+        self.assertEqual(
+            [('1.0.0-1', [f2]), ('1.0.0', [self.f1])],
+            self._files(self.session.get_loader(self.c)))
+        self.repo.git('tag', '-s', '-m', 'second tag', '2.0.0')
+        self.assertEqual(
+            [('2.0.0', [f2]), ('1.0.0', [self.f1])],
+            self._files(self.session.get_loader(self.c)))
+
+    def test_forget_closes_loader(self):
+        ldr = self.session.get_loader(self.c)
+        with mock.patch.object(ldr, 'close') as close:
+            self.session.forget(self.c.reporoot)
+        close.assert_called_once_with()
+        self.assertIsNot(ldr, self.session.get_loader(self.c))
+
+    def test_replaced_loader_closed(self):
+        ldr = self.session.get_loader(self.c)
+        self._add_notes_file('slug2')
+        with mock.patch.object(ldr, 'close') as close:
+            self.session.get_loader(self.c)
+        close.assert_called_once_with()
+
+    def test_working_copy(self):
+        self.session.get_loader(self.c)
+        filename = os.path.join('releasenotes', 'notes',
+                                'new-0000000000000099.yaml')
+        with open(os.path.join(self.reporoot, filename), 'w') as f:
+            f.write('features:\n  - New.\n')
+        self.repo.git('add', filename)
+        ldr = self.session.get_loader(self.c)
+        self.assertEqual([filename], [f for f, sha in ldr['*working-copy*']])
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'requires Unix sockets')
+class TestServer(test_scanner.Base):
+
+    def setUp(self):
+        super(TestServer, self).setUp()
+        self._make_python_package()
+        self.f1 = self._add_notes_file(
+            'slug1', contents='features:\n  - One.\n')
+        self.repo.git('tag', '-s', '-m', 'first tag', '1.0.0')
+        self.path = os.path.join(self.temp_dir, 'reno.sock')
+        self.server = server._Server(self.path, main.build_parser())
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_list(self):
+        response = client.call(self.path, ['list', self.reporoot])
+        self.assertEqual(0, response['returncode'])
+        self.assertEqual('1.0.0', response['stdout'].splitlines()[0])
+        self.assertIn(self.f1, response['stdout'])
+
+    def test_relative_reporoot(self):
+        response = client.call(self.path, ['-q', 'semver-next'],
+                               cwd=self.reporoot)
+        self.assertEqual(
+            {'returncode': 0, 'stdout': '1.0.0\n', 'stderr': ''},
+            response)
+
+    def test_lint_output(self):
+        self._add_notes_file(
+            'slug2', contents='unknown:\n  - Not a section.\n')
+        response = client.call(self.path, ['lint', self.reporoot])
+        self.assertEqual(1, response['returncode'])
+        self.assertIn('unrecognized section name unknown',
+                      response['stderr'])
+
+    def test_command_not_served(self):
+        response = client.call(self.path, ['new', 'slug'])
+        self.assertEqual(2, response['returncode'])
+        self.assertIn('the server does not run new', response['stderr'])
+
+    def test_socket_permissions(self):
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.path).st_mode))
+
+    def _send(self, data):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.path)
+            sock.sendall(data)
+            with sock.makefile('rb') as f:
+                return json.loads(f.readline().decode('utf-8'))
+
+    def test_invalid_request(self):
+        for data in [b'not json\n', b'{"argv": ["list"]}\n', b'[]\n']:
+            response = self._send(data)
+            self.assertEqual(2, response['returncode'])
+            self.assertIn('invalid request', response['stderr'])
+
+    def test_config_error(self):
+        with open(os.path.join(self.reporoot, 'reno.yaml'), 'w') as f:
+            f.write('branch: [not closed\n')
+        response = client.call(self.path, ['list', self.reporoot])
+        self.assertEqual(1, response['returncode'])
+        self.assertIn('list failed', response['stderr'])
+
+    def test_invalid_response(self):
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.rfile.readline()
+                self.wfile.write(b'not json\n')
+
+        path = os.path.join(self.temp_dir, 'other.sock')
+        other = socketserver.UnixStreamServer(path, Handler)
+        thread = threading.Thread(target=other.handle_request)
+        thread.start()
+        try:
+            self.assertRaises(ConnectionError, client.call,
+                              path, ['list', self.reporoot])
+        finally:
+            thread.join()
+            other.server_close()
+
+    def test_client(self):
+        self.assertEqual(
+            0, main.main(['--server', self.path, 'list', self.reporoot]))
+
+    def test_client_no_server(self):
+        path = os.path.join(self.temp_dir, 'missing.sock')
+        main.main(['--server', path, 'list', self.reporoot])
+        self.assertIn('could not reach the server', self.fake_logger.output)
@@ -0,0 +1,252 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import copy
+import io
+import os.path
+import pickle
+import textwrap
+import time
+from unittest import mock
+
+import fixtures
+from sphinx import application
+
+from reno import loader
+from reno import scanner
+from reno import sphinxext
+from reno.tests import base
+from reno.tests import test_scanner
+
+
+class TestLoaderRegistry(test_scanner.Base):
+
+    def setUp(self):
+        super(TestLoaderRegistry, self).setUp()
+        self._make_python_package()
+        self.f1 = self._add_notes_file('slug1')
+        self.repo.git('tag', '-s', '-m', 'first tag', '1.0.0')
+        self.repo.git('branch', 'stable/1')
+        self.f2 = self._add_notes_file('slug2')
+        self.registry = sphinxext._LoaderRegistry()
+
+    def _conf(self, **kwds):
+        conf = copy.copy(self.c)
+        conf.override(**kwds)
+        return conf
+
+    def _files(self, ldr):
+        return [(v, [f for f, sha in ldr[v]]) for v in ldr.versions]
+
+    def test_same_config(self):
+        self.assertIs(self.registry.get_loader(self._conf()),
+                      self.registry.get_loader(self._conf()))
+
+    def test_different_config(self):
+        self.assertIsNot(
+            self.registry.get_loader(self._conf()),
+            self.registry.get_loader(self._conf(earliest_version='1.0.0')),
+        )
+
+    def test_branches_share_scanner(self):
+        with mock.patch.object(scanner, 'Scanner',
+                               wraps=scanner.Scanner) as mock_scanner:
+            master = self.registry.get_loader(self._conf())
+            stable = self.registry.get_loader(self._conf(branch='stable/1'))
+        self.assertEqual(1, mock_scanner.call_count)
+        self.assertEqual(
+            self._files(loader.Loader(self._conf())), self._files(master))
+        self.assertEqual(
+            self._files(loader.Loader(self._conf(branch='stable/1'))),
+            self._files(stable))
+
+    def test_branch_not_inherited(self):
+        # A directive for the current branch after one for another
+        # branch must not scan the other branch again.
+        self.registry.get_loader(self._conf(branch='stable/1'))
+        master = self.registry.get_loader(self._conf())
+        self.assertEqual(
+            [('1.0.0-1', [self.f2]), ('1.0.0', [self.f1])],
+            self._files(master))
+
+    def test_jobs(self):
+        self.assertEqual(1, self.registry.get_loader(self._conf()).jobs)
+        ldr = self.registry.get_loader(self._conf(branch='stable/1'), 4)
+        self.assertEqual(4, ldr.jobs)
+
+
+class BuildBase(test_scanner.Base):
+
+    def _add_notes_file(self, slug):
+        return super(BuildBase, self)._add_notes_file(
+            slug, contents='features:\n  - {}\n'.format(slug))
+
+    def setUp(self):
+        super(BuildBase, self).setUp()
+        self._make_python_package()
+        self.f1 = self._add_notes_file('slug1')
+        self.repo.git('tag', '-s', '-m', 'first tag', '1.0.0')
+        self.srcdir = os.path.join(self.temp_dir, 'doc')
+        os.makedirs(self.srcdir)
+        with open(os.path.join(self.srcdir, 'conf.py'), 'w') as f:
+            f.write("extensions = ['reno.sphinxext']\n")
+        with open(os.path.join(self.srcdir, 'index.rst'), 'w') as f:
+            f.write('Index\n=====\n')
+        with open(os.path.join(self.srcdir, 'notes.rst'), 'w') as f:
+            f.write('.. release-notes:: Notes\n   :reporoot: {}\n'.format(
+                self.reporoot))
+        self.useFixture(
+            fixtures.MockPatchObject(sphinxext, '_registry', None))
+
+    def _build(self, freshenv=False, warning=None):
+        "Build the documents and return the names of those read."
+        read = []
+        app = application.Sphinx(
+            self.srcdir, self.srcdir,
+            os.path.join(self.temp_dir, 'html'),
+            os.path.join(self.temp_dir, 'doctrees'),
+            'html', status=None, warning=warning, freshenv=freshenv,
+        )
+        app.connect('env-before-read-docs',
+                    lambda app, env, docnames: read.extend(docnames))
+        app.build()
+        return sorted(read)
+
+
+class TestIncrementalBuild(BuildBase):
+
+    def test_unchanged(self):
+        self.assertEqual(['index', 'notes'], self._build())
+        self.assertEqual([], self._build())
+
+    def test_new_note(self):
+        self._build()
+        self._add_notes_file('slug2')
+        self.assertEqual(['notes'], self._build())
+
+    def test_new_tag(self):
+        self._build()
+        self.repo.git('tag', '-s', '-m', 'second tag', '2.0.0')
+        self.assertEqual(['notes'], self._build())
+
+    def test_config_changed(self):
+        self._build()
+        with open(os.path.join(self.reporoot, 'reno.yaml'), 'w') as f:
+            f.write('earliest_version: 1.0.0\n')
+        self.assertEqual(['notes'], self._build())
+
+    def test_unstaged_change(self):
+        self._build()
+        # Make sure the modification time changes.
+        time.sleep(0.01)
+        with open(os.path.join(self.reporoot, self.f1), 'a') as f:
+            f.write('  - more\n')
+        self.assertEqual(['notes'], self._build())
+
+
+class TestFindDirectives(base.TestCase):
+
+    def test_options_and_title(self):
+        text = textwrap.dedent("""\
+        Heading
+        =======
+
+        .. release-notes:: Release Notes
+           :branch: stable/1
+           :earliest-version: 1.0.0
+
+        .. note::
+
+           Not release notes.
+
+        .. release-notes::
+           :version: 1.0.0, 1.1.0
+
+           Title in body
+        """)
+        self.assertEqual(
+            [('Release Notes',
+              {'branch': 'stable/1', 'earliest-version': '1.0.0'}),
+             ('Title in body', {'version': '1.0.0, 1.1.0'})],
+            list(sphinxext._find_directives(text)),
+        )
+
+
+class TestPrescan(BuildBase):
+
+    def setUp(self):
+        super(TestPrescan, self).setUp()
+        self.repo.git('branch', 'stable/1')
+        self._add_notes_file('slug2')
+        with open(os.path.join(self.srcdir, 'stable.rst'), 'w') as f:
+            f.write(
+                '.. release-notes:: Stable Notes\n'
+                '   :reporoot: {}\n'
+                '   :branch: stable/1\n'.format(self.reporoot))
+
+    def _read_output(self):
+        results = {}
+        for name in ('notes', 'stable'):
+            filename = os.path.join(self.temp_dir, 'doctrees',
+                                    name + '.doctree')
+            with open(filename, 'rb') as f:
+                results[name] = pickle.load(f).astext()
+        return results
+
+    def test_same_output(self):
+        self._build()
+        expected = self._read_output()
+        with open(os.path.join(self.srcdir, 'conf.py'), 'a') as f:
+            f.write('reno_prescan_jobs = 2\n')
+        with mock.patch.object(sphinxext._LoaderRegistry,
+                               'get_loader') as get_loader:
+            self._build(freshenv=True)
+        get_loader.assert_not_called()
+        self.assertEqual(expected, self._read_output())
+        self.assertIn('slug2', expected['notes'])
+        self.assertNotIn('slug2', expected['stable'])
+
+
+class TestFragmentCache(BuildBase):
+
+    def _doctree(self):
+        filename = os.path.join(self.temp_dir, 'doctrees', 'notes.doctree')
+        with open(filename, 'rb') as f:
+            return pickle.load(f).pformat()
+
+    def test_released_versions_reused(self):
+        self._build()
+        self._add_notes_file('slug2')
+        with mock.patch.object(sphinxext, 'nested_parse_with_titles',
+                               wraps=sphinxext.nested_parse_with_titles) as p:
+            self._build()
+        # The title and the new version.
+        self.assertEqual(2, p.call_count)
+        reused = self._doctree()
+        self._build(freshenv=True)
+        self.assertEqual(self._doctree(), reused)
+
+    def test_labels_registered(self):
+        with open(os.path.join(self.srcdir, 'index.rst'), 'a') as f:
+            f.write('\nSee :ref:`Notes_1.0.0`.\n')
+        self._build()
+        self._add_notes_file('slug2')
+        warnings = io.StringIO()
+        self._build(warning=warnings)
+        self.assertNotIn('undefined label', warnings.getvalue())
+
+    def test_old_docutils(self):
+        # Nodes have no findall() before docutils 0.18.
+        node = mock.Mock(spec=['traverse'])
+        node.traverse.return_value = ['a', 'b']
+        self.assertEqual(['a', 'b'], list(sphinxext._iter_nodes(node, str)))
+        node.traverse.assert_called_once_with(str)
@@ -0,0 +1,105 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import argparse
+import io
+import json
+import os.path
+from unittest import mock
+
+import fixtures
+
+from reno import main
+from reno.tests import base
+from reno import timing
+
+
+class TestTiming(base.TestCase):
+
+    def setUp(self):
+        super(TestTiming, self).setUp()
+        self.addCleanup(timing.reset)
+        self.addCleanup(timing.disable)
+
+    def test_disabled(self):
+        self.assertIs(timing.timer('a'), timing.timer('b'))
+        with timing.timer('a'):
+            timing.count('c')
+        self.assertEqual({'phases': {}, 'counters': {}},
+                         timing.get_results())
+        self.assertEqual('', timing.format_summary())
+
+    def test_enabled(self):
+        timing.enable()
+        with timing.timer('a'):
+            with timing.timer('b'):
+                timing.count('c')
+        with timing.timer('b'):
+            timing.count('c', 2)
+        results = timing.get_results()
+        self.assertEqual(['a', 'b'], sorted(results['phases']))
+        self.assertEqual(1, results['phases']['a']['calls'])
+        self.assertEqual(2, results['phases']['b']['calls'])
+        self.assertEqual({'c': 3}, results['counters'])
+
+    def test_enable_resets(self):
+        timing.enable()
+        timing.count('c')
+        timing.enable()
+        self.assertEqual({}, timing.get_results()['counters'])
+
+    def test_summary(self):
+        timing.enable()
+        with timing.timer('phase'):
+            timing.count('counter')
+        lines = timing.format_summary().splitlines()
+        self.assertEqual(['phase', 'calls', 'seconds'], lines[0].split())
+        self.assertEqual(['phase', '1'], lines[1].split()[:2])
+        self.assertEqual('', lines[2])
+        self.assertEqual(['counter', '1'], lines[4].split())
+
+
+class TestRunCommand(base.TestCase):
+
+    def setUp(self):
+        super(TestRunCommand, self).setUp()
+        self.addCleanup(timing.reset)
+        self.tempdir = self.useFixture(fixtures.TempDir()).path
+
+    def _func(self, args, conf):
+        timing.count('called')
+        return 3
+
+    def test_timings_file(self):
+        filename = os.path.join(self.tempdir, 'timings.json')
+        args = argparse.Namespace(
+            timings=False, timings_file=filename, func=self._func)
+        self.assertEqual(3, main.run_command(args, None))
+        self.assertFalse(timing.is_enabled())
+        with open(filename) as f:
+            results = json.load(f)
+        self.assertEqual(['total'], list(results['phases']))
+        self.assertEqual({'called': 1}, results['counters'])
+
+    def test_timings_summary(self):
+        args = argparse.Namespace(
+            timings=True, timings_file=None, func=self._func)
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as err:
+            main.run_command(args, None)
+        self.assertIn('total', err.getvalue())
+        self.assertIn('called', err.getvalue())
+
+    def test_disabled(self):
+        args = argparse.Namespace(
+            timings=False, timings_file=None, func=self._func)
+        self.assertEqual(3, main.run_command(args, None))
+        self.assertEqual({}, timing.get_results()['counters'])
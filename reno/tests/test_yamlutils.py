@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import glob
+import os.path
+import textwrap
+
+import testtools
+import yaml
+
+from reno.tests import base
+from reno import yamlutils
+
+_SRCDIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+_SAMPLES = [
+    textwrap.dedent('''\
+    ---
+    prelude: >
+      Folded text that
+      spans several lines.
+    features:
+      - |
+        Literal text with ``markup``.
+
+        And a second paragraph.
+      - A plain string.
+    '''),
+    textwrap.dedent('''\
+    ---
+    fixes:
+      - "Quoted: with a colon"
+      - Non-ASCII text, café ☃
+      - dict: parsed as a mapping
+    other: 12
+    '''),
+]
+
+
+def _get_samples():
+    samples = list(_SAMPLES)
+    for pattern in ('releasenotes/notes/*.yaml', 'examples/notes/*.yaml'):
+        for filename in sorted(glob.glob(os.path.join(_SRCDIR, pattern))):
+            with open(filename, 'r', encoding='utf-8') as f:
+                samples.append(f.read())
+    return samples
+
+
+@testtools.skipUnless(yamlutils.HAVE_LIBYAML, 'PyYAML built without libyaml')
+class TestEquivalence(base.TestCase):
+
+    def test_load(self):
+        for sample in _get_samples():
+            self.assertEqual(
+                yaml.load(sample, Loader=yaml.SafeLoader),
+                yamlutils.safe_load(sample),
+            )
+
+    def test_dump(self):
+        data = [yaml.load(s, Loader=yaml.SafeLoader) for s in _get_samples()]
+        for kwds in ({}, {'allow_unicode': True, 'explicit_start': True}):
+            expected = yaml.dump(data, Dumper=yaml.SafeDumper, **kwds)
+            actual = yamlutils.safe_dump(data, **kwds)
+            self.assertEqual(
+                yaml.load(expected, Loader=yaml.SafeLoader),
+                yaml.load(actual, Loader=yaml.SafeLoader),
+            )
+
+
+class TestHelpers(base.TestCase):
+
+    def test_round_trip(self):
+        data = {'notes': [{'version': '1.0.0', 'files': [['a', 'b']]}]}
+        text = yamlutils.safe_dump(data, explicit_start=True)
+        self.assertEqual(data, yamlutils.safe_load(text))
+
+    def test_unsafe_tags_rejected(self):
+        self.assertRaises(
+            yaml.YAMLError,
+            yamlutils.safe_load,
+            '!!python/object/apply:os.system ["true"]',
+        )
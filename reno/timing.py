@@ -0,0 +1,140 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measure where reno spends its time.
+
+Code is divided into named phases with timer() and notable events are
+counted with count(). Nothing is recorded until enable() is called,
+and while it is disabled timer() returns a shared object that does
+nothing, so the instrumentation can stay in the code that scans the
+history.
+
+Phases may be nested, so the time for a phase includes the time for
+the phases inside it.
+
+"""
+
+import collections
+import time
+
+_enabled = False
+_seconds = collections.defaultdict(float)
+_calls = collections.Counter()
+_counters = collections.Counter()
+
+
+class _NullTimer(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+
+    def __init__(self, name):
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _seconds[self._name] += time.perf_counter() - self._start
+        _calls[self._name] += 1
+        return False
+
+
+def enable():
+    "Start recording, discarding anything recorded earlier."
+    global _enabled
+    reset()
+    _enabled = True
+
+
+def disable():
+    "Stop recording."
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    "Discard the times and counts recorded so far."
+    _seconds.clear()
+    _calls.clear()
+    _counters.clear()
+
+
+def timer(name):
+    """Return a context manager that adds the time it is open to a phase.
+
+    :param name: The name of the phase, such as "scanner.scan".
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def count(name, n=1):
+    "Add n to the named counter."
+    if _enabled:
+        _counters[name] += n
+
+
+def get_results():
+    """Return the times and counts recorded, for saving as JSON.
+
+    The result is a dict with "phases", mapping the name of each phase
+    to its total "seconds" and the number of "calls", and "counters",
+    mapping the name of each counter to its value.
+
+    """
+    return {
+        'phases': {
+            name: {'seconds': _seconds[name], 'calls': _calls[name]}
+            for name in sorted(_seconds)
+        },
+        'counters': dict(sorted(_counters.items())),
+    }
+
+
+def format_summary():
+    "Return a table of the phases, slowest first, and the counters."
+    lines = []
+    phases = sorted(_seconds.items(), key=lambda item: (-item[1], item[0]))
+    if phases:
+        width = max(len(name) for name, seconds in phases)
+        lines.append('{:{width}}  {:>8}  {:>10}'.format(
+            'phase', 'calls', 'seconds', width=width))
+        for name, seconds in phases:
+            lines.append('{:{width}}  {:8d}  {:10.4f}'.format(
+                name, _calls[name], seconds, width=width))
+    if _counters:
+        if lines:
+            lines.append('')
+        width = max(len(name) for name in _counters)
+        lines.append('{:{width}}  {:>8}'.format(
+            'counter', 'value', width=width))
+        for name, value in sorted(_counters.items()):
+            lines.append('{:{width}}  {:8d}'.format(
+                name, value, width=width))
+    return '\n'.join(lines) + '\n' if lines else ''
@@ -0,0 +1,40 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Safe YAML loading and dumping, using libyaml when it is available.
+
+The C implementations in PyYAML are an order of magnitude faster than
+the pure-Python versions, but they are only present when PyYAML was
+built against libyaml.
+
+"""
+
+import yaml
+
+try:
+    SafeLoader = yaml.CSafeLoader
+    SafeDumper = yaml.CSafeDumper
+except AttributeError:
+    SafeLoader = yaml.SafeLoader
+    SafeDumper = yaml.SafeDumper
+
+HAVE_LIBYAML = SafeLoader is not yaml.SafeLoader
+
+
+def safe_load(stream):
+    "Parse the first YAML document in the stream, like yaml.safe_load()."
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def safe_dump(data, stream=None, **kwds):
+    "Serialize the data as YAML, like yaml.safe_dump()."
+    return yaml.dump(data, stream, Dumper=SafeDumper, **kwds)
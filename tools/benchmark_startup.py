@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measure how long the reno command line tool takes to start.
+
+Runs "reno --help" and "reno new" in fresh interpreters, in a
+temporary directory, and reports the best time for each, along with
+the time spent starting an interpreter that does nothing. With
+--max-seconds, exits with an error if either command, less the
+interpreter start up time, is slower than the limit.
+
+    $ python tools/benchmark_startup.py --max-seconds 0.1
+
+"""
+
+import argparse
+import os
+import os.path
+import subprocess
+import sys
+import tempfile
+import time
+
+_RENO = 'import sys; from reno import main; sys.exit(main.main(sys.argv[1:]))'
+
+
+def _best_time(argv, cwd, env, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=cwd, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='number of times to run each command')
+    parser.add_argument('--max-seconds', type=float, default=None,
+                        help='fail if a command takes longer than this')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(
+        os.path.dirname(os.path.abspath(__file__)))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        baseline = _best_time([sys.executable, '-c', 'pass'],
+                              tmpdir, env, args.repeat)
+        print('{:8} {:8.4f}s'.format('python', baseline))
+        commands = [
+            ('--help', ['--help']),
+            ('new', ['new', 'benchmark']),
+        ]
+        failed = False
+        for name, reno_args in commands:
+            elapsed = _best_time(
+                [sys.executable, '-c', _RENO] + reno_args,
+                tmpdir, env, args.repeat,
+            ) - baseline
+            print('{:8} {:8.4f}s'.format(name, elapsed))
+            if args.max_seconds is not None and elapsed > args.max_seconds:
+                print('ERROR: {} took longer than {}s'.format(
+                    name, args.max_seconds))
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compare the pure-Python and libyaml implementations of PyYAML.
+
+Loads and dumps a reno cache file (or any other YAML file) with both
+implementations, verifies that they produce the same data, and
+reports the best time for each.
+
+    $ python tools/benchmark_yaml.py releasenotes/notes/reno.cache
+
+"""
+
+import argparse
+import sys
+import timeit
+
+import yaml
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename', help='the YAML file to load')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of times to repeat each test')
+    args = parser.parse_args()
+
+    if not getattr(yaml, '__with_libyaml__', False):
+        print('PyYAML was built without libyaml')
+        return 1
+
+    with open(args.filename, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    implementations = [
+        ('python', yaml.SafeLoader, yaml.SafeDumper),
+        ('libyaml', yaml.CSafeLoader, yaml.CSafeDumper),
+    ]
+    results = {}
+    for name, loader, dumper in implementations:
+        data = yaml.load(text, Loader=loader)
+        results[name] = data
+        load_time = min(timeit.repeat(
+            lambda: yaml.load(text, Loader=loader),
+            number=1, repeat=args.repeat,
+        ))
+        dump_time = min(timeit.repeat(
+            lambda: yaml.dump(data, Dumper=dumper, allow_unicode=True),
+            number=1, repeat=args.repeat,
+        ))
+        print('{:8} load {:8.4f}s  dump {:8.4f}s'.format(
+            name, load_time, dump_time))
+
+    if results['python'] != results['libyaml']:
+        print('ERROR: the implementations produced different data')
+        return 1
+    print('parsed data is identical')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())